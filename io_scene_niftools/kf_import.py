@@ -88,6 +88,8 @@ class KfImport(NifCommon):
 
         except NifError:
             return {'CANCELLED'}
+        finally:
+            self.tranform_anim.clear_keyframe_times()
 
         NifLog.info("Finished successfully")
         return {'FINISHED'}
@@ -112,7 +112,7 @@ class Animation(ABC):
         return node_kfctrls
 
     @staticmethod
-    def create_controller(parent_block, target_name, priority=0):
+    def create_controller(parent_block, target_name, priority=0, interpolator_type="NiTransformInterpolator"):
         n_kfi = None
         n_kfc = None
         
@@ -128,7 +128,7 @@ class Animation(ABC):
             n_kfc = block_store.create_block("NiKeyframeController", None)
         else:
             n_kfc = block_store.create_block("NiTransformController", None)
-            n_kfi = block_store.create_block("NiTransformInterpolator", None)
+            n_kfi = block_store.create_block(interpolator_type, None)
             # link interpolator from the controller
             n_kfc.interpolator = n_kfi
         # if parent is a node, attach controller to that node
@@ -39,17 +39,23 @@
 
 import bpy
 import mathutils
+import numpy as np
 
 from pyffi.formats.nif import NifFormat
 
 import io_scene_niftools.utils.logging
 from io_scene_niftools.modules.nif_export.animation import Animation
 from io_scene_niftools.modules.nif_export.block_registry import block_store
-from io_scene_niftools.utils import math
-from io_scene_niftools.utils.singleton import NifOp
+from io_scene_niftools.utils import bspline, math
+from io_scene_niftools.utils.singleton import NifOp, NifData
 from io_scene_niftools.utils.logging import NifLog
 
 
+# blender's keyframe interpolation enum values, as returned by foreach_get
+INTERPOLATION_CONSTANT = 0
+INTERPOLATION_LINEAR = 1
+
+
 class TransformAnimation(Animation):
 
     def __init__(self):
@@ -67,6 +73,40 @@ class TransformAnimation(Animation):
             key = [k.co[1] for k in point]
             yield frame, mathutilclass(key)
 
+    @staticmethod
+    def sample_fcurves(fcurves, frames):
+        """
+        Returns the (len(frames), len(fcurves)) values of the fcurves at the given frames.
+        Frames on a key and in constant or linear segments are read from the keyframe points in bulk,
+        only those that need blender's easing, extrapolation or modifiers are evaluated one by one.
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        samples = np.empty((len(frames), len(fcurves)))
+        for i, fcu in enumerate(fcurves):
+            b_points = fcu.keyframe_points
+            num_keys = len(b_points)
+            if fcu.modifiers or not num_keys:
+                samples[:, i] = [fcu.evaluate(frame) for frame in frames]
+                continue
+            co = np.empty(2 * num_keys, dtype=np.float32)
+            b_points.foreach_get("co", co)
+            interp = np.empty(num_keys, dtype=np.int32)
+            b_points.foreach_get("interpolation", interp)
+            times, values = co[0::2].astype(np.float64), co[1::2].astype(np.float64)
+
+            # linear segments, and constant extrapolation before the first and after the last key
+            samples[:, i] = np.interp(frames, times, values)
+            # the last key at or before every frame
+            key = np.clip(np.searchsorted(times, frames, side="right") - 1, 0, num_keys - 1)
+            in_segment = (frames > times[0]) & (frames < times[-1]) & (frames != times[key])
+            is_constant = in_segment & (interp[key] == INTERPOLATION_CONSTANT)
+            samples[is_constant, i] = values[key[is_constant]]
+            is_eased = in_segment & (interp[key] > INTERPOLATION_LINEAR)
+            if fcu.extrapolation != 'CONSTANT':
+                is_eased |= (frames < times[0]) | (frames > times[-1])
+            samples[is_eased, i] = [fcu.evaluate(frame) for frame in frames[is_eased]]
+        return samples
+
     def export_kf_root(self, b_armature=None):
         # todo [anim] export them properly, in the right tree to begin with
         # find all nodes and relevant controllers
@@ -105,8 +145,16 @@ class TransformAnimation(Animation):
             # per-node animation
             if b_armature:
                 b_action = self.get_active_action(b_armature)
-                for b_bone in b_armature.data.bones:
-                    self.export_transforms(kf_root, b_armature, b_action, b_bone)
+                use_bspline = NifOp.props.kf_transform_keys == 'BSPLINE'
+                if use_bspline and NifData.data.version < 0x0A020000:
+                    NifLog.warn(f"Compressed B-spline keys need nif version 10.2.0.0 or later, "
+                                f"exporting keyframes for version 0x{NifData.data.version:08X} instead.")
+                    use_bspline = False
+                if use_bspline:
+                    self.export_bspline_transforms(kf_root, b_armature, b_action)
+                else:
+                    for b_bone in b_armature.data.bones:
+                        self.export_transforms(kf_root, b_armature, b_action, b_bone)
                 # quick hack to set correct target name
                 if "Bip01" in b_armature.data.bones:
                     targetname = "Bip01"
@@ -233,15 +281,7 @@ class TransformAnimation(Animation):
         self.set_flags_and_timing(n_kfc, exp_fcurves, start_frame, stop_frame)
 
         # get the desired fcurves for each data type from exp_fcurves
-        quaternions = [fcu for fcu in exp_fcurves if fcu.data_path.endswith("quaternion")]
-        translations = [fcu for fcu in exp_fcurves if fcu.data_path.endswith("location")]
-        eulers = [fcu for fcu in exp_fcurves if fcu.data_path.endswith("euler")]
-        scales = [fcu for fcu in exp_fcurves if fcu.data_path.endswith("scale")]
-
-        # ensure that those groups that are present have all their fcurves
-        for fcus, num_fcus in ((quaternions, 4), (eulers, 3), (translations, 3), (scales, 3)):
-            if fcus and len(fcus) != num_fcus:
-                raise io_scene_niftools.utils.logging.NifError("Incomplete key set {} for action {}. Ensure that if a bone is keyframed for a property, all channels are keyframed.".format(bonestr, b_action.name))
+        quaternions, eulers, translations, scales = self.get_transform_fcurves(exp_fcurves, b_action, bonestr)
 
         # go over all fcurves collected above and transform and store all their keys
         quat_curve = []
@@ -339,6 +379,121 @@ class TransformAnimation(Animation):
             key.time = frame / self.fps
             key.value = scale
 
+    @staticmethod
+    def get_transform_fcurves(exp_fcurves, b_action, bonestr=""):
+        """Returns the quaternion, euler, translation and scale fcurves of exp_fcurves, ensuring that each set is complete."""
+        quaternions = [fcu for fcu in exp_fcurves if fcu.data_path.endswith("quaternion")]
+        eulers = [fcu for fcu in exp_fcurves if fcu.data_path.endswith("euler")]
+        translations = [fcu for fcu in exp_fcurves if fcu.data_path.endswith("location")]
+        scales = [fcu for fcu in exp_fcurves if fcu.data_path.endswith("scale")]
+
+        # ensure that those groups that are present have all their fcurves
+        for fcus, num_fcus in ((quaternions, 4), (eulers, 3), (translations, 3), (scales, 3)):
+            if fcus and len(fcus) != num_fcus:
+                raise io_scene_niftools.utils.logging.NifError("Incomplete key set {} for action {}. Ensure that if a bone is keyframed for a property, all channels are keyframed.".format(bonestr, b_action.name))
+        return quaternions, eulers, translations, scales
+
+    def export_bspline_transforms(self, kf_root, b_armature, b_action):
+        """
+        Exports the skeletal animation of b_action as NiBSplineCompTransformInterpolators.
+        The curves of all bones are sampled at every frame and fitted together, within the tolerance set by the operator.
+        """
+        if not b_action:
+            return
+
+        start_frame, stop_frame = b_action.frame_range
+        frames = np.linspace(start_frame, stop_frame, int(round(stop_frame - start_frame)) + 1)
+        tolerance = NifOp.props.bspline_tolerance
+
+        # sample the nif space channels of all keyframed bones
+        bone_channels = []
+        for bone in b_armature.data.bones:
+            if bone.name not in b_action.groups:
+                continue
+            exp_fcurves = b_action.groups[bone.name].channels
+            quaternions, eulers, translations, scales = self.get_transform_fcurves(exp_fcurves, b_action, " in bone " + bone.name)
+            bind_scale, bind_rot, bind_trans = math.decompose_srt(math.get_object_bind(bone))
+
+            channels = {}
+            if quaternions:
+                channels["rotation"] = math.export_quaternion_keys(bind_rot, self.sample_fcurves(quaternions, frames))
+            elif eulers:
+                channels["rotation"] = math.export_quaternion_keys(bind_rot, math.euler_to_quaternion(self.sample_fcurves(eulers, frames)))
+            if "rotation" in channels:
+                # q and -q are the same rotation, keep neighbouring keys in the same hemisphere so the curve stays smooth
+                quats = channels["rotation"]
+                flips = np.einsum("ij,ij->i", quats[1:], quats[:-1]) < 0
+                quats *= np.cumprod(np.where(np.concatenate(([False], flips)), -1.0, 1.0))[:, None]
+            if translations:
+                channels["translation"] = math.export_translation_keys(bind_rot, bind_trans, self.sample_fcurves(translations, frames))
+            if scales:
+                # just use the first scale curve and assume even scale over all curves
+                channels["scale"] = self.sample_fcurves(scales[:1], frames)
+            # channels that do not change are stored as the interpolator's base value, the others get curves
+            varying = {channel: curve for channel, curve in channels.items() if np.ptp(curve, axis=0).max() > tolerance}
+            bone_channels.append((bone, exp_fcurves, bind_scale, bind_rot, bind_trans, channels, varying))
+
+        # the channels of a bone share their basis, so fit them together, and all bones at once
+        curves = [np.hstack(list(varying.values())) for *_, varying in bone_channels if varying]
+        fitted = iter(bspline.fit_curves(curves, tolerance) if curves else ())
+
+        # all interpolators share the control points, and those with the same number of control points share a basis
+        n_data = block_store.create_block("NiBSplineData", None)
+        n_bases = {}
+        # interpolator, channel name and compressed control points of every channel with data
+        compressed = []
+        for bone, exp_fcurves, bind_scale, bind_rot, bind_trans, channels, varying in bone_channels:
+            n_kfc, n_kfi = self.create_controller(kf_root, block_store.get_full_name(bone), bone.niftools.priority,
+                                                  "NiBSplineCompTransformInterpolator")
+            self.set_flags_and_timing(n_kfc, exp_fcurves, start_frame, stop_frame)
+            n_kfi.start_time = start_frame / self.fps
+            n_kfi.stop_time = stop_frame / self.fps
+
+            # the rest pose, for channels without keys
+            n_kfi.translation.x, n_kfi.translation.y, n_kfi.translation.z = bind_trans
+            n_kfi.rotation.w, n_kfi.rotation.x, n_kfi.rotation.y, n_kfi.rotation.z = bind_rot.to_quaternion()
+            n_kfi.scale = bind_scale
+            n_kfi.translation_offset = n_kfi.rotation_offset = n_kfi.scale_offset = bspline.NO_DATA
+            for channel, curve in channels.items():
+                if channel in varying:
+                    continue
+                base = curve.mean(axis=0)
+                if channel == "rotation":
+                    n_kfi.rotation.w, n_kfi.rotation.x, n_kfi.rotation.y, n_kfi.rotation.z = base / np.linalg.norm(base)
+                elif channel == "translation":
+                    n_kfi.translation.x, n_kfi.translation.y, n_kfi.translation.z = base
+                else:
+                    n_kfi.scale = base[0]
+            if not varying:
+                continue
+
+            points = next(fitted)
+            num_control_points = len(points)
+            if num_control_points not in n_bases:
+                n_bases[num_control_points] = block_store.create_block("NiBSplineBasisData", None)
+                n_bases[num_control_points].num_control_points = num_control_points
+            n_kfi.basis_data = n_bases[num_control_points]
+            n_kfi.spline_data = n_data
+
+            # split the fitted control points into channels and compress each of them
+            splits = np.cumsum([curve.shape[1] for curve in varying.values()])[:-1]
+            for channel, channel_points in zip(varying, np.split(points, splits, axis=1)):
+                shorts, bias, multiplier = bspline.quantize(channel_points)
+                setattr(n_kfi, channel + "_bias", bias)
+                setattr(n_kfi, channel + "_multiplier", multiplier)
+                compressed.append((n_kfi, channel, shorts.ravel()))
+
+        # store the compressed control points of all channels one after another
+        offsets, num_short_points = bspline.get_offsets([shorts.size for *_, shorts in compressed])
+        short_points = np.zeros(num_short_points, dtype=np.int16)
+        for (n_kfi, channel, shorts), offset in zip(compressed, offsets):
+            setattr(n_kfi, channel + "_offset", offset)
+            short_points[offset:offset + shorts.size] = shorts
+        n_data.num_short_control_points = num_short_points
+        n_data.short_control_points.update_size()
+        for i, value in enumerate(short_points.tolist()):
+            n_data.short_control_points[i] = value
+
     def export_text_keys(self, b_action):
         """Process b_action's pose markers and return an extra string data block."""
         if NifOp.props.animation == 'GEOM_NIF':
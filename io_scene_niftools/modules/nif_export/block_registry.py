@@ -37,6 +37,8 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import functools
+
 from pyffi.formats.nif import NifFormat
 
 import io_scene_niftools.utils.logging
@@ -46,6 +48,14 @@ from io_scene_niftools.utils.consts import BIP_01, B_L_SUFFIX, BIP01_L, B_R_SUFF
 from io_scene_niftools.utils.logging import NifLog
 
 
+@functools.lru_cache(maxsize=None)
+def get_attribute_hash(params):
+    """Returns a hash function over the given block attributes and their names, the same function for the same names."""
+    def get_hash(n_block):
+        return tuple((param, getattr(n_block, param, None)) for param in params)
+    return get_hash
+
+
 def replace_blender_name(name, original, replacement, open_replace, close_replace):
     name = name.replace(original, replacement)
     name = name.replace(OPEN_BRACKET, open_replace)
@@ -56,6 +66,7 @@ class ExportBlockRegistry:
 
     def __init__(self):
         self._block_to_obj = {}
+        self._reset_indexes()
 
     @property
     def block_to_obj(self): 
@@ -64,6 +75,54 @@ class ExportBlockRegistry:
     @block_to_obj.setter
     def block_to_obj(self, value):
         self._block_to_obj = value
+        self._reset_indexes()
+        for block, b_obj in value.items():
+            self._index_block(block, b_obj)
+
+    def _reset_indexes(self):
+        # registration order of every block, so lookups return blocks in the order they were exported
+        self._block_order = {}
+        # blocks by their class and every base class, in registration order
+        self._type_to_blocks = {}
+        # blocks by the Blender object they were exported from
+        self._obj_to_blocks = {}
+        # blocks by their name, in registration order; names are usually set right after a block is registered, so
+        # new blocks wait in _unnamed_blocks until the next lookup by name, and blocks renamed later are re-filed then
+        self._name_to_blocks = {}
+        self._unnamed_blocks = []
+        # shared blocks by their type, hash function and content hash, and the other way around, see share_block;
+        # registered blocks of a type are shared when it is first looked up with a hash function, and those registered
+        # later at the next lookup, so _shared_counts holds how many blocks of the type were shared per hash function
+        self._hash_to_block = {}
+        self._block_to_hash = {}
+        self._shared_counts = {}
+
+    def _index_block(self, block, b_obj):
+        if block in self._block_order:
+            # re-registering keeps the original position, like the dict does, but may change the object
+            key = self._get_obj_key(self._block_to_obj.get(block))
+            if key is not None:
+                self._obj_to_blocks[key].pop(block, None)
+        else:
+            self._block_order[block] = len(self._block_order)
+            for n_type in type(block).__mro__:
+                self._type_to_blocks.setdefault(n_type, []).append(block)
+            if hasattr(type(block), "name"):
+                self._unnamed_blocks.append(block)
+        key = self._get_obj_key(b_obj)
+        if key is not None:
+            self._obj_to_blocks.setdefault(key, {})[block] = None
+
+    @staticmethod
+    def _get_obj_key(b_obj):
+        """Blender objects, bones, materials, etc. hash by the data they wrap; anything else is not indexed."""
+        if b_obj is None:
+            return None
+        try:
+            hash(b_obj)
+        except TypeError:
+            return None
+        return b_obj
 
     def register_block(self, block, b_obj=None):
         """Helper function to register a newly created block in the list of
@@ -76,9 +135,110 @@ class ExportBlockRegistry:
             NifLog.info(f"Exporting {block.__class__.__name__} block")
         else:
             NifLog.info(f"Exporting {b_obj} as {block.__class__.__name__} block")
+        self._index_block(block, b_obj)
         self._block_to_obj[block] = b_obj
         return block
 
+    def get_blocks_of_type(self, block_type):
+        """Returns all exported blocks of the given type, including subclasses, in the order they were registered.
+
+        @param block_type: The nif block class, for instance C{NifFormat.NiNode}.
+        @return: A new list, so it is safe to register blocks while iterating over it."""
+        return list(self._type_to_blocks.get(block_type, ()))
+
+    def get_blocks_for_obj(self, b_obj, block_type=None):
+        """Returns the exported blocks associated with a Blender object, optionally only those of the given type."""
+        key = self._get_obj_key(b_obj)
+        if key is None:
+            return []
+        blocks = sorted(self._obj_to_blocks.get(key, ()), key=self._block_order.__getitem__)
+        if block_type is not None:
+            return [block for block in blocks if isinstance(block, block_type)]
+        return blocks
+
+    def get_blocks_by_name(self, name, block_type=NifFormat.NiNode):
+        """Returns all exported blocks of the given type, including subclasses, with the given name, in registration order."""
+        for block in self._unnamed_blocks:
+            self._name_to_blocks.setdefault(block.name.decode(), []).append(block)
+        self._unnamed_blocks = []
+        blocks = [block for block in self._name_to_blocks.get(name, ())
+                  if isinstance(block, block_type) and block.name.decode() == name]
+        if not blocks:
+            # blocks that were named or renamed after they were indexed are filed under a stale name
+            blocks = [block for block in self._type_to_blocks.get(block_type, ())
+                      if hasattr(type(block), "name") and block.name.decode() == name]
+            if blocks:
+                name_blocks = self._name_to_blocks.setdefault(name, [])
+                name_blocks.extend(block for block in blocks if block not in name_blocks)
+                name_blocks.sort(key=self._block_order.__getitem__)
+        return blocks
+
+    def get_block_by_name(self, name, block_type=NifFormat.NiNode):
+        """Returns the first exported block of the given type with the given name, or None if there is none."""
+        for block in self.get_blocks_by_name(name, block_type):
+            return block
+        return None
+
+    def find_shared_block(self, block, get_hash=None):
+        """Returns an exported block of the same type as block with the same content hash, or None.
+
+        @param block: The new nif block.
+        @param get_hash: Function returning the content hash of a block, defaults to its C{get_hash} method.
+        @return: The existing identical block, or C{None}."""
+        if get_hash is None:
+            get_hash = self._get_block_hash
+        n_type = type(block)
+        blocks = self._type_to_blocks.get(n_type, ())
+        count_key = (n_type, get_hash)
+        for n_block in blocks[self._shared_counts.get(count_key, 0):]:
+            if type(n_block) is n_type:
+                self.share_block(n_block, get_hash)
+        self._shared_counts[count_key] = len(blocks)
+        key = (n_type, get_hash, get_hash(block))
+        n_block = self._hash_to_block.get(key)
+        # a shared block may have been changed since, then it no longer matches
+        if n_block is not None and n_block is not block and get_hash(n_block) == key[2]:
+            return n_block
+        return None
+
+    def share_block(self, block, get_hash=None):
+        """Makes a registered block available to find_shared_block, keyed by its current content hash. Call it once
+        the block is final, and again if it changes afterwards, else later identical blocks will not find it.
+
+        @param block: The registered nif block.
+        @param get_hash: Function returning the content hash of a block, defaults to its C{get_hash} method."""
+        if get_hash is None:
+            get_hash = self._get_block_hash
+        old_key = self._block_to_hash.pop((block, get_hash), None)
+        if old_key is not None and self._hash_to_block.get(old_key) is block:
+            del self._hash_to_block[old_key]
+        key = (type(block), get_hash, get_hash(block))
+        n_block = self._hash_to_block.get(key)
+        # like a search over all exported blocks, the first registered block that still matches wins
+        if n_block is None or get_hash(n_block) != key[2] or self._block_order[block] < self._block_order[n_block]:
+            self._hash_to_block[key] = block
+        self._block_to_hash[(block, get_hash)] = key
+
+    def intern_block(self, block, b_obj=None, get_hash=None):
+        """Helper function to share identical blocks: returns an already exported block with the same type and
+        content hash as block, or registers and shares block and returns it if there is none. The block must be final,
+        see share_block.
+
+        @param block: The new nif block, not yet registered.
+        @param b_obj: The Blender object to associate with block if it gets registered.
+        @param get_hash: Function returning the content hash of a block, defaults to its C{get_hash} method.
+        @return: The existing identical block, or C{block}."""
+        n_block = self.find_shared_block(block, get_hash)
+        if n_block is not None:
+            return n_block
+        self.register_block(block, b_obj)
+        self.share_block(block, get_hash)
+        return block
+
+    @staticmethod
+    def _get_block_hash(block):
+        return block.get_hash()
+
     def create_block(self, block_type, b_obj=None):
         """Helper function to create a new block, register it in the list of
         exported blocks, and associate it with a Blender object.
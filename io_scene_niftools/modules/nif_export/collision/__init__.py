@@ -37,6 +37,10 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import numpy as np
+
+from io_scene_niftools.modules.nif_export.geometry.snapshot import MeshSnapshot
+
 
 class Collision:
 
@@ -49,11 +53,5 @@ class Collision:
     @staticmethod
     def calculate_box_extents(b_obj):
         # calculate bounding box extents
-        b_vertlist = [vert.co for vert in b_obj.data.vertices]
-        minx = min([b_vert[0] for b_vert in b_vertlist])
-        maxx = max([b_vert[0] for b_vert in b_vertlist])
-        maxy = max([b_vert[1] for b_vert in b_vertlist])
-        miny = min([b_vert[1] for b_vert in b_vertlist])
-        minz = min([b_vert[2] for b_vert in b_vertlist])
-        maxz = max([b_vert[2] for b_vert in b_vertlist])
-        return [[minx, maxx], [miny, maxy], [minz, maxz]]
\ No newline at end of file
+        positions = MeshSnapshot.get_array(b_obj.data.vertices, "co", 3)
+        return np.stack((positions.min(axis=0), positions.max(axis=0)), axis=1).tolist()
\ No newline at end of file
@@ -77,10 +77,9 @@ class Constraint:
                     NifLog.warn(f"Only Oblivion/Fallout/Skyrim rigid body constraints currently supported: Skipping {b_constr}.")
                     continue
                 # check that the object is a rigid body
-                for otherbody, otherobj in block_store.block_to_obj.items():
-                    if isinstance(otherbody, NifFormat.bhkRigidBody) and otherobj is b_obj:
-                        hkbody = otherbody
-                        break
+                for otherbody in block_store.get_blocks_for_obj(b_obj, NifFormat.bhkRigidBody):
+                    hkbody = otherbody
+                    break
                 else:
                     # no collision body for this object
                     raise io_scene_niftools.utils.logging.NifError(f"Object {b_obj.name} has a rigid body constraint, but is not exported as collision object")
@@ -146,10 +145,9 @@ class Constraint:
                     NifLog.warn(f"Constraint {b_constr} has no target, skipped")
                     continue
                 # find target's bhkRigidBody
-                for otherbody, otherobj in block_store.block_to_obj.items():
-                    if isinstance(otherbody, NifFormat.bhkRigidBody) and otherobj == targetobj:
-                        n_bhkconstraint.entities[1] = otherbody
-                        break
+                for otherbody in block_store.get_blocks_for_obj(targetobj, NifFormat.bhkRigidBody):
+                    n_bhkconstraint.entities[1] = otherbody
+                    break
                 else:
                     # not found
                     raise io_scene_niftools.utils.logging.NifError("Rigid body target not exported in nif tree check that {0} is selected during export.".format(targetobj))
@@ -38,11 +38,15 @@
 
 import bpy
 import mathutils
+import numpy as np
 
 from pyffi.formats.nif import NifFormat
 
 import io_scene_niftools.utils.logging
 from io_scene_niftools.modules.nif_export.geometry import mesh
+from io_scene_niftools.modules.nif_export.geometry.mesh.skin_partition import SkinPartition
+from io_scene_niftools.modules.nif_export.geometry.snapshot import MeshSnapshot
+from io_scene_niftools.modules.nif_export.geometry.vertex import Vertex
 from io_scene_niftools.modules.nif_export.animation.morph import MorphAnimation
 from io_scene_niftools.modules.nif_export.block_registry import block_store
 from io_scene_niftools.modules.nif_export.property.object import ObjectProperty
@@ -58,6 +62,8 @@ class Mesh:
         self.texture_helper = NiTextureProp.get()
         self.object_property = ObjectProperty()
         self.morph_anim = MorphAnimation()
+        # geometry data blocks of meshes that are shared between objects, see get_shared_data_key
+        self.shared_data = {}
 
     def export_tri_shapes(self, b_obj, n_parent, trishape_name=None):
         """
@@ -74,9 +80,23 @@ class Mesh:
 
         assert (b_obj.type == 'MESH')
 
-        # get mesh from b_obj
-        b_mesh = self.get_triangulated_mesh(b_obj)
-
+        # linked duplicates reuse the geometry data that was exported for the first of them
+        shared_key = self.get_shared_data_key(b_obj, n_parent)
+        if shared_key in self.shared_data:
+            NifLog.info(f"Sharing geometry data of mesh '{b_obj.data.name}'")
+            return self.export_shared_tri_shapes(b_obj, n_parent, trishape_name, *self.shared_data[shared_key])
+
+        # get mesh from b_obj, with all modifiers applied
+        b_mesh, b_eval_obj = self.get_evaluated_mesh(b_obj)
+        try:
+            return self.export_mesh_tri_shapes(b_obj, b_mesh, n_parent, trishape_name, shared_key)
+        finally:
+            # release the evaluated copy as soon as this object is done
+            if b_eval_obj is not None:
+                b_eval_obj.to_mesh_clear()
+
+    def export_mesh_tri_shapes(self, b_obj, b_mesh, n_parent, trishape_name, shared_key):
+        """Export the (evaluated) mesh b_mesh of b_obj, see export_tri_shapes."""
         # getVertsFromGroup fails if the mesh has no vertices
         # (this happens when checking for fallout 3 body parts)
         # so quickly catch this (rare!) case
@@ -96,71 +116,41 @@ class Mesh:
         if not mesh_materials:
             mesh_materials = [None]
 
+        # read all the mesh data we need in bulk, rather than one attribute at a time
+        snapshot = MeshSnapshot(b_mesh)
+
         # vertex color check
-        mesh_hasvcol = b_mesh.vertex_colors
+        mesh_hasvcol = bool(snapshot.colors)
+        mesh_uv_layers = b_mesh.uv_layers
+        if mesh_uv_layers and not b_mesh.uv_layer_stencil:
+            # if we have uv coordinates double check that we have uv data
+            NifLog.warn(f"No UV map for texture associated with selected mesh '{b_mesh.name}'.")
+
         # list of body part (name, index, vertices) in this mesh
-        bodypartgroups = self.get_body_part_groups(b_obj, b_mesh)
+        bodypartgroups = self.get_body_part_groups(b_obj, b_mesh, snapshot)
 
         # Non-textured materials, vertex colors are used to color the mesh
         # Textured materials, they represent lighting details
 
         # let's now export one trishape for every mesh material
-        # TODO [material] needs refactoring - move material, texture, etc. to separate function
+        # sort the triangles into their materials once
+        material_triangles = snapshot.get_material_triangles(len(mesh_materials))
+        # does the face belong to this trishape?
+        material_chunks = []
         for materialIndex, b_mat in enumerate(mesh_materials):
-
-            mesh_hasnormals = False
             if b_mat is not None:
-                mesh_hasnormals = True  # for proper lighting
-                if (bpy.context.scene.niftools_scene.game == 'SKYRIM') and (b_mat.niftools_shader.bslsp_shaderobjtype == 'Skin Tint'):
-                    mesh_hasnormals = False  # for proper lighting
-
-            # create a trishape block
-            if not NifOp.props.stripify:
-                trishape = block_store.create_block("NiTriShape", b_obj)
-            else:
-                trishape = block_store.create_block("NiTriStrips", b_obj)
-
-            # fill in the NiTriShape's non-trivial values
-            if isinstance(n_parent, NifFormat.RootCollisionNode):
-                trishape.name = ""
+                tris = material_triangles[materialIndex]
             else:
-                if not trishape_name:
-                    if n_parent.name:
-                        trishape.name = "Tri " + n_parent.name.decode()
-                    else:
-                        trishape.name = "Tri " + b_obj.name.decode()
-                else:
-                    trishape.name = trishape_name
-
-                # multimaterial meshes: add material index (Morrowind's child naming convention)
-                if len(mesh_materials) > 1:
-                    trishape.name = f"{trishape.name.decode()}: {materialIndex}"
-                else:
-                    trishape.name = block_store.get_full_name(trishape)
-
-            self.set_mesh_flags(b_obj, trishape)
-
-            # extra shader for Sid Meier's Railroads
-            if bpy.context.scene.niftools_scene.game == 'SID_MEIER_S_RAILROADS':
-                trishape.has_shader = True
-                trishape.shader_name = "RRT_NormalMap_Spec_Env_CubeLight"
-                trishape.unknown_integer = -1  # default
-
-            # if we have an animation of a blender mesh
-            # an intermediate NiNode has been created which holds this b_obj's transform
-            # the trishape itself then needs identity transform (default)
-            if trishape_name is not None:
-                # only export the bind matrix on trishapes that were not animated
-                math.set_object_matrix(b_obj, trishape)
-
-            # check if there is a parent
-            if n_parent:
-                # add texture effect block (must be added as parent of the trishape)
-                n_parent = self.export_texture_effect(n_parent, b_mat)
-                # refer to this mesh in the parent's children list
-                n_parent.add_child(trishape)
+                tris = np.arange(len(snapshot.tri_loops))
+            material_chunks.append((materialIndex, b_mat, tris))
+        # materials that exceed the nif limits may be split into several chunks, which are pushed back in order
+        material_chunks.reverse()
+        # TODO [material] needs refactoring - move material, texture, etc. to separate function
+        material_data = [[] for _ in mesh_materials]
+        while material_chunks:
+            materialIndex, b_mat, tris = material_chunks.pop()
 
-            self.object_property.export_properties(b_obj, b_mat, trishape)
+            mesh_hasnormals = self.has_normals(b_mat)
 
             # -> now comes the real export
 
@@ -182,121 +172,66 @@ class Mesh:
             # The following algorithm extracts all unique quads(vert, uv-vert, normal, vcol),
             # produce lists of vertices, uv-vertices, normals, vertex colors, and face indices.
 
-            mesh_uv_layers = b_mesh.uv_layers
-            vertquad_list = []  # (vertex, uv coordinate, normal, vertex color) list
-            vertmap = [None for _ in range(len(b_mesh.vertices))]  # blender vertex -> nif vertices
-            vertlist = []
-            normlist = []
-            vcollist = []
-            uvlist = []
-            trilist = []
-            # for each face in trilist, a body part index
-            bodypartfacemap = []
-            polygons_without_bodypart = []
-            for poly in b_mesh.polygons:
-
-                # does the face belong to this trishape?
-                if b_mat is not None and poly.material_index != materialIndex:
-                    # we have a material but this face has another material, so skip
+            # gather the face corners of these triangles, in triangle order
+            corner_loops = snapshot.tri_loops[tris].ravel()
+            corner_vertices = snapshot.loop_vertices[corner_loops]
+            corner_data = []
+            if mesh_hasnormals:
+                # split normals: smooth = vertex normal, non-smooth = face normal
+                corner_normals = snapshot.loop_normals[corner_loops]
+                corner_data.append(corner_normals)
+            if mesh_uv_layers:
+                corner_uvs = np.concatenate([uv_layer[corner_loops] for uv_layer in snapshot.uv_layers], axis=1)
+                corner_data.append(corner_uvs)
+            if mesh_hasvcol:
+                corner_cols = snapshot.colors[0][corner_loops]
+                corner_data.append(corner_cols)
+
+            # find the unique (vert, uv-vert, normal, vcol) quads and map each face corner to one of them
+            unique_corners, corner_remap = Vertex.deduplicate(corner_vertices, corner_data, NifOp.props.epsilon)
+            num_triangles = len(tris)
+            if len(unique_corners) > 65536 or num_triangles > 65535:
+                if NifOp.props.split_geometry and num_triangles > 1:
+                    NifLog.info(f"Splitting {len(unique_corners)} vertices and {num_triangles} triangles of {b_obj.name}")
+                    for chunk in reversed(self.split_triangles(snapshot, tris)):
+                        material_chunks.append((materialIndex, b_mat, chunk))
                     continue
+                if len(unique_corners) > 65536:
+                    raise io_scene_niftools.utils.logging.NifError("Too many vertices. Decimate your mesh and try again.")
+                raise io_scene_niftools.utils.logging.NifError("Too many polygons. Decimate your mesh and try again.")
 
-                f_numverts = len(poly.vertices)
-                if f_numverts < 3:
-                    continue  # ignore degenerate polygons
-                assert ((f_numverts == 3) or (f_numverts == 4))  # debug
-                if mesh_uv_layers:
-                    # if we have uv coordinates double check that we have uv data
-                    if not b_mesh.uv_layer_stencil:
-                        NifLog.warn(f"No UV map for texture associated with poly {poly.index:s} of selected mesh '{b_mesh.name}'.")
-
-                # find (vert, uv-vert, normal, vcol) quad, and if not found, create it
-                f_index = [-1] * f_numverts
-                for i, loop_index in enumerate(range(poly.loop_start, poly.loop_start + poly.loop_total)):
-
-                    fv_index = b_mesh.loops[loop_index].vertex_index
-                    vertex = b_mesh.vertices[fv_index]
-                    vertex_index = vertex.index
-                    fv = vertex.co
-
-                    # smooth = vertex normal, non-smooth = face normal)
-                    if mesh_hasnormals:
-                        if poly.use_smooth:
-                            fn = vertex.normal
-                        else:
-                            fn = poly.normal
-                    else:
-                        fn = None
-
-                    fuv = [uv_layer.data[loop_index].uv for uv_layer in b_mesh.uv_layers]
-
-                    # TODO [geomotry][mesh] Need to map b_verts -> n_verts
-                    if mesh_hasvcol:
-                        f_col = list(b_mesh.vertex_colors[0].data[loop_index].color)
-                    else:
-                        f_col = None
-
-                    vertquad = (fv, fuv, fn, f_col)
-
-                    # check for duplicate vertquad?
-                    f_index[i] = len(vertquad_list)
-                    if vertmap[vertex_index] is not None:
-                        # iterate only over vertices with the same vertex index
-                        for j in vertmap[vertex_index]:
-                            # check if they have the same uvs, normals and colors
-                            if self.is_new_face_corner_data(vertquad, vertquad_list[j]):
-                                continue
-                            # all tests passed: so yes, we already have a vert with the same face corner data!
-                            f_index[i] = j
-                            break
-
-                    if f_index[i] > 65535:
-                        raise io_scene_niftools.utils.logging.NifError("Too many vertices. Decimate your mesh and try again.")
-
-                    if f_index[i] == len(vertquad_list):
-                        # first: add it to the vertex map
-                        if not vertmap[vertex_index]:
-                            vertmap[vertex_index] = []
-                        vertmap[vertex_index].append(len(vertquad_list))
-                        # new (vert, uv-vert, normal, vcol) quad: add it
-                        vertquad_list.append(vertquad)
-
-                        # add the vertex
-                        vertlist.append(vertquad[0])
-                        if mesh_hasnormals:
-                            normlist.append(vertquad[2])
-                        if mesh_hasvcol:
-                            vcollist.append(vertquad[3])
-                        if mesh_uv_layers:
-                            uvlist.append(vertquad[1])
-
-                # now add the (hopefully, convex) face, in triangles
-                for i in range(f_numverts - 2):
-                    if (b_obj.scale.x + b_obj.scale.y + b_obj.scale.z) > 0:
-                        f_indexed = (f_index[0], f_index[1 + i], f_index[2 + i])
-                    else:
-                        f_indexed = (f_index[0], f_index[2 + i], f_index[1 + i])
-                    trilist.append(f_indexed)
-
-                    # add body part number
-                    if bpy.context.scene.niftools_scene.game not in ('FALLOUT_3', 'SKYRIM') or not bodypartgroups:
-                        # TODO: or not self.EXPORT_FO3_BODYPARTS):
-                        bodypartfacemap.append(0)
-                    else:
-                        for bodypartname, bodypartindex, bodypartverts in bodypartgroups:
-                            if set(b_vert_index for b_vert_index in poly.vertices) <= bodypartverts:
-                                bodypartfacemap.append(bodypartindex)
-                                break
-                        else:
-                            # this signals an error
-                            polygons_without_bodypart.append(poly)
+            chunk_index = len(material_data[materialIndex])
+            trishape, n_parent = self.create_tri_shape(b_obj, n_parent, trishape_name, b_mat, materialIndex, len(mesh_materials), chunk_index)
+            vertmap = Vertex.get_vertex_map(corner_vertices[unique_corners], snapshot.num_vertices)
+
+            # now add the faces, in triangles
+            tri_corners = np.arange(len(corner_loops)).reshape(-1, 3)
+            if (b_obj.scale.x + b_obj.scale.y + b_obj.scale.z) <= 0:
+                tri_corners = tri_corners[:, (0, 2, 1)]
+            trilist = [tuple(tri) for tri in corner_remap[tri_corners].tolist()]
+
+            # for each face in trilist, a body part index
+            bodypartfacemap = [0] * len(trilist)
+            polygons_without_bodypart = []
+            if bpy.context.scene.niftools_scene.game in ('FALLOUT_3', 'SKYRIM') and bodypartgroups:
+                # TODO: or not self.EXPORT_FO3_BODYPARTS):
+                # a face belongs to the first body part that contains all its vertices
+                in_bodypart = np.zeros((snapshot.num_vertices, len(bodypartgroups)), dtype=bool)
+                for i, (bodypartname, bodypartindex, bodypartverts) in enumerate(bodypartgroups):
+                    in_bodypart[list(bodypartverts), i] = True
+                polys, tri_polys = np.unique(snapshot.tri_polys[tris], return_inverse=True)
+                poly_loops, _, poly_starts = self.get_polygon_corners(snapshot.poly_starts[polys], snapshot.poly_totals[polys])
+                poly_in_bodypart = np.logical_and.reduceat(in_bodypart[snapshot.loop_vertices[poly_loops]], poly_starts, axis=0)
+                poly_bodypart = np.array([bodypartindex for _, bodypartindex, _ in bodypartgroups])[poly_in_bodypart.argmax(axis=1)]
+                bodypartfacemap = poly_bodypart[tri_polys].tolist()
+                # this signals an error
+                polygons_without_bodypart = [b_mesh.polygons[i] for i in polys[~poly_in_bodypart.any(axis=1)].tolist()]
 
             # check that there are no missing body part polygons
             if polygons_without_bodypart:
                 self.select_unassigned_polygons(b_mesh, b_obj, polygons_without_bodypart)
 
-            if len(trilist) > 65535:
-                raise io_scene_niftools.utils.logging.NifError("Too many polygons. Decimate your mesh and try again.")
-            if len(vertlist) == 0:
+            if len(unique_corners) == 0:
                 continue  # m_4444x: skip 'empty' material indices
 
             # add NiTriShape's data
@@ -307,24 +242,25 @@ class Mesh:
             trishape.data = tridata
 
             # data
-            tridata.num_vertices = len(vertlist)
+            tridata.num_vertices = len(unique_corners)
             tridata.has_vertices = True
             tridata.vertices.update_size()
-            for i, v in enumerate(tridata.vertices):
-                v.x, v.y, v.z = vertlist[i]
+            vertices = snapshot.positions[corner_vertices[unique_corners]]
+            for v, co in zip(tridata.vertices, vertices.tolist()):
+                v.x, v.y, v.z = co
             tridata.update_center_radius()
 
             if mesh_hasnormals:
                 tridata.has_normals = True
                 tridata.normals.update_size()
-                for i, v in enumerate(tridata.normals):
-                    v.x, v.y, v.z = normlist[i]
+                for v, no in zip(tridata.normals, corner_normals[unique_corners].tolist()):
+                    v.x, v.y, v.z = no
 
             if mesh_hasvcol:
                 tridata.has_vertex_colors = True
                 tridata.vertex_colors.update_size()
-                for i, v in enumerate(tridata.vertex_colors):
-                    v.r, v.g, v.b, v.a = vcollist[i]
+                for v, col in zip(tridata.vertex_colors, corner_cols[unique_corners].tolist()):
+                    v.r, v.g, v.b, v.a = col
 
             if mesh_uv_layers:
                 tridata.num_uv_sets = len(mesh_uv_layers)
@@ -334,13 +270,12 @@ class Mesh:
                         raise io_scene_niftools.utils.logging.NifError("Fallout 3 does not support multiple UV layers")
                 tridata.has_uv = True
                 tridata.uv_sets.update_size()
+                unique_uvs = corner_uvs[unique_corners]
                 for j, uv_layer in enumerate(mesh_uv_layers):
-                    for i, uv in enumerate(tridata.uv_sets[j]):
-                        if len(uvlist[i]) == 0:
-                            continue  # skip non-uv textures
-                        uv.u = uvlist[i][j][0]
+                    for uv, (u, v) in zip(tridata.uv_sets[j], unique_uvs[:, 2 * j:2 * j + 2].tolist()):
+                        uv.u = u
                         # NIF flips the texture V-coordinate (OpenGL standard)
-                        uv.v = 1.0 - uvlist[i][j][1]  # opengl standard
+                        uv.v = 1.0 - v  # opengl standard
 
             # set triangles stitch strips for civ4
             tridata.set_triangles(trilist, stitchstrips=NifOp.props.stitch_strips)
@@ -348,9 +283,10 @@ class Mesh:
             # update tangent space (as binary extra data only for Oblivion)
             # for extra shader texture games, only export it if those textures are actually exported
             # (civ4 seems to be consistent with not using tangent space on non shadered nifs)
-            if mesh_uv_layers and mesh_hasnormals:
-                if bpy.context.scene.niftools_scene.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM') or (bpy.context.scene.niftools_scene.game in self.texture_helper.USED_EXTRA_SHADER_TEXTURES):
-                    trishape.update_tangent_space(as_extra=(bpy.context.scene.niftools_scene.game == 'OBLIVION'))
+            has_tangent_space = mesh_uv_layers and mesh_hasnormals and self.has_tangent_space()
+            if has_tangent_space:
+                trishape.update_tangent_space(as_extra=(bpy.context.scene.niftools_scene.game == 'OBLIVION'))
+            material_data[materialIndex].append((tridata, has_tangent_space))
 
             # todo [mesh/object] use more sophisticated armature finding, also taking armature modifier into account
             # now export the vertex weights, if there are any
@@ -366,80 +302,51 @@ class Mesh:
                     skininst, skindata = self.create_skin_inst_data(b_obj, n_root_name, bodypartgroups)
                     trishape.skin_instance = skininst
 
-                    # Vertex weights,  find weights and normalization factors
-                    vert_list = {}
-                    vert_norm = {}
-                    unweighted_vertices = []
+                    # gather the bone weights of all vertices at once, as a sparse vertex by bone matrix
+                    # with the bones in boneinfluences order, which is the order of the bones in NiSkinData
+                    bone_groups = [b_obj.vertex_groups[b_bone_name] for b_bone_name in boneinfluences]
+                    vertex_groups = snapshot.get_vertex_groups(b_mesh)
+                    self.select_unweighted_vertices(np.flatnonzero(vertex_groups.row_counts == 0))
+                    group_to_bone = np.full(len(b_obj.vertex_groups), -1)
+                    for bone_index, b_group in enumerate(bone_groups):
+                        group_to_bone[b_group.index] = bone_index
 
-                    for bone_group in boneinfluences:
-                        b_list_weight = []
-                        b_vert_group = b_obj.vertex_groups[bone_group]
-
-                        for b_vert in b_mesh.vertices:
-                            if len(b_vert.groups) == 0:  # check vert has weight_groups
-                                unweighted_vertices.append(b_vert)
-                                continue
-
-                            for g in b_vert.groups:
-                                if b_vert_group.name in boneinfluences:
-                                    if g.group == b_vert_group.index:
-                                        b_list_weight.append((b_vert.index, g.weight))
-                                        break
-
-                        vert_list[bone_group] = b_list_weight
-
-                        # create normalisation groupings
-                        for v in vert_list[bone_group]:
-                            if v[0] in vert_norm:
-                                vert_norm[v[0]] += v[1]
-                            else:
-                                vert_norm[v[0]] = v[1]
-
-                    self.select_unweighted_vertices(unweighted_vertices)
+                    # normalize the weights per vertex, then export the same weights as the original vertex
+                    # for each of the nif vertices it was mapped to
+                    bone_weights = vertex_groups.select_columns(group_to_bone).normalized()
+                    bone_weights = bone_weights.take_rows(corner_vertices[unique_corners])
 
                     # for each bone, first we get the bone block then we get the vertex weights and then we add it to the NiSkinData
-                    # note: allocate memory for faster performance
-                    vert_added = [False for _ in range(len(vertlist))]
-                    for b_bone_name in boneinfluences:
-                        # find bone in exported blocks
-                        bone_block = self.get_bone_block(b_obj_armature.data.bones[b_bone_name])
-
-                        # find vertex weights
-                        vert_weights = {}
-                        for v in vert_list[b_bone_name]:
-                            # v[0] is the original vertex index
-                            # v[1] is the weight
-
-                            # vertmap[v[0]] is the set of vertices (indices) to which v[0] was mapped
-                            # so we simply export the same weight as the original vertex for each new vertex
-
-                            # write the weights
-                            # extra check for multi material meshes
-                            if vertmap[v[0]] and vert_norm[v[0]]:
-                                for vert_index in vertmap[v[0]]:
-                                    vert_weights[vert_index] = v[1] / vert_norm[v[0]]
-                                    vert_added[vert_index] = True
+                    bone_vertices = []
+                    skin_bones = np.full(len(bone_groups), -1)
+                    for bone_index, (n_vert_indices, n_weights) in enumerate(bone_weights.get_columns(len(bone_groups))):
                         # add bone as influence, but only if there were actually any vertices influenced by the bone
-                        if vert_weights:
-                            trishape.add_bone(bone_block, vert_weights)
+                        if not len(n_vert_indices):
+                            continue
+                        b_group = bone_groups[bone_index]
+                        skin_bones[bone_index] = len(bone_vertices)
+                        # find bone in exported blocks
+                        bone_block = self.get_bone_block(b_obj_armature.data.bones[b_group.name])
+                        trishape.add_bone(bone_block, dict(zip(n_vert_indices.tolist(), n_weights.tolist())))
+                        bone_vertices.append(n_vert_indices)
 
                     # update bind position skinning data
                     trishape.update_bind_position()
 
                     # calculate center and radius for each skin bone data block
-                    trishape.update_skin_center_radius()
+                    self.update_skin_center_radius(skindata, vertices, bone_vertices)
 
                     if NifData.data.version >= 0x04020100 and NifOp.props.skin_partition:
                         NifLog.info("Creating skin partition")
-                        lostweight = trishape.update_skin_partition(
-                            maxbonesperpartition=NifOp.props.max_bones_per_partition,
-                            maxbonespervertex=NifOp.props.max_bones_per_vertex,
+                        skin_partition = SkinPartition(
+                            max_bones_per_partition=NifOp.props.max_bones_per_partition,
+                            max_bones_per_vertex=NifOp.props.max_bones_per_vertex,
                             stripify=NifOp.props.stripify,
-                            stitchstrips=NifOp.props.stitch_strips,
-                            padbones=NifOp.props.pad_bones,
-                            triangles=trilist,
-                            trianglepartmap=bodypartfacemap,
+                            stitch_strips=NifOp.props.stitch_strips,
+                            pad_bones=NifOp.props.pad_bones,
                             maximize_bone_sharing=(bpy.context.scene.niftools_scene.game in ('FALLOUT_3', 'SKYRIM')))
+                        lostweight = skin_partition.export_skin_partition(
+                            trishape, bone_weights.select_columns(skin_bones), trilist, bodypartfacemap)
 
                         # warn on bad config settings
                         if bpy.context.scene.niftools_scene.game == 'OBLIVION':
@@ -467,51 +374,181 @@ class Mesh:
                                     s_part.part_flag.pf_start_net_boneset = b_part.pf_startflag
                                     s_part.part_flag.pf_editor_visible = b_part.pf_editorflag
 
-                    # clean up
-                    del vert_weights
-                    del vert_added
-
             # fix data consistency type
             tridata.consistency_flags = b_obj.niftools.consistency_flags
 
             # export EGM or NiGeomMorpherController animation
             self.morph_anim.export_morph(b_mesh, trishape, vertmap)
+
+        if shared_key is not None:
+            self.shared_data[shared_key] = (list(mesh_materials), material_data)
         return trishape
 
+    def export_shared_tri_shapes(self, b_obj, n_parent, trishape_name, mesh_materials, material_data):
+        """Export a blender object whose mesh has already been exported for another object, as NiTriShape blocks
+        that refer to the geometry data blocks of that object."""
+        trishape = None
+        for materialIndex, b_mat in enumerate(mesh_materials):
+            if not material_data[materialIndex]:
+                # m_4444x: skip 'empty' material indices
+                trishape, n_parent = self.create_tri_shape(b_obj, n_parent, trishape_name, b_mat, materialIndex, len(mesh_materials))
+                continue
+            for chunk_index, (tridata, has_tangent_space) in enumerate(material_data[materialIndex]):
+                trishape, n_parent = self.create_tri_shape(b_obj, n_parent, trishape_name, b_mat, materialIndex, len(mesh_materials), chunk_index)
+                trishape.data = tridata
+                # tangent space is stored on the shared data, except for Oblivion, where it is extra data of the trishape
+                if has_tangent_space and bpy.context.scene.niftools_scene.game == 'OBLIVION':
+                    trishape.update_tangent_space(as_extra=True)
+        return trishape
+
+    def get_shared_data_key(self, b_obj, n_parent):
+        """Returns a key for the geometry data that is exported for b_obj, so that objects which share their mesh
+        can share the geometry data too, or None if the geometry data depends on more than the mesh."""
+        b_mesh = b_obj.data
+        if b_mesh.users < 2:
+            return None
+        # skin, body parts and morphs are exported per object
+        if b_obj.vertex_groups or b_mesh.shape_keys:
+            return None
+        # modifiers can only be shared if they do not depend on other objects
+        modifiers = []
+        for b_mod in b_obj.modifiers:
+            settings = []
+            for prop in b_mod.bl_rna.properties:
+                if prop.identifier in ('rna_type', 'name', 'show_expanded', 'is_active', 'execution_time', 'persistent_uid'):
+                    continue
+                value = getattr(b_mod, prop.identifier)
+                if prop.type in ('POINTER', 'COLLECTION'):
+                    if value:
+                        return None
+                    continue
+                if isinstance(value, set):
+                    value = frozenset(value)
+                elif getattr(prop, "is_array", False):
+                    value = tuple(value)
+                settings.append(value)
+            modifiers.append(tuple(settings))
+        materials = tuple(b_slot.material for b_slot in b_obj.material_slots)
+        is_collision = isinstance(n_parent, NifFormat.RootCollisionNode)
+        flip_winding = (b_obj.scale.x + b_obj.scale.y + b_obj.scale.z) <= 0
+        return b_mesh, tuple(modifiers), materials, is_collision, flip_winding, b_obj.niftools.consistency_flags
+
+    def create_tri_shape(self, b_obj, n_parent, trishape_name, b_mat, materialIndex, num_materials, chunk_index=0):
+        """Create the NiTriShape block for one material of b_obj, with its name, flags, transform and properties.
+        Returns the trishape and its parent block."""
+        # create a trishape block
+        if not NifOp.props.stripify:
+            trishape = block_store.create_block("NiTriShape", b_obj)
+        else:
+            trishape = block_store.create_block("NiTriStrips", b_obj)
+
+        # fill in the NiTriShape's non-trivial values
+        if isinstance(n_parent, NifFormat.RootCollisionNode):
+            trishape.name = ""
+        else:
+            if not trishape_name:
+                if n_parent.name:
+                    trishape.name = "Tri " + n_parent.name.decode()
+                else:
+                    trishape.name = "Tri " + b_obj.name.decode()
+            else:
+                trishape.name = trishape_name
+
+            # multimaterial meshes: add material index (Morrowind's child naming convention)
+            if num_materials > 1:
+                trishape.name = f"{trishape.name.decode()}: {materialIndex}"
+            else:
+                trishape.name = block_store.get_full_name(trishape)
+
+            # further chunks of a material that was split to stay within the nif limits
+            if chunk_index:
+                trishape.name = f"{trishape.name.decode()}.{chunk_index:03}"
+
+        self.set_mesh_flags(b_obj, trishape)
+
+        # extra shader for Sid Meier's Railroads
+        if bpy.context.scene.niftools_scene.game == 'SID_MEIER_S_RAILROADS':
+            trishape.has_shader = True
+            trishape.shader_name = "RRT_NormalMap_Spec_Env_CubeLight"
+            trishape.unknown_integer = -1  # default
+
+        # if we have an animation of a blender mesh
+        # an intermediate NiNode has been created which holds this b_obj's transform
+        # the trishape itself then needs identity transform (default)
+        if trishape_name is not None:
+            # only export the bind matrix on trishapes that were not animated
+            math.set_object_matrix(b_obj, trishape)
+
+        # check if there is a parent
+        if n_parent:
+            # add texture effect block (must be added as parent of the trishape)
+            n_parent = self.export_texture_effect(n_parent, b_mat)
+            # refer to this mesh in the parent's children list
+            n_parent.add_child(trishape)
+
+        self.object_property.export_properties(b_obj, b_mat, trishape)
+        return trishape, n_parent
+
+    @staticmethod
+    def has_normals(b_mat):
+        """Whether geometry with this material needs normals, for proper lighting."""
+        mesh_hasnormals = False
+        if b_mat is not None:
+            mesh_hasnormals = True  # for proper lighting
+            if (bpy.context.scene.niftools_scene.game == 'SKYRIM') and (b_mat.niftools_shader.bslsp_shaderobjtype == 'Skin Tint'):
+                mesh_hasnormals = False  # for proper lighting
+        return mesh_hasnormals
+
+    def has_tangent_space(self):
+        """Whether tangent space is exported for textured geometry with normals."""
+        return bpy.context.scene.niftools_scene.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM') or (bpy.context.scene.niftools_scene.game in self.texture_helper.USED_EXTRA_SHADER_TEXTURES)
+
     def get_bone_block(self, b_bone):
         """For a blender bone, return the corresponding nif node from the blocks that have already been exported"""
-        for n_block, b_obj in block_store.block_to_obj.items():
-            if isinstance(n_block, NifFormat.NiNode) and b_bone == b_obj:
-                return n_block
+        for n_block in block_store.get_blocks_for_obj(b_bone, NifFormat.NiNode):
+            return n_block
         raise io_scene_niftools.utils.logging.NifError(f"Bone '{b_bone.name}' not found.")
 
-    def get_body_part_groups(self, b_obj, b_mesh):
+    def get_body_part_groups(self, b_obj, b_mesh, snapshot):
         """Returns a set of vertices (no dupes) for each body part"""
         bodypartgroups = []
         for bodypartgroupname in NifFormat.BSDismemberBodyPartType().get_editor_keys():
             vertex_group = b_obj.vertex_groups.get(bodypartgroupname)
-            vertices_list = set()
             if vertex_group:
-                for b_vert in b_mesh.vertices:
-                    for b_groupname in b_vert.groups:
-                        if b_groupname.group == vertex_group.index:
-                            vertices_list.add(b_vert.index)
+                vertex_groups = snapshot.get_vertex_groups(b_mesh)
+                vertices_list = set(vertex_groups.rows[vertex_groups.columns == vertex_group.index].tolist())
                 NifLog.debug(f"Found body part {bodypartgroupname}")
                 bodypartgroups.append(
                     [bodypartgroupname, getattr(NifFormat.BSDismemberBodyPartType, bodypartgroupname), vertices_list])
         return bodypartgroups
 
+    @staticmethod
+    def update_skin_center_radius(skindata, vertices, bone_vertices):
+        """Update the bounding sphere of every bone in the skin data from the (nif) vertices that it influences."""
+        for skindatablock, indices in zip(skindata.bone_list, bone_vertices):
+            bone_verts = vertices[indices].astype(np.float64)
+
+            # center is in the center of the bounding box, radius is the largest distance from the center
+            center = (bone_verts.min(axis=0) + bone_verts.max(axis=0)) * 0.5
+            radius = np.sqrt(((bone_verts - center) ** 2).sum(axis=1).max())
+
+            # transform center in proper coordinates (radius remains unaffected)
+            n_center = NifFormat.Vector3()
+            n_center.x, n_center.y, n_center.z = center.tolist()
+            n_center *= skindatablock.get_transform()
+
+            skindatablock.bounding_sphere_offset.x = n_center.x
+            skindatablock.bounding_sphere_offset.y = n_center.y
+            skindatablock.bounding_sphere_offset.z = n_center.z
+            skindatablock.bounding_sphere_radius = float(radius)
+
     def create_skin_inst_data(self, b_obj, n_root_name, bodypartgroups):
         if bpy.context.scene.niftools_scene.game in ('FALLOUT_3', 'SKYRIM') and bodypartgroups:
             skininst = block_store.create_block("BSDismemberSkinInstance", b_obj)
         else:
             skininst = block_store.create_block("NiSkinInstance", b_obj)
-        for block in block_store.block_to_obj:
-            if isinstance(block, NifFormat.NiNode):
-                if block.name.decode() == n_root_name:
-                    skininst.skeleton_root = block
-                    break
-        else:
+        skininst.skeleton_root = block_store.get_block_by_name(n_root_name)
+        if not skininst.skeleton_root:
             raise io_scene_niftools.utils.logging.NifError(f"Skeleton root '{n_root_name}' not found.")
 
         # create skinning data and link it
@@ -589,24 +626,25 @@ class Mesh:
         raise NifError("Some polygons of {0} not assigned to any body part."
                        "The unassigned polygons have been selected in the mesh so they can easily be identified.".format(b_obj))
 
-    def is_new_face_corner_data(self, vertquad, v_quad_old):
-        """Compares vert info to old vert info if relevant data is present"""
-        # uvs
-        if v_quad_old[1]:
-            for i in range(2):
-                if max(abs(vertquad[1][uv_index][i] - v_quad_old[1][uv_index][i]) for uv_index in
-                       range(len(v_quad_old[1]))) > NifOp.props.epsilon:
-                    return True
-        # normals
-        if v_quad_old[2]:
-            for i in range(3):
-                if abs(vertquad[2][i] - v_quad_old[2][i]) > NifOp.props.epsilon:
-                    return True
-        # vcols
-        if v_quad_old[3]:
-            for i in range(4):
-                if abs(vertquad[3][i] - v_quad_old[3][i]) > NifOp.props.epsilon:
-                    return True
+    @staticmethod
+    def get_polygon_corners(loop_starts, loop_totals):
+        """Returns the loop index and local polygon index of every face corner of the given polygons,
+        and the position of each polygon's first corner in those arrays."""
+        corner_starts = np.zeros(len(loop_totals), dtype=np.int64)
+        np.cumsum(loop_totals[:-1], out=corner_starts[1:])
+        corner_polys = np.repeat(np.arange(len(loop_totals)), loop_totals)
+        corner_loops = np.arange(corner_polys.size) - corner_starts[corner_polys] + np.asarray(loop_starts)[corner_polys]
+        return corner_loops, corner_polys, corner_starts
+
+    @staticmethod
+    def split_triangles(snapshot, tris):
+        """Split triangles into two spatially coherent halves, at the median of their centers along the longest axis."""
+        centers = snapshot.positions[snapshot.loop_vertices[snapshot.tri_loops[tris]]].astype(np.float64).mean(axis=1)
+        axis = np.ptp(centers, axis=0).argmax()
+        order = np.argsort(centers[:, axis], kind='stable')
+        half = len(tris) // 2
+        # keep the original triangle order within each half
+        return tris[np.sort(order[:half])], tris[np.sort(order[half:])]
 
     def export_texture_effect(self, n_block, b_mat):
         # todo [texture] detect effect
@@ -626,25 +664,21 @@ class Mesh:
             return extra_node
         return n_block
 
-    def get_triangulated_mesh(self, b_obj):
+    @staticmethod
+    def get_evaluated_mesh(b_obj):
+        """Returns the mesh of b_obj with all modifiers applied, and the evaluated object that owns it,
+        on which to_mesh_clear must be called once the mesh is no longer needed, or None if it is b_obj's own mesh."""
         # get the armature influencing this mesh, if it exists
         b_armature_obj = b_obj.find_armature()
         if b_armature_obj:
             for pbone in b_armature_obj.pose.bones:
                 pbone.matrix_basis = mathutils.Matrix()
 
-        # make sure the model has a triangulation modifier
-        self.ensure_tri_modifier(b_obj)
+        # nothing to evaluate, so avoid the copy
+        if not (b_obj.modifiers or b_armature_obj or b_obj.data.shape_keys):
+            return b_obj.data, None
 
-        # make a copy with all modifiers applied
+        # make a temporary copy with all modifiers applied
         dg = bpy.context.evaluated_depsgraph_get()
-        eval_obj = b_obj.evaluated_get(dg)
-        return eval_obj.to_mesh(preserve_all_data_layers=True, depsgraph=dg)
-
-    def ensure_tri_modifier(self, b_obj):
-        """Makes sure that ob has a triangulation modifier in its stack."""
-        for mod in b_obj.modifiers:
-            if mod.type in ('TRIANGULATE',):
-                break
-        else:
-            b_obj.modifiers.new('Triangulate', 'TRIANGULATE')
\ No newline at end of file
+        b_eval_obj = b_obj.evaluated_get(dg)
+        return b_eval_obj.to_mesh(preserve_all_data_layers=True, depsgraph=dg), b_eval_obj
\ No newline at end of file
@@ -0,0 +1,334 @@
+"""This module contains helper methods to export skin partitions."""
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+
+import numpy as np
+
+import pyffi.utils.vertex_cache
+from pyffi.formats.nif import NifFormat
+
+from io_scene_niftools.modules.nif_export.block_registry import block_store
+from io_scene_niftools.utils.logging import NifLog, NifError
+
+
+class SkinPartition:
+    """Splits a skinned trishape into NiSkinPartition blocks.
+
+    Works directly on the vertex weight arrays: triangles are grouped by the set of bones that influence them, and
+    these groups are then packed greedily into partitions, so the cost stays linear in the number of triangles.
+    """
+
+    def __init__(self, max_bones_per_partition, max_bones_per_vertex, stripify=False, stitch_strips=False,
+                 pad_bones=False, maximize_bone_sharing=False):
+        self.max_bones_per_partition = max_bones_per_partition
+        self.max_bones_per_vertex = max_bones_per_vertex
+        self.stripify = stripify
+        self.stitch_strips = stitch_strips
+        self.pad_bones = pad_bones
+        self.maximize_bone_sharing = maximize_bone_sharing
+
+    def export_skin_partition(self, trishape, vertex_weights, triangles, triangle_parts=None):
+        """Create the skin partition of a skinned trishape.
+
+        :param trishape: The skinned NiTriShape, its skin instance and data must have all bones added.
+        :param vertex_weights: VertexWeights of the trishape's vertices, with skin bone indices as columns.
+        :param triangles: The triangles of the trishape, shape (n, 3).
+        :param triangle_parts: The body part of each triangle; triangles of different parts never share a partition.
+        :return: The largest weight that was dropped to meet the bone limits.
+        """
+        skininst = trishape.skin_instance
+        skindata = skininst.data
+        triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        if triangle_parts is None:
+            triangle_parts = np.zeros(len(triangles), dtype=np.int64)
+        triangle_parts = np.asarray(triangle_parts, dtype=np.int64)
+
+        bones, weights, lostweight = self.limit_vertex_influences(vertex_weights)
+        lostweight = max(lostweight, self.limit_triangle_influences(bones, weights, triangles))
+        parts = self.get_partitions(bones, triangles, triangle_parts)
+        if self.maximize_bone_sharing:
+            parts = self.share_bones(parts)
+        NifLog.info(f"Skin has {len(parts)} partitions")
+
+        skinpart = block_store.create_block("NiSkinPartition")
+        skindata.skin_partition = skinpart
+        skininst.skin_partition = skinpart
+        skinpart.num_skin_partition_blocks = len(parts)
+        skinpart.skin_partition_blocks.update_size()
+
+        # for Fallout 3 and Skyrim, set dismember partition indices
+        if isinstance(skininst, NifFormat.BSDismemberSkinInstance):
+            skininst.num_partitions = len(parts)
+            skininst.partitions.update_size()
+            last_bone_set = None
+            for bodypart, (part_index, bone_set, _) in zip(skininst.partitions, parts):
+                bodypart.body_part = part_index
+                # start new bone set, if bones are not shared
+                bodypart.part_flag.pf_start_net_boneset = last_bone_set is None or last_bone_set != bone_set
+                # default flags, as pyffi sets them; the part flags stored on the Blender object override these
+                # caps are invisible: section caps start at 100 (BP_SECTIONCAP_*), torso caps at 200
+                # (BP_TORSOCAP_*), while torso sections from 1000 on (BP_TORSOSECTION_*) are visible again
+                bodypart.part_flag.pf_editor_visible = part_index < 100 or part_index >= 1000
+                last_bone_set = bone_set
+
+        for skinpartblock, (_, bone_set, part_triangles) in zip(skinpart.skin_partition_blocks, parts):
+            self.export_skin_partition_block(skinpartblock, sorted(bone_set), triangles[part_triangles], bones, weights)
+        return lostweight
+
+    def limit_vertex_influences(self, vertex_weights):
+        """Keep the strongest influences of each vertex, and renormalize.
+
+        :return: Dense (n, max_bones_per_vertex) arrays of bone indices (-1 for unused slots) and weights, sorted by
+                 decreasing weight, and the largest weight that was dropped.
+        """
+        rows = vertex_weights.rows
+        # sort each row by decreasing weight
+        order = np.lexsort((-vertex_weights.weights, rows))
+        rows = rows[order]
+        rank = np.arange(len(order)) - vertex_weights.indptr[rows]
+        keep = rank < self.max_bones_per_vertex
+        lostweight = vertex_weights.weights[order][~keep].max(initial=0.0)
+
+        bones = np.full((vertex_weights.num_rows, self.max_bones_per_vertex), -1, dtype=np.int64)
+        weights = np.zeros((vertex_weights.num_rows, self.max_bones_per_vertex), dtype=np.float64)
+        bones[rows[keep], rank[keep]] = vertex_weights.columns[order][keep]
+        weights[rows[keep], rank[keep]] = vertex_weights.weights[order][keep]
+        self.normalize(weights)
+
+        unweighted = np.flatnonzero(bones[:, 0] < 0)
+        if len(unweighted):
+            NifLog.warn(f"Skin has {len(unweighted)} vertices without weights")
+        return bones, weights, lostweight
+
+    def limit_triangle_influences(self, bones, weights, triangles):
+        """Remove the weakest bones from triangles that are influenced by more bones than a partition may hold.
+
+        :return: The largest weight that was dropped.
+        """
+        lostweight = 0.0
+        for tri in np.flatnonzero(self.get_bone_counts(bones[triangles]) > self.max_bones_per_partition).tolist():
+            verts = triangles[tri]
+            while True:
+                tri_bones = bones[verts]
+                tri_weights = weights[verts]
+                bone_set = np.unique(tri_bones[tri_bones >= 0])
+                if len(bone_set) <= self.max_bones_per_partition:
+                    break
+                # bones that are the only influence of a vertex cannot be removed
+                nono = tri_bones[(tri_bones >= 0).sum(axis=1) == 1, 0]
+                candidates = np.setdiff1d(bone_set, nono)
+                if not len(candidates):
+                    raise NifError("Cannot remove anymore bones in this skin; "
+                                   "increase the maximum bones per partition and try again.")
+                # remove the bone that least influences this triangle
+                influence = np.array([tri_weights[tri_bones == bone].sum() for bone in candidates.tolist()])
+                min_bone = candidates[influence.argmin()]
+                removed = bones[verts] == min_bone
+                lostweight = max(lostweight, weights[verts][removed].max(initial=0.0))
+                for vert, slots in zip(verts.tolist(), removed):
+                    if slots.any():
+                        self.remove_influences(bones, weights, vert, slots)
+        return lostweight
+
+    @staticmethod
+    def remove_influences(bones, weights, vert, slots):
+        """Drop the given influence slots of a vertex, keeping the others sorted and normalized."""
+        kept = ~slots
+        num_kept = kept.sum()
+        bones[vert, :num_kept] = bones[vert, kept]
+        weights[vert, :num_kept] = weights[vert, kept]
+        bones[vert, num_kept:] = -1
+        weights[vert, num_kept:] = 0.0
+        SkinPartition.normalize(weights[vert:vert + 1])
+
+    @staticmethod
+    def normalize(weights):
+        totals = weights.sum(axis=1)
+        weighted = totals > 0
+        weights[weighted] /= totals[weighted, None]
+
+    @staticmethod
+    def get_bone_sets(tri_bones):
+        """Canonical, sorted and -1 padded, bone sets of each triangle from its (n, 3, k) vertex bones."""
+        tri_bones = np.sort(tri_bones.reshape(len(tri_bones), -1), axis=1)
+        duplicate = np.zeros(tri_bones.shape, dtype=bool)
+        duplicate[:, 1:] = tri_bones[:, 1:] == tri_bones[:, :-1]
+        tri_bones[duplicate] = -1
+        # sort descending so the -1 padding ends up at the end
+        return -np.sort(-tri_bones, axis=1)
+
+    @staticmethod
+    def get_bone_counts(tri_bones):
+        return (SkinPartition.get_bone_sets(tri_bones) >= 0).sum(axis=1)
+
+    def get_partitions(self, bones, triangles, triangle_parts):
+        """Group triangles by body part and bone set, then pack those groups greedily into partitions.
+
+        :return: List of (body part, bone set, triangle indices) partitions.
+        """
+        if not len(triangles):
+            return []
+        keys = np.concatenate((triangle_parts[:, None], self.get_bone_sets(bones[triangles])), axis=1)
+        groups, first, tri_groups = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        tri_groups = tri_groups.reshape(-1)
+        group_parts = groups[:, 0].tolist()
+        group_bones = [set(row[row >= 0].tolist()) for row in groups[:, 1:]]
+
+        # first fit, largest bone sets first, so smaller sets can fill up the gaps
+        parts = []
+        group_to_part = np.empty(len(groups), dtype=np.int64)
+        for group in sorted(range(len(groups)), key=lambda g: (-len(group_bones[g]), first[g])):
+            for part_index, (body_part, bone_set, _) in enumerate(parts):
+                if body_part == group_parts[group] and len(bone_set | group_bones[group]) <= self.max_bones_per_partition:
+                    bone_set |= group_bones[group]
+                    break
+            else:
+                part_index = len(parts)
+                parts.append((group_parts[group], set(group_bones[group]), first[group]))
+            group_to_part[group] = part_index
+
+        # split the triangles over the partitions, keeping their original order within each partition
+        tri_parts = group_to_part[tri_groups]
+        order = np.argsort(tri_parts, kind='stable')
+        bounds = np.searchsorted(tri_parts[order], np.arange(len(parts) + 1))
+        parts = [(body_part, bone_set, order[start:end])
+                 for (body_part, bone_set, _), start, end in zip(parts, bounds[:-1], bounds[1:])]
+        # keep partitions in the order in which they first appear in the mesh
+        return sorted(parts, key=lambda part: part[2][0])
+
+    def share_bones(self, parts):
+        """Reorder partitions so that consecutive partitions can share a single bone set, where it fits."""
+        parts = [[body_part, bone_set, part_triangles] for body_part, bone_set, part_triangles in parts]
+        new_parts = []
+        while parts:
+            # starts a new set of partitions with shared bones
+            shared_parts = [parts.pop()]
+            shared_bone_set = set(shared_parts[0][1])
+            old_parts = parts
+            parts = []
+            for other_part in old_parts:
+                if len(shared_bone_set | other_part[1]) <= self.max_bones_per_partition:
+                    shared_bone_set |= other_part[1]
+                    shared_parts.append(other_part)
+                else:
+                    # keep it for the next iteration
+                    parts.append(other_part)
+            for shared_part in shared_parts:
+                shared_part[1] = shared_bone_set
+            new_parts.extend(shared_parts)
+        return [tuple(part) for part in new_parts]
+
+    def export_skin_partition_block(self, skinpartblock, part_bones, part_triangles, bones, weights):
+        """Fill a partition block from its global triangles, using local vertex and bone indices."""
+        if self.pad_bones and self.max_bones_per_partition != self.max_bones_per_vertex:
+            raise NifError("When padding bones, the maximum bones per partition must be equal to the maximum bones per vertex.")
+
+        # local vertices, in order of first appearance in the triangles
+        unique_verts, first, inverse = np.unique(part_triangles.reshape(-1), return_index=True, return_inverse=True)
+        order = np.argsort(first, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        vertex_map = unique_verts[order]
+        local_triangles = rank[inverse.reshape(-1)].reshape(-1, 3)
+
+        if self.stripify:
+            strips = pyffi.utils.vertex_cache.stable_stripify(local_triangles.tolist(), stitchstrips=self.stitch_strips)
+            num_triangles = sum(len(strip) - 2 for strip in strips)
+        else:
+            strips = []
+            num_triangles = len(local_triangles)
+
+        # map global bone indices to local ones
+        bone_lookup = np.zeros(max(part_bones, default=0) + 1, dtype=np.int64)
+        bone_lookup[part_bones] = np.arange(len(part_bones))
+        vert_bones = bones[vertex_map]
+        vert_weights = weights[vertex_map]
+        used = vert_bones >= 0
+        bone_indices = np.where(used, bone_lookup[np.maximum(vert_bones, 0)], 0)
+        num_bones = len(part_bones)
+        if self.pad_bones:
+            # freedom force vs. the 3rd reich needs exactly as many bones as allowed on every partition block,
+            # with unique bone indices, sorted per vertex
+            num_bones = self.max_bones_per_partition
+            # used slots come first, fill the others with the bone indices that the vertex does not use yet
+            present = np.zeros((len(vertex_map), num_bones), dtype=bool)
+            present[np.nonzero(used)[0], bone_indices[used]] = True
+            missing = np.argsort(present, axis=1, kind='stable')
+            slots = np.maximum(np.arange(num_bones) - used.sum(axis=1)[:, None], 0)
+            bone_indices = np.where(used, bone_indices, np.take_along_axis(missing, slots, axis=1))
+            order = np.argsort(bone_indices, axis=1, kind='stable')
+            bone_indices = np.take_along_axis(bone_indices, order, axis=1)
+            vert_weights = np.take_along_axis(vert_weights, order, axis=1)
+
+        skinpartblock.num_vertices = len(vertex_map)
+        skinpartblock.num_triangles = num_triangles
+        skinpartblock.num_bones = num_bones
+        skinpartblock.num_strips = len(strips)
+        skinpartblock.num_weights_per_vertex = self.max_bones_per_vertex
+        skinpartblock.bones.update_size()
+        # dummy bone slots refer to first bone
+        for i, bone in enumerate(part_bones + [0] * (num_bones - len(part_bones))):
+            skinpartblock.bones[i] = bone
+        skinpartblock.has_vertex_map = True
+        skinpartblock.vertex_map.update_size()
+        for i, vert in enumerate(vertex_map.tolist()):
+            skinpartblock.vertex_map[i] = vert
+        skinpartblock.has_vertex_weights = True
+        skinpartblock.vertex_weights.update_size()
+        for n_weights, vert_weight in zip(skinpartblock.vertex_weights, vert_weights.tolist()):
+            for j, weight in enumerate(vert_weight):
+                n_weights[j] = weight
+        skinpartblock.has_faces = True
+        skinpartblock.strip_lengths.update_size()
+        for i, strip in enumerate(strips):
+            skinpartblock.strip_lengths[i] = len(strip)
+        skinpartblock.strips.update_size()
+        for n_strip, strip in zip(skinpartblock.strips, strips):
+            for j, vert in enumerate(strip):
+                n_strip[j] = vert
+        if not strips:
+            skinpartblock.triangles.update_size()
+            for n_tri, (v_1, v_2, v_3) in zip(skinpartblock.triangles, local_triangles.tolist()):
+                n_tri.v_1 = v_1
+                n_tri.v_2 = v_2
+                n_tri.v_3 = v_3
+        skinpartblock.has_bone_indices = True
+        skinpartblock.bone_indices.update_size()
+        for n_indices, vert_indices in zip(skinpartblock.bone_indices, bone_indices.tolist()):
+            for j, bone_index in enumerate(vert_indices):
+                n_indices[j] = bone_index
@@ -0,0 +1,121 @@
+"""This module contains helper methods to read Blender mesh data in bulk for export."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy as np
+
+from io_scene_niftools.modules.nif_export.geometry.vertex import VertexWeights
+
+
+class MeshSnapshot:
+    """Contiguous numpy copies of the data of a (usually evaluated) Blender mesh.
+
+    Everything is read with foreach_get in one go, so the exporter never has to go through the bpy RNA layer
+    one attribute at a time.
+    """
+
+    def __init__(self, b_mesh):
+        self.name = b_mesh.name
+
+        # per vertex
+        self.positions = self.get_array(b_mesh.vertices, "co", 3)
+
+        # per loop, ie. per face corner
+        self.loop_vertices = self.get_array(b_mesh.loops, "vertex_index", dtype=np.int32)
+        if hasattr(b_mesh, "calc_normals_split"):
+            # smooth faces get vertex normals, flat faces get the face normal, also respects auto smooth & custom normals
+            b_mesh.calc_normals_split()
+        self.loop_normals = self.get_array(b_mesh.loops, "normal", 3)
+        self.uv_layers = [self.get_array(uv_layer.data, "uv", 2) for uv_layer in b_mesh.uv_layers]
+        self.colors = [self.get_array(color_layer.data, "color", 4) for color_layer in b_mesh.vertex_colors]
+
+        # per polygon
+        self.poly_starts = self.get_array(b_mesh.polygons, "loop_start", dtype=np.int32)
+        self.poly_totals = self.get_array(b_mesh.polygons, "loop_total", dtype=np.int32)
+        self.poly_materials = self.get_array(b_mesh.polygons, "material_index", dtype=np.int32)
+
+        # per loop triangle, so the mesh never has to be triangulated by a modifier
+        b_mesh.calc_loop_triangles()
+        self.tri_loops = self.get_array(b_mesh.loop_triangles, "loops", 3, dtype=np.int32)
+        self.tri_polys = self.get_array(b_mesh.loop_triangles, "polygon_index", dtype=np.int32)
+        self.tri_materials = self.get_array(b_mesh.loop_triangles, "material_index", dtype=np.int32)
+
+        # only read when needed, see get_vertex_groups
+        self._vertex_groups = None
+
+    @property
+    def num_vertices(self):
+        return len(self.positions)
+
+    def get_vertex_groups(self, b_mesh):
+        """Read the vertex group weights of all vertices in a single pass, as a sparse vertex by group matrix.
+
+        Blender has no bulk accessor for vertex group weights, so this is the one loop over the vertices that is left;
+        it copies each vertex's groups with foreach_get straight into its slice of the matrix, so no Python objects
+        are created per weight. The result is cached for all bones and body parts of the mesh.
+        """
+        if self._vertex_groups is None:
+            b_groups = [b_vert.groups for b_vert in b_mesh.vertices]
+            counts = np.fromiter(map(len, b_groups), dtype=np.int64, count=len(b_groups))
+            indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=indptr[1:])
+            columns = np.empty(indptr[-1], dtype=np.int32)
+            weights = np.empty(indptr[-1], dtype=np.float32)
+            for groups, start, end in zip(b_groups, indptr[:-1].tolist(), indptr[1:].tolist()):
+                if start != end:
+                    groups.foreach_get("group", columns[start:end])
+                    groups.foreach_get("weight", weights[start:end])
+            self._vertex_groups = VertexWeights(indptr, columns, weights)
+        return self._vertex_groups
+
+    def get_material_triangles(self, num_materials):
+        """Bucket all loop triangles by material index in a single pass.
+
+        :return: One array of triangle indices per material slot, each in the original triangle order.
+        """
+        # stable sort, so triangles keep their order within each bucket
+        tris = np.argsort(self.tri_materials, kind='stable')
+        bounds = np.searchsorted(self.tri_materials[tris], np.arange(num_materials + 1))
+        return [tris[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    @staticmethod
+    def get_array(b_collection, attribute, width=1, dtype=np.float32):
+        """Read an attribute of every element of a bpy collection in one go, as an (n, width) array."""
+        array = np.empty(len(b_collection) * width, dtype=dtype)
+        b_collection.foreach_get(attribute, array)
+        return array.reshape(-1, width) if width > 1 else array
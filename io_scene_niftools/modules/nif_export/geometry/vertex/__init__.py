@@ -36,3 +36,131 @@
 # POSSIBILITY OF SUCH DAMAGE.
 #
 # ***** END LICENSE BLOCK *****
+
+import numpy as np
+
+
+class Vertex:
+
+    @staticmethod
+    def deduplicate(corner_vertices, corner_data, epsilon):
+        """Find the unique face corners of a mesh, the NIF equivalent of Blender's (vertex, uv, normal, vcol) quads.
+
+        A corner is merged into the first earlier unique vertex of the same Blender vertex whose corner data all lies
+        within epsilon of its own, exactly like the original per corner search. Unique corners are numbered in order
+        of their first appearance. The corners of all Blender vertices are compared at once, one corner per vertex at
+        a time, so the loop only runs as often as the largest number of corners on a single vertex.
+
+        :param corner_vertices: Blender vertex index of each corner, shape (n,).
+        :param corner_data: Sequence of per corner float arrays (uvs, normals, colors), each of shape (n, k).
+        :param epsilon: Tolerance used for comparing the corner data.
+        :return: Tuple of the index of the first corner of each unique vertex, shape (m,), and the unique vertex
+                 index of every corner, shape (n,).
+        """
+        corner_vertices = np.asarray(corner_vertices, dtype=np.int64)
+        num_corners = len(corner_vertices)
+        if not num_corners:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        data = [np.asarray(data, dtype=np.float64).reshape(num_corners, -1) for data in corner_data if data is not None]
+        data = np.concatenate(data, axis=1) if data else np.empty((num_corners, 0))
+
+        # group the corners by blender vertex, keeping their order within each group
+        order = np.argsort(corner_vertices, kind='stable')
+        data = data[order]
+        sorted_vertices = corner_vertices[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_vertices[1:] != sorted_vertices[:-1])))
+        group_sizes = np.diff(np.append(starts, num_corners))
+        ranks = np.arange(num_corners) - np.repeat(starts, group_sizes)
+
+        # the unique vertex that each corner (in sorted order) is merged into, by its sorted position
+        merged = np.arange(num_corners)
+        is_unique = np.zeros(num_corners, dtype=bool)
+        is_unique[starts] = True
+        for rank in range(1, group_sizes.max()):
+            current = np.flatnonzero(ranks == rank)
+            # all earlier corners of the same vertex, oldest first
+            earlier = current[:, None] - np.arange(rank, 0, -1)
+            matches = is_unique[earlier] & np.all(np.abs(data[earlier] - data[current, None]) <= epsilon, axis=2)
+            found = matches.any(axis=1)
+            merged[current[found]] = earlier[found, matches[found].argmax(axis=1)]
+            is_unique[current[~found]] = True
+
+        # back to corner order, numbering the unique vertices by first appearance
+        first = np.empty(num_corners, dtype=np.int64)
+        first[order] = order[merged]
+        unique_corners = np.flatnonzero(first == np.arange(num_corners))
+        return unique_corners, np.searchsorted(unique_corners, first)
+
+    @staticmethod
+    def get_vertex_map(nif_to_blender, num_vertices):
+        """Build the blender vertex -> nif vertices list, with None for blender vertices that were not exported."""
+        vertmap = [None] * num_vertices
+        for n_index, b_index in enumerate(nif_to_blender.tolist()):
+            if vertmap[b_index] is None:
+                vertmap[b_index] = []
+            vertmap[b_index].append(n_index)
+        return vertmap
+
+
+class VertexWeights:
+    """Sparse vertex by group (or bone) weight matrix, stored in compressed sparse row form."""
+
+    def __init__(self, indptr, columns, weights):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.columns = np.asarray(columns, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+    @property
+    def num_rows(self):
+        return len(self.indptr) - 1
+
+    @property
+    def row_counts(self):
+        return np.diff(self.indptr)
+
+    @property
+    def rows(self):
+        """The row index of every stored entry."""
+        return np.repeat(np.arange(self.num_rows), self.row_counts)
+
+    def row_sums(self):
+        return np.bincount(self.rows, weights=self.weights, minlength=self.num_rows)
+
+    def _filter(self, keep, columns=None):
+        indptr = np.zeros_like(self.indptr)
+        np.cumsum(np.bincount(self.rows[keep], minlength=self.num_rows), out=indptr[1:])
+        columns = self.columns[keep] if columns is None else columns[keep]
+        return VertexWeights(indptr, columns, self.weights[keep])
+
+    def select_columns(self, column_map):
+        """Keep only the columns that column_map maps to a non-negative index, and renumber them accordingly."""
+        column_map = np.asarray(column_map, dtype=np.int64)
+        columns = np.full(len(self.columns), -1, dtype=np.int64)
+        valid = self.columns < len(column_map)
+        columns[valid] = column_map[self.columns[valid]]
+        return self._filter(columns >= 0, columns)
+
+    def normalized(self):
+        """Scale every row to sum to one, dropping rows whose weights sum to zero."""
+        sums = self.row_sums()
+        keep = sums[self.rows] != 0
+        normalized = self._filter(keep)
+        normalized.weights /= sums[self.rows[keep]]
+        return normalized
+
+    def take_rows(self, rows):
+        """Gather the given rows, in the given order, into a new matrix."""
+        rows = np.asarray(rows, dtype=np.int64)
+        counts = self.row_counts[rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        entries = np.arange(indptr[-1]) - np.repeat(indptr[:-1] - self.indptr[rows], counts)
+        return VertexWeights(indptr, self.columns[entries], self.weights[entries])
+
+    def get_columns(self, num_columns):
+        """Split the matrix by column, returning the rows and weights of each column (in row order)."""
+        order = np.argsort(self.columns, kind='stable')
+        rows = self.rows[order]
+        weights = self.weights[order]
+        bounds = np.searchsorted(self.columns[order], np.arange(num_columns + 1))
+        return [(rows[start:end], weights[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
@@ -39,6 +39,7 @@
 
 import bpy
 import mathutils
+import numpy as np
 from pyffi.formats.nif import NifFormat
 
 from io_scene_niftools.modules.nif_export import types
@@ -48,6 +49,7 @@ from io_scene_niftools.modules.nif_export.armature import Armature
 from io_scene_niftools.modules.nif_export.collision.bound import NiCollision, BSBound
 from io_scene_niftools.modules.nif_export.collision.havok import BhkCollision
 from io_scene_niftools.modules.nif_export.geometry.mesh import Mesh
+from io_scene_niftools.modules.nif_export.geometry.snapshot import MeshSnapshot
 from io_scene_niftools.modules.nif_export.property.object import ObjectDataProperty
 from io_scene_niftools.modules.nif_export.block_registry import block_store
 from io_scene_niftools.utils import math
@@ -173,7 +175,8 @@ class Object:
                 return
             else:
                 # -> mesh data.
-                is_multimaterial = len(set([f.material_index for f in b_obj.data.polygons])) > 1
+                poly_materials = MeshSnapshot.get_array(b_obj.data.polygons, "material_index", dtype=np.int32)
+                is_multimaterial = len(np.unique(poly_materials)) > 1
 
                 # determine if object tracks camera
                 # nb normally, imported models will have tracking constraints on their parent empty
@@ -226,10 +229,9 @@ class Object:
             # special case: objects parented to armature bones - find the nif parent bone
             if b_parent.type == 'ARMATURE' and b_child.parent_bone != "":
                 parent_bone = b_parent.data.bones[b_child.parent_bone]
-                assert (parent_bone in block_store.block_to_obj.values())
-                for temp_parent, obj in block_store.block_to_obj.items():
-                    if obj == parent_bone:
-                        break
+                parent_blocks = block_store.get_blocks_for_obj(parent_bone)
+                assert parent_blocks
+                temp_parent = parent_blocks[0]
             self.export_node(b_child, temp_parent)
 
     def export_collision(self, b_obj, n_parent):
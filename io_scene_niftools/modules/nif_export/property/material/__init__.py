@@ -48,6 +48,9 @@ from io_scene_niftools.utils.logging import NifLog
 
 EXPORT_OPTIMIZE_MATERIALS = True
 
+# material names that affect rendering, such as EnvMap2; by default the material name does not affect rendering
+SPECIAL_NAMES = ("EnvMap2", "EnvMap", "skin", "Hair", "dynalpha", "HideSecret", "Lava")
+
 
 class MaterialProp:
 
@@ -64,13 +67,9 @@ class MaterialProp:
         # create n_block
         n_mat_prop = NifFormat.NiMaterialProperty()
 
-        # list which determines whether the material name is relevant or not  only for particular names this holds,
-        # such as EnvMap2 by default, the material name does not affect rendering
-        specialnames = ("EnvMap2", "EnvMap", "skin", "Hair", "dynalpha", "HideSecret", "Lava")
-
         # hack to preserve EnvMap2, skinm, ... named blocks (even if they got renamed to EnvMap2.xxx or skin.xxx on import)
         if bpy.context.scene.niftools_scene.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM'):
-            for specialname in specialnames:
+            for specialname in SPECIAL_NAMES:
                 if name.lower() == specialname.lower() or name.lower().startswith(specialname.lower() + "."):
                     if name != specialname:
                         NifLog.warn(f"Renaming material '{name}' to '{specialname}'")
@@ -107,25 +106,24 @@ class MaterialProp:
 
         # search for duplicate
         # (ignore the name string as sometimes import needs to create different materials even when NiMaterialProperty is the same)
-        for n_block in block_store.block_to_obj:
-            if not isinstance(n_block, NifFormat.NiMaterialProperty):
-                continue
-
-            # when optimization is enabled, ignore material name
-            if EXPORT_OPTIMIZE_MATERIALS:
-                ignore_strings = not(n_block.name in specialnames)
-            else:
-                ignore_strings = False
-
-            # check hash
-            first_index = 1 if ignore_strings else 0
-            if n_block.get_hash()[first_index:] == n_mat_prop.get_hash()[first_index:]:
-                NifLog.warn(f"Merging materials '{n_mat_prop.name}' and '{n_block.name}' (they are identical in nif)")
-                n_mat_prop = n_block
-                break
-
-        block_store.register_block(n_mat_prop)
+        n_block = block_store.find_shared_block(n_mat_prop, get_hash=self.get_material_hash)
+        if n_block is not None:
+            NifLog.warn(f"Merging materials '{n_mat_prop.name}' and '{n_block.name}' (they are identical in nif)")
+            n_mat_prop = n_block
+        else:
+            block_store.register_block(n_mat_prop)
+
         # material animation
         self.material_anim.export_material(b_mat, n_mat_prop)
+        # only share the material once its controllers are attached, as they are part of its hash
+        block_store.share_block(n_mat_prop, get_hash=self.get_material_hash)
         # no material property with given settings found, so use and register the new one
         return n_mat_prop
+
+    @staticmethod
+    def get_material_hash(n_mat_prop):
+        """Content hash of a material property, which leaves out the name unless it affects rendering."""
+        # when optimization is enabled, ignore material name
+        if EXPORT_OPTIMIZE_MATERIALS and n_mat_prop.name.decode() not in SPECIAL_NAMES:
+            return n_mat_prop.get_hash()[1:]
+        return n_mat_prop.get_hash()
@@ -47,7 +47,7 @@ from io_scene_niftools.modules.nif_export.property.material import MaterialProp
 from io_scene_niftools.modules.nif_export.property.shader import BSShaderProperty
 from io_scene_niftools.modules.nif_export.property.texture.types.nitextureprop import NiTextureProp
 from io_scene_niftools.modules.nif_import.object import PRN_DICT
-from io_scene_niftools.modules.nif_export.block_registry import block_store
+from io_scene_niftools.modules.nif_export.block_registry import block_store, get_attribute_hash
 from io_scene_niftools.utils import math
 from io_scene_niftools.utils.singleton import NifOp
 from io_scene_niftools.utils.logging import NifLog
@@ -99,36 +99,27 @@ class ObjectProperty:
                     applymode=self.texture_helper.get_n_apply_mode_from_b_blend_type('MIX'),
                     b_mat=b_mat)
 
-                block_store.register_block(n_nitextureprop)
                 n_block.add_property(n_nitextureprop)
 
     def get_matching_block(self, block_type, **kwargs):
         """Try to find a block matching block_type. Keyword arguments are a dict of parameters and required attributes of the block"""
-        # go over all blocks of block_type
-
         NifLog.debug(f"Looking for {block_type} block. Kwargs: {kwargs}")
-        for block in block_store.block_to_obj:
-            # if isinstance(block, block_type):
-            if block_type in str(type(block)):
-                # skip blocks that don't match additional conditions
-                for param, attribute in kwargs.items():
-                    # now skip this block if any of the conditions does not match
-                    if attribute is not None:
-                        ret_attr = getattr(block, param, None)
-                        if ret_attr != attribute:
-                            NifLog.debug(f"break, {param} != {attribute}, returns {ret_attr}")
-                            break
-                else:
-                    # we did not break out of the loop, so all checks went through, so we can use this block
-                    NifLog.debug(f"Found existing {block_type} block matching all criteria!")
-                    return block
-        # we are still here, so we must create a block of this type and set all attributes accordingly
-        NifLog.debug(f"Created new {block_type} block because none matched the required criteria!")
-        block = block_store.create_block(block_type)
-        for param, attribute in kwargs.items():
-            if attribute is not None:
-                setattr(block, param, attribute)
-        return block
+        # create a block of this type with all attributes set accordingly
+        block = getattr(NifFormat, block_type)()
+        params = [param for param, attribute in kwargs.items() if attribute is not None]
+        for param in params:
+            setattr(block, param, kwargs[param])
+
+        # blocks only have to match the required attributes, other attributes may differ
+        get_hash = get_attribute_hash(tuple(sorted(params)))
+
+        # and share it with an exported block that matches all criteria
+        n_block = block_store.intern_block(block, get_hash=get_hash)
+        if n_block is block:
+            NifLog.debug(f"Created new {block_type} block because none matched the required criteria!")
+        else:
+            NifLog.debug(f"Found existing {block_type} block matching all criteria!")
+        return n_block
 
     def export_root_node_properties(self, n_root):
         """Wrapper for exporting properties that are commonly attached to the nif root"""
@@ -94,14 +94,8 @@ class NiTextureProp(TextureSlotManager):
         self.export_texture_shader_effect(texprop)
         self.export_nitextureprop_tex_descs(texprop)
 
-        # search for duplicate
-        for n_block in block_store.block_to_obj:
-            if isinstance(n_block, NifFormat.NiTexturingProperty) and n_block.get_hash() == texprop.get_hash():
-                return n_block
-
-        # no texturing property with given settings found, so use and register
-        # the new one
-        return texprop
+        # use an identical texturing property if there is one, else register the new one
+        return block_store.intern_block(texprop)
 
     def export_nitextureprop_tex_descs(self, texprop):
         # go over all valid texture slots
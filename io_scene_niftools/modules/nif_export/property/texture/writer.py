@@ -84,13 +84,8 @@ class TextureWriter:
         srctex.alpha_format = 3
         srctex.unknown_byte = 1
 
-        # search for duplicate
-        for block in block_store.block_to_obj:
-            if isinstance(block, NifFormat.NiSourceTexture) and block.get_hash() == srctex.get_hash():
-                return block
-
-        # no identical source texture found, so use and register the new one
-        return block_store.register_block(srctex, n_texture)
+        # use an identical source texture if there is one, else register the new one
+        return block_store.intern_block(srctex, n_texture)
 
     def export_tex_desc(self, texdesc=None, uv_set=0, b_texture_node=None):
         """Helper function for export_texturing_property to export each texture slot."""
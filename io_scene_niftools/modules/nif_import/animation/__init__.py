@@ -37,6 +37,7 @@
 #
 # ***** END LICENSE BLOCK *****
 import bpy
+import numpy as np
 
 from pyffi.formats.nif import NifFormat
 
@@ -45,6 +46,13 @@ from io_scene_niftools.utils.logging import NifLog
 
 FPS = 30
 
+# key times of every channel of the NiKeyframeData blocks in the file, gathered when estimating the FPS and
+# cleared at the end of the import, so they do not keep its blocks alive
+KEY_TIMES = {}
+
+# blender's keyframe interpolation enum values, as used by foreach_set
+INTERPOLATION_TYPES = {"CONSTANT": 0, "LINEAR": 1, "BEZIER": 2}
+
 
 class Animation:
 
@@ -138,13 +146,35 @@ class Animation:
             for fcurve in fcurves:
                 fcurve.extrapolation = 'CONSTANT'
 
-    def add_key(self, fcurves, t, key, interp):
+    @staticmethod
+    def add_keys(fcurves, times, keys, interp):
         """
-        Add a key (len=n) to a set of fcurves (len=n) at the given frame. Set the key's interpolation to interp.
+        Add n keys (n x len(fcurves)) to a set of fcurves at the given times (len=n). Set the keys' interpolation to interp.
+        Keys that land on the same frame replace earlier ones, like keyframe_points.insert does.
         """
-        frame = round(t * animation.FPS)
-        for fcurve, k in zip(fcurves, key):
-            fcurve.keyframe_points.insert(frame, k).interpolation = interp
+        if not len(times):
+            return
+        frames = np.round(np.asarray(times, dtype=np.float64) * animation.FPS).astype(np.float32)
+        keys = np.asarray(keys, dtype=np.float32).reshape(len(frames), -1)
+        for fcurve, values in zip(fcurves, keys.T):
+            b_points = fcurve.keyframe_points
+            num_old = len(b_points)
+            old_co = np.empty(2 * num_old, dtype=np.float32)
+            b_points.foreach_get("co", old_co)
+            old_interp = np.empty(num_old, dtype=np.int32)
+            b_points.foreach_get("interpolation", old_interp)
+
+            all_frames = np.concatenate((old_co[0::2], frames))
+            all_values = np.concatenate((old_co[1::2], values))
+            all_interp = np.concatenate((old_interp, np.full(len(frames), INTERPOLATION_TYPES[interp], dtype=np.int32)))
+            # keep the last key of every frame, sorted by frame
+            _, last = np.unique(all_frames[::-1], return_index=True)
+            last = len(all_frames) - 1 - last
+
+            b_points.add(len(last) - num_old)
+            b_points.foreach_set("co", np.column_stack((all_frames[last], all_values[last])).ravel())
+            b_points.foreach_set("interpolation", all_interp[last])
+            fcurve.update()
 
     # import animation groups
     def import_text_keys(self, n_block, b_action):
@@ -164,48 +194,62 @@ class Animation:
                 marker = b_action.pose_markers.new(newkey)
                 marker.frame = frame
 
+    @staticmethod
+    def get_keyframe_times(n_kfd):
+        """Returns the key times of every channel of a NiKeyframeData as arrays, reusing those gathered for the FPS."""
+        key_times = animation.KEY_TIMES.get(n_kfd)
+        if key_times is None:
+            def get_times(n_keys):
+                return np.array([key.time for key in n_keys], dtype=np.float64)
+
+            key_times = {
+                "translations": get_times(n_kfd.translations.keys),
+                "scales": get_times(n_kfd.scales.keys),
+                "quaternion_keys": get_times(n_kfd.quaternion_keys),
+                "xyz_rotations": [get_times(n_xyz_rotation.keys) for n_xyz_rotation in n_kfd.xyz_rotations],
+            }
+            animation.KEY_TIMES[n_kfd] = key_times
+        return key_times
+
+    @staticmethod
+    def clear_keyframe_times():
+        """Forget the key times gathered for the FPS, once all controllers have been imported."""
+        animation.KEY_TIMES = {}
+
     @staticmethod
     def set_frames_per_second(roots):
         """Scan all blocks and set a reasonable number for FPS to this class and the scene."""
-        # find all key times
+        # find all key times, in a single pass over the tree
+        Animation.clear_keyframe_times()
         key_times = []
         for root in roots:
-            for kfd in root.tree(block_type=NifFormat.NiKeyframeData):
-                key_times.extend(key.time for key in kfd.translations.keys)
-                key_times.extend(key.time for key in kfd.scales.keys)
-                key_times.extend(key.time for key in kfd.quaternion_keys)
-                key_times.extend(key.time for key in kfd.xyz_rotations[0].keys)
-                key_times.extend(key.time for key in kfd.xyz_rotations[1].keys)
-                key_times.extend(key.time for key in kfd.xyz_rotations[2].keys)
-
-            for kfi in root.tree(block_type=NifFormat.NiBSplineInterpolator):
-                if not kfi.basis_data:
+            for n_block in root.tree():
+                if isinstance(n_block, NifFormat.NiKeyframeData):
+                    kfd_times = Animation.get_keyframe_times(n_block)
+                    key_times.extend((kfd_times["translations"], kfd_times["scales"], kfd_times["quaternion_keys"]))
+                    key_times.extend(kfd_times["xyz_rotations"])
+
+                elif isinstance(n_block, NifFormat.NiBSplineInterpolator):
                     # skip bsplines without basis data (eg bowidle.kf in Oblivion)
-                    continue
-                key_times.extend(
-                    point * (kfi.stop_time - kfi.start_time)
-                    / (kfi.basis_data.num_control_points - 2)
-                    for point in range(kfi.basis_data.num_control_points - 2))
+                    if n_block.basis_data and n_block.basis_data.num_control_points > 2:
+                        num_points = n_block.basis_data.num_control_points - 2
+                        key_times.append(np.arange(num_points) * (n_block.stop_time - n_block.start_time) / num_points)
 
-            for uv_data in root.tree(block_type=NifFormat.NiUVData):
-                for uv_group in uv_data.uv_groups:
-                    key_times.extend(key.time for key in uv_group.keys)
+                elif isinstance(n_block, NifFormat.NiUVData):
+                    for uv_group in n_block.uv_groups:
+                        key_times.append(np.array([key.time for key in uv_group.keys], dtype=np.float64))
 
+        key_times = np.unique(np.concatenate(key_times)) if key_times else ()
         # not animated, return a reasonable default
-        if not key_times:
+        if not len(key_times):
             return
 
-        # calculate FPS
-        key_times = sorted(set(key_times))
-        fps = animation.FPS
-        lowest_diff = sum(abs(int(time * fps + 0.5) - (time * fps)) for time in key_times)
-
-        # for test_fps in range(1,120): #disabled, used for testing
-        for test_fps in [20, 24, 25, 30, 35]:
-            diff = sum(abs(int(time * test_fps + 0.5) - (time * test_fps)) for time in key_times)
-            if diff < lowest_diff:
-                lowest_diff = diff
-                fps = test_fps
+        # calculate FPS, keeping the current one unless another fits the key times strictly better
+        # test_fps = np.arange(1, 120) #disabled, used for testing
+        test_fps = np.array([animation.FPS, 20, 24, 25, 30, 35], dtype=np.float64)
+        frames = key_times[:, None] * test_fps
+        diffs = np.abs(np.trunc(frames + 0.5) - frames).sum(axis=0)
+        fps = int(test_fps[diffs.argmin()])
         NifLog.info(f"Animation estimated at {fps} frames per second.")
         animation.FPS = fps
         bpy.context.scene.render.fps = fps
@@ -38,11 +38,13 @@
 # ***** END LICENSE BLOCK *****
 
 import bpy
-import mathutils
+import numpy as np
 from pyffi.formats.nif import NifFormat
 
 from io_scene_niftools.modules.nif_import import animation
 from io_scene_niftools.modules.nif_import.animation import Animation
+from io_scene_niftools.modules.nif_import.geometry.vertex import Vertex
+from io_scene_niftools.modules.nif_import.object.block_registry import block_store
 from io_scene_niftools.utils import math
 from io_scene_niftools.utils.singleton import EGMData
 from io_scene_niftools.utils.logging import NifLog
@@ -54,8 +56,11 @@ class MorphAnimation(Animation):
         super().__init__()
         animation.FPS = bpy.context.scene.render.fps
 
-    def import_morph_controller(self, n_node, b_obj):
-        """Import NiGeomMorpherController as shape keys for blender object."""
+    def import_morph_controller(self, n_node, b_obj, nif_vertices=None):
+        """Import NiGeomMorpherController as shape keys for blender object.
+
+        :param nif_vertices: The nif vertex index for every blender vertex, if vertices were combined on import.
+        """
 
         n_morphCtrl = math.find_controller(n_node, NifFormat.NiGeomMorpherController)
         if n_morphCtrl:
@@ -72,7 +77,8 @@ class MorphAnimation(Animation):
                 sk_basis = b_obj.shape_key_add(name=keyname)
 
                 # get base vectors and import all morphs
-                baseverts = morphData.morphs[0].vectors
+                b_co = self.get_vertex_coordinates(b_mesh)
+                baseverts = self.get_morph_vectors(morphData.morphs[0].vectors, nif_vertices)
 
                 shape_action = self.create_action(b_obj.data.shape_keys, b_obj.name + "-Morphs")
                 
@@ -83,9 +89,8 @@ class MorphAnimation(Animation):
                         keyname = f'Key {idxMorph}'
                     NifLog.info(f"Inserting key '{keyname}'")
                     # get vectors
-                    morph_verts = morphData.morphs[idxMorph].vectors
-                    self.morph_mesh(b_mesh, baseverts, morph_verts)
-                    shape_key = b_obj.shape_key_add(name=keyname, from_mix=False)
+                    morph_verts = self.get_morph_vectors(morphData.morphs[idxMorph].vectors, nif_vertices)
+                    shape_key = self.add_shape_key(b_obj, keyname, b_co, morph_verts, baseverts)
 
                     # first find the keys
                     # older versions store keys in the morphData
@@ -106,12 +111,23 @@ class MorphAnimation(Animation):
                     fcu = self.create_fcurves(shape_action, "value", (0,), flags=n_morphCtrl.flags, keyname=shape_key.name)
                     
                     # set keyframes
-                    for key in morph_data.keys:
-                        self.add_key(fcu, key.time, (key.value,), interp)
+                    self.add_keys(fcu, [key.time for key in morph_data.keys], [key.value for key in morph_data.keys], interp)
 
     def import_egm_morphs(self, b_obj):
         """Import all EGM morphs as shape keys for blender object."""
         b_mesh = b_obj.data
+        # egm morphs have an offset for every nif vertex, if the nif vertices were combined on import,
+        # every blender vertex takes the offset of the first nif vertex that was merged into it
+        num_vertices = EGMData.data.header.num_vertices
+        nif_vertices = None
+        vertex_remap = block_store.get_vertex_remap(b_mesh)
+        if vertex_remap is not None and len(vertex_remap) == num_vertices:
+            nif_vertices = Vertex.get_first_vertices(vertex_remap)
+            num_vertices = len(nif_vertices)
+        if num_vertices != len(b_mesh.vertices):
+            NifLog.warn(f"EGM has {EGMData.data.header.num_vertices} vertices, which do not match the {len(b_mesh.vertices)} "
+                        f"vertices of mesh '{b_obj.name}', skipping EGM morphs.")
+            return
         sym_morphs = [list(morph.get_relative_vertices()) for morph in EGMData.data.sym_morphs]
         asym_morphs = [list(morph.get_relative_vertices()) for morph in EGMData.data.asym_morphs]
 
@@ -124,24 +140,40 @@ class MorphAnimation(Animation):
         morphs = ([(morph, f"EGM SYM {i}") for i, morph in enumerate(sym_morphs)] +
                   [(morph, f"EGM ASYM {i}") for i, morph in enumerate(asym_morphs)])
 
-        base_verts = [v.co for v in b_mesh.vertices]
+        b_co = self.get_vertex_coordinates(b_mesh)
         for morph_verts, key_name in morphs:
-            # convert tuples into vector here so we can simply add in morph_mesh()
-            for b_v_index, (bv, mv) in enumerate(zip(base_verts, morph_verts)):
-                b_mesh.vertices[b_v_index].co = bv + mathutils.Vector(mv)
-            # TODO [animation] unused variable is it required
-            shape_key = b_obj.shape_key_add(name=key_name, from_mix=False)
-
-    def morph_mesh(self, b_mesh, baseverts, morphverts):
-        """Transform a mesh to be in the shape given by morphverts."""
-        # for each vertex calculate the key position from base
-        # pos + delta offset
+            offsets = np.array(morph_verts, dtype=np.float32).reshape(-1, 3)
+            if nif_vertices is not None:
+                offsets = offsets[nif_vertices]
+            self.add_shape_key(b_obj, key_name, b_co, offsets)
+
+    @staticmethod
+    def get_vertex_coordinates(b_mesh):
+        """Returns the (n,3) coordinates of all vertices of a blender mesh."""
+        b_co = np.empty(len(b_mesh.vertices) * 3, dtype=np.float32)
+        b_mesh.vertices.foreach_get("co", b_co)
+        return b_co.reshape(-1, 3)
+
+    @staticmethod
+    def get_morph_vectors(vectors, nif_vertices=None):
+        """Returns the (n,3) array of a morph's vectors, per blender vertex if vertices were combined on import."""
+        vectors = np.array([v.as_tuple() for v in vectors], dtype=np.float32).reshape(-1, 3)
+        if nif_vertices is not None:
+            # only the first of each combined nif vertex has a blender vertex
+            vectors = vectors[nif_vertices]
+        return vectors
+
+    @staticmethod
+    def add_shape_key(b_obj, key_name, b_co, offsets, base_co=None):
+        """Add a shape key at base_co (default b_co) plus offsets, without changing the mesh itself."""
+        if base_co is None:
+            base_co = b_co
         # length check disabled
         # as sometimes, oddly, the morph has more vertices...
-        # assert(len(baseverts) == len(morphverts))
-        for b_v_index, (bv, mv) in enumerate(zip(baseverts, morphverts)):
-            # pyffi vector3
-            v = bv + mv
-            # if applytransform:
-            # v *= transform
-            b_mesh.vertices[b_v_index].co = v.as_tuple()
+        # vertices that the morph does not cover keep their mesh position
+        num_verts = min(len(b_co), len(base_co), len(offsets))
+        co = b_co.copy()
+        co[:num_verts] = base_co[:num_verts] + offsets[:num_verts]
+        shape_key = b_obj.shape_key_add(name=key_name, from_mix=False)
+        shape_key.data.foreach_set("co", co.ravel())
+        return shape_key
@@ -37,34 +37,32 @@
 #
 # ***** END LICENSE BLOCK *****
 
-import mathutils
+import numpy as np
 
 from functools import singledispatch
-from bisect import bisect_left
 from pyffi.formats.nif import NifFormat
 
+from io_scene_niftools.modules.nif_import import animation
 from io_scene_niftools.modules.nif_import.animation import Animation
 from io_scene_niftools.modules.nif_import.object import block_registry
-from io_scene_niftools.utils import math
+from io_scene_niftools.utils import bspline, math
 from io_scene_niftools.utils.logging import NifLog
 
 
 def interpolate(x_out, x_in, y_in):
     """
-    sample (x_in I y_in) at x coordinates x_out
+    sample (x_in I y_in) at x coordinates x_out, extrapolating linearly outside of x_in
     """
-    y_out = []
-    intervals = zip(x_in, x_in[1:], y_in, y_in[1:])
-    slopes = [(y2 - y1) / (x2 - x1) for x1, x2, y1, y2 in intervals]
+    x_out = np.asarray(x_out, dtype=np.float64)
+    x_in = np.asarray(x_in, dtype=np.float64)
+    y_in = np.asarray(y_in, dtype=np.float64)
+    slopes = np.diff(y_in) / np.diff(x_in)
     # if we had just one input, slope will be 0 for constant extrapolation
-    if not slopes:
-        slopes = [0, ]
-    for x in x_out:
-        i = bisect_left(x_in, x) - 1
-        # clamp to valid range
-        i = max(min(i, len(slopes) - 1), 0)
-        y_out.append(y_in[i] + slopes[i] * (x - x_in[i]))
-    return y_out
+    if not len(slopes):
+        slopes = np.zeros(1)
+    # clamp to valid range
+    i = np.clip(np.searchsorted(x_in, x_out, side='left') - 1, 0, len(slopes) - 1)
+    return y_in[i] + slopes[i] * (x_out - x_in[i])
 
 
 class TransformAnimation(Animation):
@@ -74,6 +72,8 @@ class TransformAnimation(Animation):
         self.import_kf_root = singledispatch(self.import_kf_root)
         self.import_kf_root.register(NifFormat.NiControllerSequence, self.import_controller_sequence)
         self.import_kf_root.register(NifFormat.NiSequenceStreamHelper, self.import_sequence_stream_helper)
+        # control point arrays of every NiBSplineData, which is usually shared by all interpolators of a sequence
+        self.spline_control_points = {}
 
     def import_kf_root(self, kf_root, b_armature_obj, bind_data):
         """Base method to warn user that this root type is not supported"""
@@ -136,7 +136,9 @@ class TransformAnimation(Animation):
                 # fallout, Loki
                 if not kfc:
                     kfc = controlledblock.interpolator
-                if kfc:
+                if isinstance(kfc, NifFormat.NiBSplineFloatInterpolator):
+                    self.import_float_interpolator(kfc, b_armature_obj, bone_name, self.get_channel_name(controlledblock))
+                elif kfc:
                     self.import_keyframe_controller(kfc, b_armature_obj, bone_name, niBone_bind_scale,
                                                     niBone_bind_rot_inv, niBone_bind_trans)
         # fallout: set global extrapolation mode here (older versions have extrapolation per controller)
@@ -154,10 +156,8 @@ class TransformAnimation(Animation):
         if bone_name:
             b_obj = b_obj.pose.bones[bone_name]
 
-        translations = []
-        scales = []
-        rotations = []
-        eulers = []
+        # key times and (n, channels) key values of every channel
+        translations = scales = rotations = eulers = None
         n_kfd = None
 
         # transform controllers (dartgun.nif)
@@ -168,28 +168,37 @@ class TransformAnimation(Animation):
         elif isinstance(n_kfc, NifFormat.NiBSplineInterpolator):
             # used by WLP2 (tiger.kf), but only for non-LocRotScale data
             # eg. bone stretching - see controlledblock.get_variable_1()
-            # do not support this for now, no good representation in Blender
-            if isinstance(n_kfc, NifFormat.NiBSplineCompFloatInterpolator):
-                # pyffi lacks support for this, but the following gets float keys
-                # keys = list(kfc._getCompKeys(kfc.offset, 1, kfc.bias, kfc.multiplier))
+            # these are imported as custom properties by import_float_interpolator
+            if isinstance(n_kfc, NifFormat.NiBSplineFloatInterpolator):
                 return
-            times = list(n_kfc.get_times())
-            # just do these temp steps to avoid generating empty fcurves down the line
-            trans_temp = [mathutils.Vector(tup) for tup in n_kfc.get_translations()]
-            if trans_temp:
-                translations = zip(times, trans_temp)
-            rot_temp = [mathutils.Quaternion(tup) for tup in n_kfc.get_rotations()]
-            if rot_temp:
-                rotations = zip(times, rot_temp)
-            scale_temp = list(n_kfc.get_scales())
-            if scale_temp:
-                scales = zip(times, scale_temp)
+            # sample the curves at every frame, they are smooth in between
+            times = bspline.get_sample_times(n_kfc, animation.FPS)
+            if isinstance(n_kfc, NifFormat.NiBSplineCompTransformInterpolator):
+                trans_temp = self.get_spline_keys(n_kfc, times, n_kfc.translation_offset, 3,
+                                                  n_kfc.translation_bias, n_kfc.translation_multiplier)
+                rot_temp = self.get_spline_keys(n_kfc, times, n_kfc.rotation_offset, 4,
+                                                n_kfc.rotation_bias, n_kfc.rotation_multiplier)
+                scale_temp = self.get_spline_keys(n_kfc, times, n_kfc.scale_offset, 1,
+                                                  n_kfc.scale_bias, n_kfc.scale_multiplier)
+            else:
+                trans_temp = self.get_spline_keys(n_kfc, times, n_kfc.translation_offset, 3)
+                rot_temp = self.get_spline_keys(n_kfc, times, n_kfc.rotation_offset, 4)
+                scale_temp = self.get_spline_keys(n_kfc, times, n_kfc.scale_offset, 1)
+            # avoid generating empty fcurves down the line
+            if trans_temp is not None:
+                translations = times, trans_temp
+            if rot_temp is not None:
+                b_obj.rotation_mode = "QUATERNION"
+                rotations = times, rot_temp / np.linalg.norm(rot_temp, axis=1, keepdims=True)
+            if scale_temp is not None:
+                scales = times, scale_temp[:, 0]
             # Bsplines are Bezier curves
             interp_rot = interp_loc = interp_scale = "BEZIER"
         else:
             # ZT2 & Fallout
             n_kfd = n_kfc.data
         if isinstance(n_kfd, NifFormat.NiKeyframeData):
+            key_times = self.get_keyframe_times(n_kfd)
             interp_rot = self.get_b_interp_from_n_interp(n_kfd.rotation_type)
             interp_loc = self.get_b_interp_from_n_interp(n_kfd.translations.interpolation)
             interp_scale = self.get_b_interp_from_n_interp(n_kfd.scales.interpolation)
@@ -200,27 +209,28 @@ class TransformAnimation(Animation):
                     # euler keys need not be sampled at the same time in KFs
                     # but we need complete key sets to do the space conversion
                     # so perform linear interpolation to import all keys properly
-
+                    n_channels = [n_xyz_rotation.keys for n_xyz_rotation in n_kfd.xyz_rotations]
                     # get all the keys' times
-                    times_x = [key.time for key in n_kfd.xyz_rotations[0].keys]
-                    times_y = [key.time for key in n_kfd.xyz_rotations[1].keys]
-                    times_z = [key.time for key in n_kfd.xyz_rotations[2].keys]
+                    channel_times = key_times["xyz_rotations"]
                     # the unique time stamps we have to sample all curves at
-                    times_all = sorted(set(times_x + times_y + times_z))
+                    times_all = np.unique(np.concatenate(channel_times))
                     # the actual resampling
-                    x_r = interpolate(times_all, times_x, [key.value for key in n_kfd.xyz_rotations[0].keys])
-                    y_r = interpolate(times_all, times_y, [key.value for key in n_kfd.xyz_rotations[1].keys])
-                    z_r = interpolate(times_all, times_z, [key.value for key in n_kfd.xyz_rotations[2].keys])
-                eulers = zip(times_all, zip(x_r, y_r, z_r))
+                    eulers = times_all, np.stack([interpolate(times_all, times, [key.value for key in n_keys])
+                                                  for times, n_keys in zip(channel_times, n_channels)], axis=1)
             else:
                 b_obj.rotation_mode = "QUATERNION"
-                rotations = [(key.time, key.value) for key in n_kfd.quaternion_keys]
+                if n_kfd.quaternion_keys:
+                    rotations = (key_times["quaternion_keys"],
+                                 np.array([(key.value.w, key.value.x, key.value.y, key.value.z)
+                                           for key in n_kfd.quaternion_keys], dtype=np.float64))
 
             if n_kfd.scales.keys:
-                scales = [(key.time, key.value) for key in n_kfd.scales.keys]
+                scales = (key_times["scales"],
+                          np.array([key.value for key in n_kfd.scales.keys], dtype=np.float64))
 
             if n_kfd.translations.keys:
-                translations = [(key.time, key.value) for key in n_kfd.translations.keys]
+                translations = (key_times["translations"],
+                                np.array([key.value.as_list() for key in n_kfd.translations.keys], dtype=np.float64))
 
         # ZT2 - get extrapolation for every kfc
         if isinstance(n_kfc, NifFormat.NiKeyframeController):
@@ -228,37 +238,78 @@ class TransformAnimation(Animation):
         # fallout, Loki - we set extrapolation according to the root NiControllerSequence.cycle_type
         else:
             flags = None
-        
+
+        # convert all keys of a channel to bone space at once
         if eulers:
             NifLog.debug('Rotation keys..(euler)')
             fcurves = self.create_fcurves(b_action, "rotation_euler", range(3), flags, bone_name)
-            for t, val in eulers:
-                key = mathutils.Euler(val)
-                if bone_name:
-                    key = math.import_keymat(n_bone_bind_rot_inv, key.to_matrix().to_4x4()).to_euler()
-                self.add_key(fcurves, t, key, interp_rot)
+            times, keys = eulers
+            if bone_name:
+                keys = math.import_euler_keys(n_bone_bind_rot_inv, keys)
+            self.add_keys(fcurves, times, keys, interp_rot)
         elif rotations:
             NifLog.debug('Rotation keys...(quaternions)')
             fcurves = self.create_fcurves(b_action, "rotation_quaternion", range(4), flags, bone_name)
-            for t, val in rotations:
-                key = mathutils.Quaternion([val.w, val.x, val.y, val.z])
-                if bone_name:
-                    key = math.import_keymat(n_bone_bind_rot_inv, key.to_matrix().to_4x4()).to_quaternion()
-                self.add_key(fcurves, t, key, interp_rot)
+            times, keys = rotations
+            if bone_name:
+                keys = math.import_quaternion_keys(n_bone_bind_rot_inv, keys)
+            self.add_keys(fcurves, times, keys, interp_rot)
         if translations:
             NifLog.debug('Translation keys...')
             fcurves = self.create_fcurves(b_action, "location", range(3), flags, bone_name)
-            for t, val in translations:
-                key = mathutils.Vector([val.x, val.y, val.z])
-                if bone_name:
-                    key = math.import_keymat(n_bone_bind_rot_inv, mathutils.Matrix.Translation(key - n_bone_bind_trans)).to_translation()
-                self.add_key(fcurves, t, key, interp_loc)
+            times, keys = translations
+            if bone_name:
+                keys = math.import_translation_keys(n_bone_bind_rot_inv, n_bone_bind_trans, keys)
+            self.add_keys(fcurves, times, keys, interp_loc)
         if scales:
             NifLog.debug('Scale keys...')
             fcurves = self.create_fcurves(b_action, "scale", range(3), flags, bone_name)
-            for t, val in scales:
-                key = (val, val, val)
-                self.add_key(fcurves, t, key, interp_scale)
+            times, keys = scales
+            self.add_keys(fcurves, times, np.repeat(keys[:, None], 3, axis=1), interp_scale)
+
+    def get_spline_keys(self, n_interp, times, offset, element_size, bias=None, multiplier=None):
+        """Returns the (len(times), element_size) values of a B-spline channel, or None if it has no data."""
+        n_data = n_interp.spline_data
+        if n_data and n_data not in self.spline_control_points:
+            self.spline_control_points[n_data] = bspline.get_control_point_arrays(n_data)
+        points = bspline.get_control_points(n_interp, self.spline_control_points.get(n_data), offset, element_size,
+                                            bias, multiplier)
+        if points is None:
+            return None
+        return bspline.evaluate(n_interp, times, points)
+
+    @staticmethod
+    def get_channel_name(controlledblock):
+        """Returns a name for the float channel driven by a controlled block, from its controller type and variable."""
+        names = (controlledblock.get_controller_type(), controlledblock.get_variable_1())
+        return ".".join(name.decode() for name in names if name) or "float"
+
+    def import_float_interpolator(self, n_interp, b_obj, bone_name, prop_name):
+        """Imports a float B-spline as an animated custom property of the bone."""
+        NifLog.debug(f"Importing float interpolator for {bone_name} as '{prop_name}'")
+        if isinstance(n_interp, NifFormat.NiBSplineCompFloatInterpolator):
+            base, offset, bias, multiplier = n_interp.base, n_interp.offset, n_interp.bias, n_interp.multiplier
+        else:
+            # uncompressed control points, without bias and multiplier; pyffi does not read their base and offset
+            offset = bspline.get_float_offset(n_interp)
+            if offset == bspline.NO_DATA:
+                NifLog.warn(f"Skipping float interpolator for {bone_name}, its control points could not be found.")
+                return
+            base, bias, multiplier = None, None, None
+        b_action = b_obj.animation_data.action
+        b_pose_bone = b_obj.pose.bones[bone_name]
+        times = bspline.get_sample_times(n_interp, animation.FPS)
+        keys = self.get_spline_keys(n_interp, times, offset, 1, bias, multiplier)
+        if base is None:
+            base = float(keys[0, 0]) if keys is not None else 0.0
+        b_pose_bone[prop_name] = base
+        if keys is None:
+            return
+        data_path = f'pose.bones["{bone_name}"]["{prop_name}"]'
+        fcurve = b_action.fcurves.find(data_path)
+        if not fcurve:
+            fcurve = b_action.fcurves.new(data_path=data_path, action_group=bone_name)
+        self.add_keys([fcurve], times, keys, "BEZIER")
 
     def import_transforms(self, n_block, b_obj, bone_name=None):
         """Loads an animation attached to a nif block."""
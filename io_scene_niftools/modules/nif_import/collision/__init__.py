@@ -109,4 +109,9 @@ class Collision:
                         # fallback, not sure if we should do this
                         mat_name = str(havok_material)
                     b_mat = get_material(mat_name)
-                    b_me.materials.append(b_mat)
+                    if b_mat not in b_me.materials[:]:
+                        if b_me.users > 1:
+                            # primitive mesh shared with a collider of another material, use a copy instead
+                            b_me = b_obj.data = b_me.copy()
+                            b_me.materials.clear()
+                        b_me.materials.append(b_mat)
@@ -42,13 +42,15 @@ import mathutils
 import operator
 from functools import reduce, singledispatch
 
+import numpy as np
+
 from pyffi.formats.nif import NifFormat
-from pyffi.utils.quickhull import qhull3d
 
 from io_scene_niftools.modules.nif_import import collision
 from io_scene_niftools.modules.nif_import.collision import Collision
 from io_scene_niftools.modules.nif_import.object import Object
 from io_scene_niftools.utils import consts
+from io_scene_niftools.utils.hull import convex_hull
 from io_scene_niftools.utils.singleton import NifData
 from io_scene_niftools.utils.logging import NifLog
 
@@ -66,6 +68,9 @@ class BhkCollision(Collision):
         else:
             self.HAVOK_SCALE = consts.HAVOK_SCALE
 
+        # maps the scaled vertices of convex shapes to their hull, as many shapes share the same vertices
+        self.hull_cache = {}
+
         self.process_bhk = singledispatch(self.process_bhk)
         self.process_bhk.register(NifFormat.bhkTransformShape, self.import_bhktransform)
         self.process_bhk.register(NifFormat.bhkRigidBodyT, self.import_bhk_ridgidbody_t)
@@ -267,9 +272,12 @@ class BhkCollision(Collision):
         NifLog.debug(f"Importing {bhk_shape.__class__.__name__}")
 
         # find vertices (and fix scale)
-        scaled_verts = [(self.HAVOK_SCALE * n_vert.x, self.HAVOK_SCALE * n_vert.y, self.HAVOK_SCALE * n_vert.z)
-                        for n_vert in bhk_shape.vertices]
-        verts, faces = qhull3d(scaled_verts)
+        scaled_verts = np.array([(n_vert.x, n_vert.y, n_vert.z) for n_vert in bhk_shape.vertices],
+                                dtype=np.float64).reshape(-1, 3) * self.HAVOK_SCALE
+        hull_key = scaled_verts.tobytes()
+        if hull_key not in self.hull_cache:
+            self.hull_cache[hull_key] = convex_hull(scaled_verts)
+        verts, faces = self.hull_cache[hull_key]
 
         b_obj = Object.mesh_from_data("convexpoly", verts, faces)
         radius = bhk_shape.radius * self.HAVOK_SCALE
@@ -289,26 +297,23 @@ class BhkCollision(Collision):
             # fallout 3 stores them in the data
             subshapes = bhk_shape.data.sub_shapes
 
+        # decode all vertices and triangles once
+        n_verts = np.array([n_vert.as_tuple() for n_vert in bhk_shape.data.vertices], dtype=np.float64).reshape(-1, 3)
+        n_tris = np.array([(bhk_triangle.triangle.v_1, bhk_triangle.triangle.v_2, bhk_triangle.triangle.v_3)
+                           for bhk_triangle in bhk_shape.data.triangles], dtype=np.int64).reshape(-1, 3)
+
+        # a triangle belongs to the subshape whose vertex range contains its first vertex
+        vertex_ends = np.cumsum([subshape.num_vertices for subshape in subshapes], dtype=np.int64)
+        tri_subshapes = np.searchsorted(vertex_ends, n_tris[:, 0], side='right')
+        tri_order = np.argsort(tri_subshapes, kind='stable')
+        tri_bounds = np.searchsorted(tri_subshapes[tri_order], np.arange(len(subshapes) + 1))
+
         for subshape_num, subshape in enumerate(subshapes):
-            verts = []
-            faces = []
-            for vert_index in range(vertex_offset, vertex_offset + subshape.num_vertices):
-                n_vert = bhk_shape.data.vertices[vert_index]
-                verts.append((n_vert.x * self.HAVOK_SCALE,
-                              n_vert.y * self.HAVOK_SCALE,
-                              n_vert.z * self.HAVOK_SCALE))
-
-            for bhk_triangle in bhk_shape.data.triangles:
-                bhk_tri = bhk_triangle.triangle
-                if (vertex_offset <= bhk_tri.v_1) and (bhk_tri.v_1 < vertex_offset + subshape.num_vertices):
-                    faces.append((bhk_tri.v_1 - vertex_offset,
-                                  bhk_tri.v_2 - vertex_offset,
-                                  bhk_tri.v_3 - vertex_offset))
-                else:
-                    continue
-
-            b_obj = Object.mesh_from_data(f'poly{subshape_num:d}', verts, faces)
-            radius = min(vert.co.length for vert in b_obj.data.vertices)
+            verts = n_verts[vertex_offset:vertex_offset + subshape.num_vertices] * self.HAVOK_SCALE
+            faces = n_tris[tri_order[tri_bounds[subshape_num]:tri_bounds[subshape_num + 1]]] - vertex_offset
+
+            b_obj = Object.mesh_from_data(f'poly{subshape_num:d}', verts.tolist(), faces.tolist())
+            radius = float(np.linalg.norm(verts, axis=1).min())
             self.set_b_collider(b_obj, bounds_type="MESH", radius=radius, n_obj=subshape)
 
             vertex_offset += subshape.num_vertices
@@ -37,6 +37,7 @@
 # ***** END LICENSE BLOCK *****
 
 import mathutils
+import numpy as np
 
 from pyffi.formats.nif import NifFormat
 
@@ -45,6 +46,7 @@ from io_scene_niftools.modules.nif_import.animation.morph import MorphAnimation
 from io_scene_niftools.modules.nif_import.geometry.vertex.groups import VertexGroup
 from io_scene_niftools.modules.nif_import.geometry import mesh
 from io_scene_niftools.modules.nif_import.geometry.vertex import Vertex
+from io_scene_niftools.modules.nif_import.object.block_registry import block_store
 from io_scene_niftools.modules.nif_import.property.material import Material
 from io_scene_niftools.modules.nif_import.property.geometry.mesh import MeshPropertyProcessor
 from io_scene_niftools.utils import math
@@ -79,33 +81,61 @@ class Mesh:
             raise io_scene_niftools.utils.logging.NifError(f"No shape data in {node_name}")
 
         # create raw mesh from vertices and triangles
-        b_mesh.from_pydata(n_tri_data.vertices, [], n_tri_data.get_triangles())
-        b_mesh.update()
+        vertices = np.array([v.as_tuple() for v in n_tri_data.vertices], dtype=np.float32).reshape(-1, 3)
+        triangles = np.array(list(n_tri_data.get_triangles()), dtype=np.int32).reshape(-1, 3)
+
+        # merge the vertices that nif duplicates for uv seams, so they only differ in per loop data
+        if NifOp.props.combine_vertices:
+            normals = None
+            if n_tri_data.has_normals:
+                normals = np.array([n.as_tuple() for n in n_tri_data.normals], dtype=np.float32)
+            nif_vertices, vertex_remap = Vertex.weld(vertices, normals, NifOp.props.epsilon)
+            NifLog.info(f"Combined {len(vertices)} vertices into {len(nif_vertices)}")
+            vertices = vertices[nif_vertices]
+            num_triangles = len(triangles)
+            triangles = Vertex.remove_degenerate_triangles(triangles, vertex_remap)
+            if len(triangles) < num_triangles:
+                NifLog.info(f"Removed {num_triangles - len(triangles)} triangles that became degenerate")
+            b_triangles = vertex_remap[triangles]
+            # keep the merged vertex of every nif vertex, so egm morphs can be mapped onto the mesh later on
+            block_store.store_vertex_remap(b_mesh, vertex_remap)
+        else:
+            nif_vertices = vertex_remap = None
+            b_triangles = triangles
 
         # must set faces to smooth before setting custom normals, or the normals bug out!
         is_smooth = True if (n_tri_data.has_normals or n_block.skin_instance) else False
-        self.set_face_smooth(b_mesh, is_smooth)
+        self.set_geometry(b_mesh, vertices, b_triangles, is_smooth)
 
-        # store additional data layers
-        Vertex.map_uv_layer(b_mesh, n_tri_data)
-        Vertex.map_vertex_colors(b_mesh, n_tri_data)
-        Vertex.map_normals(b_mesh, n_tri_data)
+        # store additional data layers, from the nif vertex of every loop
+        loop_vertices = triangles.ravel()
+        Vertex.map_uv_layer(b_mesh, n_tri_data, loop_vertices)
+        Vertex.map_vertex_colors(b_mesh, n_tri_data, loop_vertices)
+        Vertex.map_normals(b_mesh, n_tri_data, nif_vertices)
 
         self.mesh_prop_processor.process_property_list(n_block, b_obj)
 
         # import skinning info, for meshes affected by bones
-        VertexGroup.import_skin(n_block, b_obj)
+        VertexGroup.import_skin(n_block, b_obj, vertex_remap)
 
         # import morph controller
         if NifOp.props.animation:
-            self.morph_anim.import_morph_controller(n_block, b_obj)
-
-        # todo [mesh] remove doubles here using blender operator
+            self.morph_anim.import_morph_controller(n_block, b_obj, nif_vertices)
 
     @staticmethod
-    def set_face_smooth(b_mesh, smooth):
-        """set face smoothing and material"""
-
-        for poly in b_mesh.polygons:
-            poly.use_smooth = smooth
-            poly.material_index = 0  # only one material
+    def set_geometry(b_mesh, vertices, triangles, smooth):
+        """Fill an empty mesh with vertices and triangles in bulk, set face smoothing and material."""
+        num_triangles = len(triangles)
+        b_mesh.vertices.add(len(vertices))
+        b_mesh.loops.add(num_triangles * 3)
+        b_mesh.polygons.add(num_triangles)
+
+        b_mesh.vertices.foreach_set("co", vertices.ravel())
+        b_mesh.loops.foreach_set("vertex_index", triangles.ravel())
+        b_mesh.polygons.foreach_set("loop_start", np.arange(0, num_triangles * 3, 3, dtype=np.int32))
+        b_mesh.polygons.foreach_set("loop_total", np.full(num_triangles, 3, dtype=np.int32))
+        b_mesh.polygons.foreach_set("use_smooth", np.full(num_triangles, smooth, dtype=bool))
+        b_mesh.polygons.foreach_set("material_index", np.zeros(num_triangles, dtype=np.int32))  # only one material
+
+        # no edges were given, so calculate them
+        b_mesh.update(calc_edges=True)
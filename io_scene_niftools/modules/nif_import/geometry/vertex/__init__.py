@@ -37,6 +37,9 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import numpy as np
+
+from io_scene_niftools.utils import math
 from io_scene_niftools.utils.singleton import NifOp
 from io_scene_niftools.utils.logging import NifLog
 import mathutils
@@ -44,45 +47,83 @@ import mathutils
 class Vertex:
 
     @staticmethod
-    def map_vertex_colors(b_mesh, n_tri_data):
+    def get_loop_vertices(b_mesh):
+        """Returns the vertex index of every loop of the mesh, to expand per vertex data to loops."""
+        loop_vertices = np.empty(len(b_mesh.loops), dtype=np.int32)
+        b_mesh.loops.foreach_get("vertex_index", loop_vertices)
+        return loop_vertices
+
+    @staticmethod
+    def weld(positions, normals=None, epsilon=0.0):
+        """Grid hash welding: vertices whose position (and normal) fall into the same cell of an epsilon sized grid are merged.
+
+        :return: The index of the first vertex of each merged vertex, in the original order,
+            and the index of the merged vertex for every vertex."""
+        keys = [positions] if normals is None else [positions, normals]
+        if epsilon > 0:
+            keys = [math.get_grid_cells(key, epsilon) for key in keys]
+        else:
+            # + 0.0 turns -0.0 into 0.0, so both have the same bits
+            keys = [(key + 0.0).view(np.int32) for key in keys]
+        _, first, inverse = np.unique(np.concatenate(keys, axis=1), axis=0, return_index=True, return_inverse=True)
+        # number the merged vertices by first appearance, so that the vertex order is kept
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        return first[order], rank[inverse.ravel()]
+
+    @staticmethod
+    def get_first_vertices(vertex_remap):
+        """Returns the index of the first vertex that was merged into each merged vertex, the inverse of weld's vertex_remap."""
+        return np.unique(vertex_remap, return_index=True)[1]
+
+    @staticmethod
+    def remove_degenerate_triangles(triangles, vertex_remap):
+        """Returns the triangles that still have three distinct vertices after remapping their vertices."""
+        remapped = vertex_remap[triangles]
+        keep = (remapped[:, 0] != remapped[:, 1]) & (remapped[:, 1] != remapped[:, 2]) & (remapped[:, 2] != remapped[:, 0])
+        return triangles[keep]
+
+    @staticmethod
+    def map_vertex_colors(b_mesh, n_tri_data, loop_vertices=None):
+        """Import nif vertex colors as a color layer, loop_vertices is the nif vertex of every loop."""
         if n_tri_data.has_vertex_colors:
+            if loop_vertices is None:
+                loop_vertices = Vertex.get_loop_vertices(b_mesh)
+            colors = np.array([(col.r, col.g, col.b, col.a) for col in n_tri_data.vertex_colors], dtype=np.float32)
             b_mesh.vertex_colors.new(name=f"RGBA")
-            b_mesh.vertex_colors[-1].data.foreach_set("color",
-                    [c for col in [n_tri_data.vertex_colors[l.vertex_index] for l in b_mesh.loops] for c in (col.r, col.g, col.b, col.a)])
+            b_mesh.vertex_colors[-1].data.foreach_set("color", colors[loop_vertices].ravel())
 
     @staticmethod
-    def map_uv_layer(b_mesh, n_tri_data):
+    def map_uv_layer(b_mesh, n_tri_data, loop_vertices=None):
         """ UV coordinates, NIF files only support 'sticky' UV coordinates, and duplicates vertices to emulate hard edges and UV seam.
             So whenever a hard edge or a UV seam is present the mesh, vertices are duplicated.
             Blender only must duplicate vertices for hard edges; duplicating for UV seams would introduce unnecessary hard edges."""
 
+        if not n_tri_data.uv_sets:
+            return
+        if loop_vertices is None:
+            loop_vertices = Vertex.get_loop_vertices(b_mesh)
         # "sticky" UV coordinates: these are transformed in Blender UV's
         for uv_i, uv_set in enumerate(n_tri_data.uv_sets):
+            uvs = np.array([(uv.u, 1.0 - uv.v) for uv in uv_set], dtype=np.float32)
             b_mesh.uv_layers.new(name=f"UV{uv_i}")
-            b_mesh.uv_layers[-1].data.foreach_set("uv",
-                                              [c for uv in [uv_set[l.vertex_index] for l in b_mesh.loops] for c in (uv.u, 1.0 - uv.v)])
+            b_mesh.uv_layers[-1].data.foreach_set("uv", uvs[loop_vertices].ravel())
 
     @staticmethod
-    def map_normals(b_mesh, n_tri_data):
-        """Import nif normals as custom normals."""
+    def map_normals(b_mesh, n_tri_data, nif_vertices=None):
+        """Import nif normals as custom normals, nif_vertices is the nif vertex of every blender vertex if they were combined."""
         if not n_tri_data.has_normals:
             return
-        assert len(b_mesh.vertices) == len(n_tri_data.normals)
+        assert len(b_mesh.vertices) == (len(n_tri_data.normals) if nif_vertices is None else len(nif_vertices))
         # set normals
         if NifOp.props.use_custom_normals:
-            # map normals so we can set them to the edge corners (stored per loop)
-            no_array = []
-            for face in b_mesh.polygons:
-                for vertex_index in face.vertices:
-                    # no_array.append(model.normals[vertex_index])
-                    # no_array.append(mathutils.Vector(n_tri_data.normals[vertex_index]).normalized())
-                    no_array.append(n_tri_data.normals[vertex_index].as_tuple())
-                    # no_array.append((0,0,1))
-                # no_array.append(model.tangents[vertex_index])
-                # face.use_smooth = True
-
+            # nif normals are per vertex, so they can be set without mapping them to the loops
+            normals = np.array([n.as_tuple() for n in n_tri_data.normals], dtype=np.float32)
+            if nif_vertices is not None:
+                normals = normals[nif_vertices]
             b_mesh.use_auto_smooth = True
-            b_mesh.normals_split_custom_set(no_array)
+            b_mesh.normals_split_custom_set_from_vertices(normals)
 
     @staticmethod
     def get_uv_layer_name(uvset):
@@ -36,6 +36,7 @@
 # POSSIBILITY OF SUCH DAMAGE.
 #
 # ***** END LICENSE BLOCK *****
+import numpy as np
 from pyffi.formats.nif import NifFormat
 
 from io_scene_niftools.modules.nif_import.object.block_registry import block_store
@@ -46,55 +47,91 @@ class VertexGroup:
     """Class that maps weighted vertices to specific groups"""
 
     @staticmethod
-    def get_skin_deformation_from_partition(n_geom):
-        """ Workaround because pyffi does not support this skinning method """
-
-        # todo [pyffi] integrate this into pyffi!!!
-        #              so that NiGeometry.get_skin_deformation() deals with this as intended
-
-        # mostly a copy from pyffi...
-        skin_inst = n_geom.skin_instance
+    def get_bone_transforms(skin_inst):
+        """Returns the (N,4,4) skinning transforms and (N,3,3) rotations of all bones of a skin instance."""
         skin_data = skin_inst.data
-        skin_partition = skin_inst.skin_partition
         skel_root = skin_inst.skeleton_root
-        vertices = [NifFormat.Vector3() for _ in range(n_geom.data.num_vertices)]
-
-        # ignore normals for now, not needed for import
-        sum_weights = [0.0 for _ in range(n_geom.data.num_vertices)]
         skin_offset = skin_data.get_transform()
 
-        # store one transform per bone
-        bone_transforms = []
+        transforms = np.empty((len(skin_inst.bones), 4, 4), dtype=np.float64)
+        rotations = np.empty((len(skin_inst.bones), 3, 3), dtype=np.float64)
         for i, bone_block in enumerate(skin_inst.bones):
-            bone_data = skin_data.bone_list[i]
-            bone_offset = bone_data.get_transform()
+            bone_offset = skin_data.bone_list[i].get_transform()
             bone_matrix = bone_block.get_transform(skel_root)
             transform = bone_offset * bone_matrix * skin_offset
-            bone_transforms.append(transform)
+            transforms[i] = transform.as_list()
+            rotations[i] = transform.get_scale_rotation_translation()[1].as_list()
+        return transforms, rotations
 
-        # now the actual unique bit
-        for block in skin_partition.skin_partition_blocks:
-            # create all vgroups for this block's bones
-            block_bone_transforms = [bone_transforms[i] for i in block.bones]
+    @staticmethod
+    def get_skin_weights(skin_inst, num_vertices):
+        """Returns flat arrays of (vertex index, bone index, weight) for all influences of a skin instance.
 
-            # go over each vert in this block
-            for vert_index, vertex_weights, bone_indices in zip(block.vertex_map, block.vertex_weights, block.bone_indices):
-                # skip verts that were already processed in an earlier block
-                if sum_weights[vert_index] != 0:
+        Weights are read from the skin data if it stores them, otherwise from the skin partition,
+        where each vertex takes its weights from the first block that references it."""
+        skin_data = skin_inst.data
+        vertices = []
+        bones = []
+        weights = []
+        if skin_data.has_vertex_weights:
+            for b_i, bone_data in enumerate(skin_data.bone_list):
+                vertices.append(np.array([w.index for w in bone_data.vertex_weights], dtype=np.int64))
+                weights.append(np.array([w.weight for w in bone_data.vertex_weights], dtype=np.float64))
+                bones.append(np.full(len(vertices[-1]), b_i, dtype=np.int64))
+        else:
+            processed = np.zeros(num_vertices, dtype=bool)
+            for block in skin_inst.skin_partition.skin_partition_blocks:
+                vertex_map = np.array(block.vertex_map, dtype=np.int64)
+                if not len(vertex_map):
                     continue
+                # map the block's local bone indices to skin instance bones
+                block_bones = np.array(block.bones, dtype=np.int64)
+                bone_indices = block_bones[np.array(block.bone_indices, dtype=np.int64).reshape(len(vertex_map), -1)]
+                block_weights = np.array(block.vertex_weights, dtype=np.float64).reshape(len(vertex_map), -1)
+                # skip verts that were already processed in an earlier block
+                mask = (block_weights > 0) & ~processed[vertex_map, None]
+                vertices.append(np.broadcast_to(vertex_map[:, None], mask.shape)[mask])
+                bones.append(bone_indices[mask])
+                weights.append(block_weights[mask])
+                processed[vertices[-1]] = True
+        if not vertices:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return np.concatenate(vertices), np.concatenate(bones), np.concatenate(weights)
+
+    @staticmethod
+    def get_skin_deformation(n_geom):
+        """Returns the (n,3) skinned vertices and normals (None if the geometry has no normals) of a skinned geometry.
+
+        This linear blend skinning works from the skin data as well as from the skin partition, which pyffi's
+        NiGeometry.get_skin_deformation does not support."""
+        n_data = n_geom.data
+        num_vertices = n_data.num_vertices
+        skin_inst = n_geom.skin_instance
+        transforms, rotations = VertexGroup.get_bone_transforms(skin_inst)
+        vertex_indices, bone_indices, weights = VertexGroup.get_skin_weights(skin_inst, num_vertices)
 
-                # go over all 4 weight / bone pairs and transform this vert
-                for weight, b_i in zip(vertex_weights, bone_indices):
-                    if weight > 0:
-                        transform = block_bone_transforms[b_i]
-                        vertices[vert_index] += weight * (n_geom.data.vertices[vert_index] * transform)
-                        sum_weights[vert_index] += weight
+        sum_weights = np.bincount(vertex_indices, weights=weights, minlength=num_vertices)
+        bad_weights = np.flatnonzero(np.abs(sum_weights - 1.0) > 0.01)
+        if len(bad_weights):
+            NifLog.warn(f"{len(bad_weights)} vertices of {n_geom.name} have weights not summing to one, "
+                        f"eg. vertex {bad_weights[0]} with {sum_weights[bad_weights[0]]:.4f}")
 
-        for i, s in enumerate(sum_weights):
-            if abs(s - 1.0) > 0.01:
-                print(f"Vertex {i:d} has weights not summing to one: {sum_weights['i']:d}")
+        def blend(values, matrices, offsets=None):
+            # transform every influence by its bone, then sum the weighted results per vertex
+            transformed = np.einsum('ij,ijk->ik', values[vertex_indices], matrices[bone_indices])
+            if offsets is not None:
+                transformed += offsets[bone_indices]
+            transformed *= weights[:, None]
+            return np.stack([np.bincount(vertex_indices, weights=transformed[:, k], minlength=num_vertices)
+                             for k in range(3)], axis=1)
 
-        return vertices
+        vertices = np.array([v.as_tuple() for v in n_data.vertices], dtype=np.float64).reshape(-1, 3)
+        skinned_vertices = blend(vertices, transforms[:, :3, :3], transforms[:, 3, :3])
+        skinned_normals = None
+        if n_data.has_normals:
+            normals = np.array([n.as_tuple() for n in n_data.normals], dtype=np.float64).reshape(-1, 3)
+            skinned_normals = blend(normals, rotations)
+        return skinned_vertices, skinned_normals
 
     @staticmethod
     def apply_skin_deformation(n_data):
@@ -105,23 +142,55 @@ class VertexGroup:
         # make sure that each skin is applied only once to avoid distortions when a model is referred to twice
         for n_geom in set(n_geoms):
             NifLog.info('Applying skin deformation on geometry {0}'.format(n_geom.name))
-            skininst = n_geom.skin_instance
-            skindata = skininst.data
-            if skindata.has_vertex_weights:
-                vertices = n_geom.get_skin_deformation()[0]
-            else:
-                NifLog.info("PyFFI does not support this type of skinning, so here's a workaround...")
-                vertices = VertexGroup.get_skin_deformation_from_partition(n_geom)
+            vertices, normals = VertexGroup.get_skin_deformation(n_geom)
 
             # finally we can actually set the data
-            for vold, vnew in zip(n_geom.data.vertices, vertices):
-                vold.x = vnew.x
-                vold.y = vnew.y
-                vold.z = vnew.z
+            for vold, (x, y, z) in zip(n_geom.data.vertices, vertices.tolist()):
+                vold.x = x
+                vold.y = y
+                vold.z = z
+            if normals is not None:
+                for nold, (x, y, z) in zip(n_geom.data.normals, normals.tolist()):
+                    nold.x = x
+                    nold.y = y
+                    nold.z = z
+
+    @staticmethod
+    def get_vertex_group(b_obj, v_groups, group_name):
+        """Returns the vertex group with the given name, creating it if needed; v_groups caches the groups by name."""
+        v_group = v_groups.get(group_name)
+        if v_group is None:
+            v_group = b_obj.vertex_groups.get(group_name)
+            if v_group is None:
+                v_group = b_obj.vertex_groups.new(name=group_name)
+            v_groups[group_name] = v_group
+        return v_group
 
     @staticmethod
-    def import_skin(ni_block, b_obj):
-        """Import a NiSkinInstance and its contents as vertex groups"""
+    def add_weights(v_group, vertices, weights):
+        """Assign weights to vertices in a vertex group, with one call for all vertices that get the same weight."""
+        vertices = np.asarray(vertices, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32)
+        # the last weight of a vertex replaces the earlier ones
+        _, last = np.unique(vertices[::-1], return_index=True)
+        keep = len(vertices) - 1 - last
+        vertices, weights = vertices[keep], weights[keep]
+        # bucket the vertices by weight
+        order = np.argsort(weights, kind='stable')
+        bucket_weights, starts = np.unique(weights[order], return_index=True)
+        for weight, bucket in zip(bucket_weights.tolist(), np.split(vertices[order], starts[1:])):
+            v_group.add(bucket.tolist(), weight, 'REPLACE')
+
+    @staticmethod
+    def import_skin(ni_block, b_obj, vertex_remap=None):
+        """Import a NiSkinInstance and its contents as vertex groups
+
+        :param vertex_remap: The blender vertex index for every nif vertex, if vertices were combined on import.
+        """
+        # nif vertex indices are blender vertex indices, unless vertices were combined
+        if vertex_remap is None:
+            vertex_remap = np.arange(ni_block.data.num_vertices)
+        v_groups = {}
         skininst = ni_block.skin_instance
         if skininst:
             skindata = skininst.data
@@ -136,32 +205,42 @@ class VertexGroup:
 
                     vertex_weights = bone_weights[idx].vertex_weights
                     group_name = block_store.import_name(n_bone)
-                    if group_name not in b_obj.vertex_groups:
-                        v_group = b_obj.vertex_groups.new(name=group_name)
+                    v_group = VertexGroup.get_vertex_group(b_obj, v_groups, group_name)
 
-                    for skinWeight in vertex_weights:
-                        vert = skinWeight.index
-                        weight = skinWeight.weight
-                        v_group.add([vert], weight, 'REPLACE')
+                    vertices = vertex_remap[[skinWeight.index for skinWeight in vertex_weights]]
+                    VertexGroup.add_weights(v_group, vertices, [skinWeight.weight for skinWeight in vertex_weights])
 
             # WLP2 - hides the weights in the partition
             else:
+                # gather the weights of each bone over all blocks, in block order
+                group_weights = {}
                 skin_partition = skininst.skin_partition
                 for block in skin_partition.skin_partition_blocks:
                     # create all vgroups for this block's bones
                     block_bone_names = [block_store.import_name(bones[i]) for i in block.bones]
                     for group_name in block_bone_names:
-                        b_obj.vertex_groups.new(name=group_name)
+                        VertexGroup.get_vertex_group(b_obj, v_groups, group_name)
+                        group_weights.setdefault(group_name, ([], []))
+                    if not block.num_vertices:
+                        continue
+
+                    # go over all verts in this block at once, each has up to 4 weights / bone pairs
+                    vertices = vertex_remap[list(block.vertex_map)]
+                    vertex_weights = np.array([list(weights) for weights in block.vertex_weights], dtype=np.float32)
+                    bone_indices = np.array([list(indices) for indices in block.bone_indices], dtype=np.int64)
+                    vertices = np.broadcast_to(vertices[:, np.newaxis], vertex_weights.shape)
 
-                    # go over each vert in this block
-                    for vert, vertex_weights, bone_indices in zip(block.vertex_map, block.vertex_weights, block.bone_indices):
+                    # assign this vert's 4 weights to its 4 vgroups (at max)
+                    for b_i, group_name in enumerate(block_bone_names):
+                        used = (bone_indices == b_i) & (vertex_weights > 0)
+                        if used.any():
+                            group_vertices, group_vertex_weights = group_weights[group_name]
+                            group_vertices.append(vertices[used])
+                            group_vertex_weights.append(vertex_weights[used])
 
-                        # assign this vert's 4 weights to its 4 vgroups (at max)
-                        for w, b_i in zip(vertex_weights, bone_indices):
-                            if w > 0:
-                                group_name = block_bone_names[b_i]
-                                v_group = b_obj.vertex_groups[group_name]
-                                v_group.add([vert], w, 'REPLACE')
+                for group_name, (group_vertices, group_vertex_weights) in group_weights.items():
+                    if group_vertices:
+                        VertexGroup.add_weights(v_groups[group_name], np.concatenate(group_vertices), np.concatenate(group_vertex_weights))
 
         # import body parts as vertex groups
         if isinstance(skininst, NifFormat.BSDismemberSkinInstance):
@@ -175,13 +254,13 @@ class VertexGroup:
 
                 # create vertex group if it did not exist yet
                 if group_name not in b_obj.vertex_groups:
-                    v_group = b_obj.vertex_groups.new(name=group_name)
                     skinpart_index = len(skinpart_list)
                     skinpart_list.append((skinpart_index, group_name))
                     bodypart_flag.append(bodypart.part_flag)
+                v_group = VertexGroup.get_vertex_group(b_obj, v_groups, group_name)
 
                 # find vertex indices of this group
-                groupverts = [v_index for v_index in skinpartblock.vertex_map]
+                groupverts = vertex_remap[list(skinpartblock.vertex_map)].tolist()
 
                 # create the group
                 v_group.add(groupverts, 1, 'ADD')
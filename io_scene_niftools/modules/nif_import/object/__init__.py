@@ -37,6 +37,8 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import itertools
+
 import bpy
 from pyffi.formats.nif import NifFormat
 
@@ -87,13 +89,45 @@ class Object:
 
     @staticmethod
     def box_from_extents(b_name, minx, maxx, miny, maxy, minz, maxz):
+        # identical primitives share their mesh
+        primitive_key = (b_name, minx, maxx, miny, maxy, minz, maxz)
+        b_mesh = block_store.get_datablock(primitive_key)
+        if b_mesh:
+            return Object.create_b_obj(None, b_mesh, b_name)
         verts = []
         for x in [minx, maxx]:
             for y in [miny, maxy]:
                 for z in [minz, maxz]:
                     verts.append((x, y, z))
         faces = [[0, 1, 3, 2], [6, 7, 5, 4], [0, 2, 6, 4], [3, 1, 5, 7], [4, 5, 1, 0], [7, 6, 2, 3]]
-        return Object.mesh_from_data(b_name, verts, faces)
+        b_obj = Object.mesh_from_data(b_name, verts, faces)
+        block_store.store_datablock(primitive_key, b_obj.data)
+        return b_obj
+
+    @staticmethod
+    def create_instance_collection(b_obj):
+        """Move b_obj and its children into a new collection, which is excluded from the view layer and only instanced."""
+        b_collection = bpy.data.collections.new(b_obj.name)
+        bpy.context.scene.collection.children.link(b_collection)
+        b_objs = [b_obj]
+        # the list grows while iterating, to collect all descendants
+        for b_child in b_objs:
+            b_objs.extend(b_child.children)
+        for b_child in b_objs:
+            b_collection.objects.link(b_child)
+            bpy.context.scene.collection.objects.unlink(b_child)
+        bpy.context.view_layer.layer_collection.children[b_collection.name].exclude = True
+        return b_collection
+
+    @staticmethod
+    def create_collection_instance(n_block, b_collection):
+        """Create an empty that instances b_collection with the transform of n_block."""
+        b_obj = Object.create_b_obj(n_block, None)
+        b_obj.niftools.flags = n_block.flags
+        b_obj.instance_type = 'COLLECTION'
+        b_obj.instance_collection = b_collection
+        b_obj.matrix_local = math.import_matrix(n_block)
+        return b_obj
 
     def set_object_bind(self, b_obj, b_obj_children, b_armature):
         """ Sets up parent-child relationships for b_obj and all its children and corrects space for children of bones"""
@@ -119,10 +153,11 @@ class Object:
         else:
             raise RuntimeError(f"Unexpected object type {b_obj.__class__:s}")
 
-    def create_mesh_object(self, n_block):
+    def create_mesh_object(self, n_block, b_mesh=None):
         ni_name = n_block.name.decode()
         # create mesh data
-        b_mesh = bpy.data.meshes.new(ni_name)
+        if not b_mesh:
+            b_mesh = bpy.data.meshes.new(ni_name)
 
         # create mesh object and link to data
         b_obj = self.create_b_obj(n_block, b_mesh)
@@ -137,9 +172,15 @@ class Object:
 
     def import_geometry_object(self, b_armature, n_block):
         # it's a shape node and we're not importing skeleton only
-        b_obj = self.create_mesh_object(n_block)
+        mesh_key = self.get_mesh_key(n_block)
+        b_mesh = block_store.get_datablock(mesh_key) if mesh_key else None
+        # geometry that shares data and properties with an already imported shape links its mesh
+        b_obj = self.create_mesh_object(n_block, b_mesh)
         b_obj.matrix_local = math.import_matrix(n_block)  # set transform matrix for the mesh
-        self.mesh.import_mesh(n_block, b_obj)
+        if not b_mesh:
+            self.mesh.import_mesh(n_block, b_obj)
+            if mesh_key:
+                block_store.store_datablock(mesh_key, b_obj.data)
         bpy.context.view_layer.objects.active = b_obj
         # store flags etc
         self.import_object_flags(n_block, b_obj)
@@ -148,6 +189,18 @@ class Object:
             self.append_armature_modifier(b_obj, b_armature)
         return b_obj
 
+    @staticmethod
+    def get_mesh_key(n_block):
+        """Returns the key under which the mesh of n_block can be shared with other shapes, or None if it can't be shared."""
+        if n_block.skin_instance or n_block.controller:
+            # vertex groups and shape level animations, such as shape keys, uv and visibility, are set up per object
+            return None
+        n_props = tuple(itertools.chain(n_block.properties, n_block.bs_properties))
+        if any(isinstance(n_prop, NifFormat.NiWireframeProperty) for n_prop in n_props):
+            # wireframe is imported as a modifier on the object
+            return None
+        return n_block.data, n_props
+
     # TODO [object][property] Replace with object level property processing
     @staticmethod
     def import_object_flags(n_block, b_obj):
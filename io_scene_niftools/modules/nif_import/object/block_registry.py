@@ -72,6 +72,28 @@ def replace_nif_name(name, original, replacement, open_replace, close_replace):
 
 class BlockRegistry:
 
+    def __init__(self):
+        # maps nif blocks (or keys built from them) to the blender datablocks imported for them, so they can be reused
+        self.block_to_datablock = {}
+        # maps the names of meshes whose vertices were combined to the merged vertex of every nif vertex, for egm morphs
+        self.mesh_to_vertex_remap = {}
+
+    def get_datablock(self, key):
+        """Returns the blender datablock that was stored for key, or None."""
+        return self.block_to_datablock.get(key)
+
+    def store_datablock(self, key, datablock):
+        """Store a blender datablock, so it is reused when key is imported again."""
+        self.block_to_datablock[key] = datablock
+
+    def get_vertex_remap(self, b_mesh):
+        """Returns the merged vertex of every nif vertex of a mesh whose vertices were combined on import, or None."""
+        return self.mesh_to_vertex_remap.get(b_mesh.name)
+
+    def store_vertex_remap(self, b_mesh, vertex_remap):
+        """Store the merged vertex of every nif vertex of a mesh whose vertices were combined on import."""
+        self.mesh_to_vertex_remap[b_mesh.name] = vertex_remap
+
     @staticmethod
     def store_longname(b_obj, n_name):
         """Save original name as object property, for export"""
@@ -42,10 +42,14 @@ import bpy
 from functools import singledispatch
 import itertools
 
+from pyffi.formats.nif import NifFormat
+
+from io_scene_niftools.modules.nif_import.object.block_registry import block_store
 from io_scene_niftools.modules.nif_import.property.geometry.niproperty import NiPropertyProcessor
 from io_scene_niftools.modules.nif_import.property.nodes_wrapper import NodesWrapper
 from io_scene_niftools.modules.nif_import.property.shader.bsshaderlightingproperty import BSShaderLightingPropertyProcessor
 from io_scene_niftools.modules.nif_import.property.shader.bsshaderproperty import BSShaderPropertyProcessor
+from io_scene_niftools.utils import math
 from io_scene_niftools.utils.logging import NifLog
 
 
@@ -75,6 +79,14 @@ class MeshPropertyProcessor:
         if not props:
             return
 
+        # shapes with identical properties share their material
+        material_key = self.get_material_key(n_block, b_mesh, props)
+        b_mat = block_store.get_datablock(material_key) if material_key else None
+        if b_mat:
+            NifLog.debug(f"Reusing material {b_mat.name} with identical properties")
+            b_mesh.materials.append(b_mat)
+            return
+
         # just to avoid duped materials, a first pass, make sure a named material is created or retrieved
         for prop in props:
             if prop.name:
@@ -114,6 +126,22 @@ class MeshPropertyProcessor:
 
         self.nodes_wrapper.connect_to_output(b_mesh.vertex_colors)
 
+        if material_key:
+            block_store.store_datablock(material_key, b_mat)
+
+    @staticmethod
+    def get_material_key(n_block, b_mesh, props):
+        """Returns a key from the content of the properties and everything else the material depends on,
+        or None if the properties must be processed for each shape."""
+        if any(isinstance(prop, NifFormat.NiWireframeProperty) for prop in props):
+            # wireframe is imported as a modifier on the object
+            return None
+        # the property hashes include referenced blocks, such as textures and their paths
+        prop_hashes = tuple((type(prop), prop.get_hash()) for prop in props)
+        # uv controllers on the shape are imported into the material
+        n_uv_ctrl = math.find_controller(n_block, NifFormat.NiUVController)
+        return prop_hashes, n_uv_ctrl.get_hash() if n_uv_ctrl else None, bool(b_mesh.vertex_colors)
+
     def process_property(self, prop):
         """Base method to warn user that this property is not supported"""
         NifLog.warn(f"Unknown property block found : {prop.name:s}")
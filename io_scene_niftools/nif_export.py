@@ -179,27 +179,22 @@ class NifExport(NifCommon):
             if bpy.context.scene.niftools_scene.game == 'MORROWIND':
                 # animations without keyframe animations crash the TESCS
                 # if we are in that situation, add a trivial keyframe animation
-                has_keyframecontrollers = False
-                for block in block_store.block_to_obj:
-                    if isinstance(block, NifFormat.NiKeyframeController):
-                        has_keyframecontrollers = True
-                        break
+                has_keyframecontrollers = bool(block_store.get_blocks_of_type(NifFormat.NiKeyframeController))
                 if (not has_keyframecontrollers) and (not NifOp.props.bs_animation_node):
                     NifLog.info("Defining dummy keyframe controller")
                     # add a trivial keyframe controller on the scene root
                     self.transform_anim.create_controller(root_block, root_block.name)
 
                 if NifOp.props.bs_animation_node:
-                    for block in block_store.block_to_obj:
-                        if isinstance(block, NifFormat.NiNode):
-                            # if any of the shape children has a controller or if the ninode has a controller convert its type
-                            if block.controller or any(child.controller for child in block.children if isinstance(child, NifFormat.NiGeometry)):
-                                new_block = NifFormat.NiBSAnimationNode().deepcopy(block)
-                                # have to change flags to 42 to make it work
-                                new_block.flags = 42
-                                root_block.replace_global_node(block, new_block)
-                                if root_block is block:
-                                    root_block = new_block
+                    for block in block_store.get_blocks_of_type(NifFormat.NiNode):
+                        # if any of the shape children has a controller or if the ninode has a controller convert its type
+                        if block.controller or any(child.controller for child in block.children if isinstance(child, NifFormat.NiGeometry)):
+                            new_block = NifFormat.NiBSAnimationNode().deepcopy(block)
+                            # have to change flags to 42 to make it work
+                            new_block.flags = 42
+                            root_block.replace_global_node(block, new_block)
+                            if root_block is block:
+                                root_block = new_block
 
             # oblivion skeleton export: check that all bones have a transform controller and transform interpolator
             if bpy.context.scene.niftools_scene.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM') and filebase.lower() in ('skeleton', 'skeletonbeast'):
@@ -207,17 +202,15 @@ class NifExport(NifCommon):
                 # TODO [armature] Extract out to armature animation
                 # here comes everything that is Oblivion skeleton export specific
                 NifLog.info("Adding controllers and interpolators for skeleton")
-                # note: block_store.block_to_obj changes during iteration, so need list copy
-                for n_block in list(block_store.block_to_obj.keys()):
-                    if isinstance(n_block, NifFormat.NiNode) and n_block.name.decode() == "Bip01":
-                        for n_bone in n_block.tree(block_type=NifFormat.NiNode):
-                            n_kfc, n_kfi = self.transform_anim.create_controller(n_bone, n_bone.name.decode())
-                            # todo [anim] use self.nif_export.animationhelper.set_flags_and_timing
-                            n_kfc.flags = 12
-                            n_kfc.frequency = 1.0
-                            n_kfc.phase = 0.0
-                            n_kfc.start_time = consts.FLOAT_MAX
-                            n_kfc.stop_time = consts.FLOAT_MIN
+                for n_block in block_store.get_blocks_by_name("Bip01"):
+                    for n_bone in n_block.tree(block_type=NifFormat.NiNode):
+                        n_kfc, n_kfi = self.transform_anim.create_controller(n_bone, n_bone.name.decode())
+                        # todo [anim] use self.nif_export.animationhelper.set_flags_and_timing
+                        n_kfc.flags = 12
+                        n_kfc.frequency = 1.0
+                        n_kfc.phase = 0.0
+                        n_kfc.start_time = consts.FLOAT_MAX
+                        n_kfc.stop_time = consts.FLOAT_MIN
             else:
                 # here comes everything that should be exported EXCEPT for Oblivion skeleton exports
                 # export animation groups (not for skeleton.nif export!)
@@ -225,26 +218,25 @@ class NifExport(NifCommon):
                 pass
 
             # bhkConvexVerticesShape of children of bhkListShapes need an extra bhkConvexTransformShape (see issue #3308638, reported by Koniption)
-            # note: block_store.block_to_obj changes during iteration, so need list copy
-            for block in list(block_store.block_to_obj.keys()):
-                if isinstance(block, NifFormat.bhkListShape):
-                    for i, sub_shape in enumerate(block.sub_shapes):
-                        if isinstance(sub_shape, NifFormat.bhkConvexVerticesShape):
-                            coltf = block_store.create_block("bhkConvexTransformShape")
-                            coltf.material = sub_shape.material
-                            coltf.unknown_float_1 = 0.1
-                            unk_8 = coltf.unknown_8_bytes
-                            unk_8[0] = 96
-                            unk_8[1] = 120
-                            unk_8[2] = 53
-                            unk_8[3] = 19
-                            unk_8[4] = 24
-                            unk_8[5] = 9
-                            unk_8[6] = 253
-                            unk_8[7] = 4
-                            coltf.transform.set_identity()
-                            coltf.shape = sub_shape
-                            block.sub_shapes[i] = coltf
+            # note: the list is a copy, so new blocks can be registered while iterating
+            for block in block_store.get_blocks_of_type(NifFormat.bhkListShape):
+                for i, sub_shape in enumerate(block.sub_shapes):
+                    if isinstance(sub_shape, NifFormat.bhkConvexVerticesShape):
+                        coltf = block_store.create_block("bhkConvexTransformShape")
+                        coltf.material = sub_shape.material
+                        coltf.unknown_float_1 = 0.1
+                        unk_8 = coltf.unknown_8_bytes
+                        unk_8[0] = 96
+                        unk_8[1] = 120
+                        unk_8[2] = 53
+                        unk_8[3] = 19
+                        unk_8[4] = 24
+                        unk_8[5] = 9
+                        unk_8[6] = 253
+                        unk_8[7] = 4
+                        coltf.transform.set_identity()
+                        coltf.shape = sub_shape
+                        block.sub_shapes[i] = coltf
 
             # export constraints
             for b_obj in self.exportable_objects:
@@ -295,16 +287,15 @@ class NifExport(NifCommon):
 
             # generate mopps (must be done after applying scale!)
             if bpy.context.scene.niftools_scene.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM'):
-                for block in block_store.block_to_obj:
-                    if isinstance(block, NifFormat.bhkMoppBvTreeShape):
-                        NifLog.info("Generating mopp...")
-                        block.update_mopp()
-                        # print "=== DEBUG: MOPP TREE ==="
-                        # block.parse_mopp(verbose = True)
-                        # print "=== END OF MOPP TREE ==="
-                        # warn about mopps on non-static objects
-                        if any(sub_shape.layer != 1 for sub_shape in block.shape.sub_shapes):
-                            NifLog.warn("Mopps for non-static objects may not function correctly in-game. You may wish to use simple primitives for collision.")
+                for block in block_store.get_blocks_of_type(NifFormat.bhkMoppBvTreeShape):
+                    NifLog.info("Generating mopp...")
+                    block.update_mopp()
+                    # print "=== DEBUG: MOPP TREE ==="
+                    # block.parse_mopp(verbose = True)
+                    # print "=== END OF MOPP TREE ==="
+                    # warn about mopps on non-static objects
+                    if any(sub_shape.layer != 1 for sub_shape in block.shape.sub_shapes):
+                        NifLog.warn("Mopps for non-static objects may not function correctly in-game. You may wish to use simple primitives for collision.")
 
             # export nif file:
             # ----------------
@@ -39,6 +39,7 @@
 
 
 import bpy
+import mathutils
 import pyffi.spells.nif.fix
 from pyffi.formats.nif import NifFormat
 
@@ -84,6 +85,11 @@ class NifImport(NifCommon):
         # find and store this list now of selected objects as creating new objects adds them to the selection list
         self.SELECTED_OBJECTS = bpy.context.selected_objects[:]
 
+        # start with a fresh map of imported datablocks and combined vertices, and no nodes to instance
+        block_store.block_to_datablock = {}
+        block_store.mesh_to_vertex_remap = {}
+        self.instanced_nodes = set()
+
         # catch nif import errors
         try:
             # check that one armature is selected in 'import geometry + parent
@@ -136,6 +142,8 @@ class NifImport(NifCommon):
 
         except NifError:
             return {'CANCELLED'}
+        finally:
+            Animation.clear_keyframe_times()
 
         NifLog.info("Finished")
         return {'FINISHED'}
@@ -164,6 +172,10 @@ class NifImport(NifCommon):
         # mark armature nodes and bones
         self.armaturehelper.mark_armatures_bones(root_block)
 
+        # find nodes that are referenced several times, to import them as collection instances
+        if NifOp.props.instance_nodes:
+            self.instanced_nodes |= self.get_repeated_nodes(root_block)
+
         # import the keyframe notes
         # if NifOp.props.animation:
         #     self.animationhelper.import_text_keys(root_block)
@@ -204,6 +216,48 @@ class NifImport(NifCommon):
                 return self.boundhelper.import_bounding_volume(n_node.collision_object.bounding_volume)
         return []
 
+    def get_repeated_nodes(self, root_block):
+        """Returns the nodes below root_block that are children of more than one node and can be instanced."""
+        references = {}
+        visited = set()
+        n_nodes = [root_block]
+        while n_nodes:
+            n_node = n_nodes.pop()
+            if n_node in visited:
+                continue
+            visited.add(n_node)
+            for n_child in n_node.children:
+                if isinstance(n_child, NifFormat.NiNode):
+                    references[n_child] = references.get(n_child, 0) + 1
+                    n_nodes.append(n_child)
+        return set(n_node for n_node, count in references.items() if count > 1 and self.can_instance(n_node))
+
+    def can_instance(self, n_node):
+        """Whether the branch of n_node is static and self contained, so it can be imported as a collection instance."""
+        for n_block in n_node.tree():
+            if isinstance(n_block, NifFormat.NiNode) and (self.armaturehelper.is_armature_root(n_block) or
+                                                          self.armaturehelper.is_bone(n_block)):
+                return False
+            if isinstance(n_block, NifFormat.NiObjectNET) and n_block.controller:
+                return False
+            if isinstance(n_block, NifFormat.NiGeometry) and n_block.skin_instance:
+                return False
+            if isinstance(n_block, NifFormat.NiAVObject) and getattr(n_block, "collision_object", None):
+                return False
+        return True
+
+    def import_instance(self, n_block, b_armature=None, n_armature=None):
+        """Import a node that is referenced several times as an instance of a collection that holds its branch."""
+        b_collection = block_store.get_datablock(n_block)
+        if not b_collection:
+            # import the branch once, at the origin of the collection
+            self.instanced_nodes.remove(n_block)
+            b_obj = self.import_branch(n_block, b_armature=b_armature, n_armature=n_armature)
+            b_obj.matrix_local = mathutils.Matrix()
+            b_collection = self.objecthelper.create_instance_collection(b_obj)
+            block_store.store_datablock(n_block, b_collection)
+        return self.objecthelper.create_collection_instance(n_block, b_collection)
+
     def import_branch(self, n_block, b_armature=None, n_armature=None):
         """Read the content of the current NIF tree branch to Blender recursively.
 
@@ -218,6 +272,9 @@ class NifImport(NifCommon):
         if isinstance(n_block, NifFormat.NiTriBasedGeom) and NifOp.props.skeleton != "SKELETON_ONLY":
             return self.objecthelper.import_geometry_object(b_armature, n_block)
 
+        elif n_block in self.instanced_nodes:
+            return self.import_instance(n_block, b_armature=b_armature, n_armature=n_armature)
+
         elif isinstance(n_block, NifFormat.NiNode):
             # import object
             if self.armaturehelper.is_armature_root(n_block):
@@ -80,6 +80,22 @@ class NifExportOperator(Operator, ExportHelper, CommonDevOperator, CommonNif, Co
         description="Use NiBSAnimationNode (for Morrowind).",
         default=False)
 
+    # How to store transform keys in kf files.
+    kf_transform_keys: bpy.props.EnumProperty(
+        items=[
+            ('KEYFRAME', "Keyframes", "One key per keyframe in NiTransformData."),
+            ('BSPLINE', "Compressed B-spline", "Fit the keys to compressed NiBSplineCompTransformInterpolators."),
+        ],
+        name="KF Transform Keys",
+        description="How to store bone transform keys in kf files exported with this operator.",
+        default='KEYFRAME')
+
+    # Maximal deviation of the fitted B-spline curves.
+    bspline_tolerance: bpy.props.FloatProperty(
+        name="B-spline Tolerance",
+        description="Maximal deviation of the compressed B-spline curves from the sampled keys.",
+        default=0.001, min=0.0, max=1.0, precision=4)
+
     # Stripify geometries. Deprecate? (Strips are slower than triangle shapes.)
     stripify: bpy.props.BoolProperty(
         name="Stripify Geometries",
@@ -94,6 +110,12 @@ class NifExportOperator(Operator, ExportHelper, CommonDevOperator, CommonNif, Co
         default=True,
         options={'HIDDEN'})
 
+    # Split geometries that exceed the nif limits.
+    split_geometry: bpy.props.BoolProperty(
+        name="Split Large Geometries",
+        description="Split geometries with more than 65535 vertices or triangles into several shapes.",
+        default=False)
+
     # Flatten skin.
     flatten_skin: bpy.props.BoolProperty(
         name="Flatten Skin",
@@ -111,6 +111,11 @@ class NifImportOperator(Operator, ImportHelper, CommonScale, CommonDevOperator,
         description="Merge vertices that have identical location and normal values.",
         default=False)
 
+    instance_nodes: bpy.props.BoolProperty(
+        name="Instance Repeated Nodes",
+        description="Import nodes that are referenced several times as collection instances. Instances are not exported.",
+        default=False)
+
     def draw(self, context):
         pass
 
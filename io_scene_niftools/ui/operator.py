@@ -70,6 +70,7 @@ class OperatorImportIncludePanel(OperatorSetting, Panel):
         layout.prop(operator, "skeleton")
         layout.prop(operator, "combine_vertices")
         layout.prop(operator, "use_custom_normals")
+        layout.prop(operator, "instance_nodes")
 
 
 class OperatorImportTransformPanel(OperatorSetting, Panel):
@@ -214,6 +215,8 @@ class OperatorExportAnimationPanel(OperatorSetting, Panel):
         operator = sfile.active_operator
 
         layout.prop(operator, "bs_animation_node")
+        layout.prop(operator, "kf_transform_keys")
+        layout.prop(operator, "bspline_tolerance")
 
 
 class OperatorExportOptimisePanel(OperatorSetting, Panel):
@@ -237,6 +240,7 @@ class OperatorExportOptimisePanel(OperatorSetting, Panel):
 
         layout.prop(operator, "stripify")
         layout.prop(operator, "stitch_strips")
+        layout.prop(operator, "split_geometry")
         layout.prop(operator, "force_dds")
         layout.prop(operator, "optimise_materials")
 
@@ -0,0 +1,209 @@
+"""This script contains a vectorized evaluator for the open uniform B-splines of NiBSplineInterpolators."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2019, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy as np
+
+# the offset of channels that have no control points
+NO_DATA = 65535
+
+# gamebryo only uses cubic B-splines
+DEGREE = 3
+
+# compressed control points are shorts scaled to [-1, 1]
+SHORT_SCALE = 32767.0
+
+
+def get_knots(num_control_points, degree=DEGREE):
+    """Return the clamped, uniform knot vector of a B-spline with num_control_points control points."""
+    num_spans = num_control_points - degree
+    return np.concatenate((np.zeros(degree), np.arange(num_spans + 1, dtype=np.float64), np.full(degree, num_spans)))
+
+
+def get_basis(num_control_points, u, degree=DEGREE):
+    """Return the (len(u), num_control_points) basis function values at curve parameters u in [0, num_spans]."""
+    # short curves can only hold lower degrees
+    degree = min(degree, num_control_points - 1)
+    knots = get_knots(num_control_points, degree)
+    num_spans = num_control_points - degree
+    u = np.clip(np.asarray(u, dtype=np.float64), 0, num_spans)
+    # degree 0, the last span is closed so that the end of the curve is defined
+    spans = np.minimum(np.floor(u).astype(np.int64), num_spans - 1) + degree
+    basis = np.zeros((len(u), len(knots) - 1))
+    basis[np.arange(len(u)), spans] = 1.0
+    # cox - de boor recursion, for all parameters at once
+    for d in range(1, degree + 1):
+        num_functions = len(knots) - 1 - d
+        lower = knots[:num_functions]
+        upper = knots[d + 1:d + 1 + num_functions]
+        left = get_ratio(u[:, None] - lower, knots[d:d + num_functions] - lower)
+        right = get_ratio(upper - u[:, None], upper - knots[1:1 + num_functions])
+        basis = left * basis[:, :-1] + right * basis[:, 1:]
+    return basis
+
+
+def get_ratio(numerator, denominator):
+    """Divide by the knot span widths, where empty spans contribute nothing."""
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape),
+                     where=denominator != 0)
+
+
+def get_parameters(n_interp, times):
+    """Map times to the curve parameters of a NiBSplineInterpolator."""
+    num_control_points = n_interp.basis_data.num_control_points
+    num_spans = num_control_points - min(DEGREE, num_control_points - 1)
+    duration = n_interp.stop_time - n_interp.start_time
+    if duration <= 0:
+        return np.zeros(len(times))
+    return (np.asarray(times, dtype=np.float64) - n_interp.start_time) * (num_spans / duration)
+
+
+def get_sample_times(n_interp, fps):
+    """Return the times of all frames between the start and stop time of a NiBSplineInterpolator."""
+    start_frame = np.ceil(n_interp.start_time * fps - 0.0001)
+    stop_frame = np.floor(n_interp.stop_time * fps + 0.0001)
+    if stop_frame < start_frame:
+        return np.array([n_interp.start_time])
+    return np.arange(start_frame, stop_frame + 1) / fps
+
+
+def get_control_point_arrays(n_data):
+    """Return the float and the short control points of a NiBSplineData as arrays."""
+    return (np.array(n_data.float_control_points, dtype=np.float64),
+            np.array(n_data.short_control_points, dtype=np.float64))
+
+
+def get_float_offset(n_interp):
+    """
+    Return the offset of the control points of an uncompressed NiBSplineFloatInterpolator, or NO_DATA if it is unknown.
+    pyffi does not read the offset of this block, so its control points are only found if they are all the float data.
+    """
+    if not n_interp.basis_data or not n_interp.spline_data:
+        return NO_DATA
+    if n_interp.spline_data.num_float_control_points != n_interp.basis_data.num_control_points:
+        return NO_DATA
+    return 0
+
+
+def get_control_points(n_interp, control_points, offset, element_size, bias=None, multiplier=None):
+    """
+    Return the (num_control_points, element_size) control points of a channel, or None if it has no data.
+    Pass control_points as returned by get_control_point_arrays; bias and multiplier are given for compressed channels.
+    """
+    if offset == NO_DATA or not n_interp.basis_data or not n_interp.spline_data:
+        return None
+    num_control_points = n_interp.basis_data.num_control_points
+    if not num_control_points:
+        return None
+    float_points, short_points = control_points
+    if bias is None:
+        points = float_points[offset:offset + num_control_points * element_size]
+    else:
+        points = bias + short_points[offset:offset + num_control_points * element_size] * (multiplier / SHORT_SCALE)
+    return points.reshape(num_control_points, element_size)
+
+
+def evaluate(n_interp, times, points):
+    """Evaluate the B-spline of a NiBSplineInterpolator with the given control points at all times at once."""
+    return get_basis(len(points), get_parameters(n_interp, times)) @ points
+
+
+def fit_curves(curves, tolerance):
+    """
+    Fit curves sampled at the same, uniformly spaced times to B-splines with as few control points as keep every curve
+    within tolerance of its samples, also after its control points are compressed with quantize, per curve or per any
+    subset of its columns. The curves are (num_samples, k) arrays; all curves that still exceed the tolerance are
+    fitted together for every candidate number of control points. Returns the control point arrays.
+    """
+    num_samples = len(curves[0])
+    values = np.hstack(curves)
+    owners = np.repeat(np.arange(len(curves)), [curve.shape[1] for curve in curves])
+    fitted = [None] * len(curves)
+    remaining = np.arange(len(curves))
+    # with a knot at every sample, the B-spline passes through all samples, so that is as far as we go
+    max_control_points = num_samples + DEGREE - 1
+    num_control_points = DEGREE + 1
+    while len(remaining):
+        columns = np.isin(owners, remaining)
+        basis = get_basis(num_control_points, np.linspace(0, num_control_points - DEGREE, num_samples))
+        points = np.linalg.lstsq(basis, values[:, columns], rcond=None)[0]
+        # the largest deviation of every curve, over all of its samples and components
+        errors = np.zeros(len(curves))
+        np.maximum.at(errors, owners[columns], np.abs(basis @ points - values[:, columns]).max(axis=0))
+        # quantize moves every control point by at most half a step, and as the basis functions are positive and sum
+        # up to one, the curve moves by at most as much; a step is the range of the compressed points over 2 * 32767
+        max_points = np.full(len(curves), -np.inf)
+        min_points = np.full(len(curves), np.inf)
+        np.maximum.at(max_points, owners[columns], points.max(axis=0))
+        np.minimum.at(min_points, owners[columns], points.min(axis=0))
+        errors[remaining] += (max_points[remaining] - min_points[remaining]) / (4 * SHORT_SCALE)
+        done = remaining[(errors[remaining] <= tolerance) | (num_control_points >= max_control_points)]
+        for i in done:
+            fitted[i] = points[:, owners[columns] == i]
+        remaining = np.setdiff1d(remaining, done)
+        num_control_points = min(max_control_points, num_control_points + max(1, num_control_points // 4))
+    return fitted
+
+
+def get_offsets(sizes):
+    """
+    Offsets of channels with the given numbers of control point values, stored one after another in a NiBSplineData,
+    skipping the offset that denotes a channel without data. Returns the offsets and the total number of values.
+    """
+    offsets = []
+    offset = 0
+    for size in sizes:
+        if offset == NO_DATA:
+            offset += 1
+        offsets.append(offset)
+        offset += size
+    return offsets, offset
+
+
+def quantize(points):
+    """
+    Compress control points to shorts. Returns the shorts, bias and multiplier, such that the control points are
+    bias + short * multiplier / 32767 up to half a quantization step.
+    """
+    min_value = points.min()
+    max_value = points.max()
+    bias = 0.5 * (max_value + min_value)
+    # no need to compress a constant
+    multiplier = 0.5 * (max_value - min_value) if max_value > min_value else 1.0
+    shorts = np.round((points - bias) * (SHORT_SCALE / multiplier)).astype(np.int16)
+    return shorts, float(bias), float(multiplier)
@@ -0,0 +1,193 @@
+"""This script contains a vectorized convex hull implementation."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2019, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy as np
+from pyffi.utils.quickhull import qhull3d
+
+
+def convex_hull(vertices, precision=0.0001):
+    """Return the extreme points of vertices and the triangles connecting them.
+
+    This is a numpy version of pyffi's qhull3d with the same precision semantics and return values;
+    inputs that are coplanar, colinear or singular up to precision are still passed to qhull3d.
+    """
+    points = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    simplex = get_base_simplex(points, precision)
+    if simplex is None:
+        return qhull3d([tuple(point) for point in points.tolist()], precision)
+    triangles = get_hull_triangles(points, simplex, precision)
+    hull_indices, triangles = np.unique(triangles.ravel(), return_inverse=True)
+    return ([tuple(point) for point in points[hull_indices].tolist()],
+            [tuple(triangle) for triangle in triangles.reshape(-1, 3).tolist()])
+
+
+def get_base_simplex(points, precision):
+    """Return four points spanning a tetrahedron, or None if there is no such tetrahedron up to precision."""
+    if not len(points):
+        return None
+    # the two axis extremes that are furthest apart
+    extremes = np.array([get_furthest(points, sign * points[:, axis], precision)
+                         for sign in (-1.0, 1.0) for axis in range(3)])
+    distances = np.linalg.norm(points[extremes, None] - points[None, extremes], axis=2)
+    i, j = np.unravel_index(distances.argmax(), distances.shape)
+    if distances[i, j] <= precision:
+        return None
+    a, b = extremes[i], extremes[j]
+    # the point furthest from their line
+    relative = points - points[a]
+    direction = (points[b] - points[a]) / distances[i, j]
+    line_distances = np.linalg.norm(relative - np.outer(relative @ direction, direction), axis=1)
+    c = get_furthest(points, line_distances, precision)
+    if line_distances[c] <= precision:
+        return None
+    # the point furthest from their plane
+    normal = np.cross(points[b] - points[a], points[c] - points[a])
+    plane_distances = np.abs(relative @ (normal / np.linalg.norm(normal)))
+    d = get_furthest(points, plane_distances, precision)
+    if plane_distances[d] <= precision:
+        return None
+    return a, b, c, d
+
+
+def get_furthest(points, distances, precision):
+    """Return the index of the point at the largest distance.
+
+    Ties up to precision go to the tied point furthest from their centroid, which is an extreme point of the tied
+    points, so points on the edges and faces of the hull never become hull vertices.
+    """
+    tied = np.flatnonzero(distances >= distances.max() - precision)
+    return tied[np.linalg.norm(points[tied] - points[tied].mean(axis=0), axis=1).argmax()]
+
+
+def get_hull_triangles(points, simplex, precision):
+    """Run quick hull from a base simplex, returning the (n,3) outward facing triangles of the hull."""
+    triangles = []
+    normals = []
+    offsets = []
+    alive = []
+    # directed edge -> index of the triangle it belongs to
+    edge_triangles = {}
+
+    def add_triangle(triangle):
+        i, j, k = triangle
+        normal = np.cross(points[j] - points[i], points[k] - points[i])
+        # a sliver keeps a zero normal, so no point is ever above it, and it is dropped from the result
+        area = np.linalg.norm(normal)
+        if area > precision * precision:
+            normal /= area
+        else:
+            normal[:] = 0.0
+        for edge in ((i, j), (j, k), (k, i)):
+            edge_triangles[edge] = len(triangles)
+        triangles.append(triangle)
+        normals.append(normal)
+        offsets.append(normal @ points[i])
+        alive.append(True)
+        return len(triangles) - 1
+
+    def assign_outside(point_indices, triangle_indices):
+        # assign each point to the triangle it is furthest above, if any
+        if not len(point_indices):
+            return
+        triangle_indices = np.asarray(triangle_indices)
+        distances = (points[point_indices] @ np.array([normals[t] for t in triangle_indices]).T
+                     - np.array([offsets[t] for t in triangle_indices]))
+        nearest = distances.argmax(axis=1)
+        above = distances[np.arange(len(point_indices)), nearest] > precision
+        point_indices = point_indices[above]
+        nearest = nearest[above]
+        owners[point_indices] = triangle_indices[nearest]
+        for t_i in np.unique(nearest):
+            outside[triangle_indices[t_i]] = point_indices[nearest == t_i]
+
+    a, b, c, d = simplex
+    center = points[list(simplex)].mean(axis=0)
+    for i, j, k in ((a, b, c), (a, d, b), (a, c, d), (b, d, c)):
+        normal = np.cross(points[j] - points[i], points[k] - points[i])
+        if normal @ (center - points[i]) > 0:
+            j, k = k, j
+        add_triangle((i, j, k))
+
+    outside = {}
+    owners = np.full(len(points), -1)
+    candidates = np.setdiff1d(np.arange(len(points)), simplex)
+    assign_outside(candidates, range(4))
+
+    while outside:
+        # the outside point furthest above the plane of a triangle lies on a supporting plane of all points,
+        # so that with ties broken by get_furthest, every pivot is an extreme point
+        t_i = next(iter(outside))
+        point_indices = np.concatenate(list(outside.values()))
+        pivot = point_indices[get_furthest(points[point_indices], points[point_indices] @ normals[t_i], precision)]
+
+        # grow the visible region from this triangle over its neighbours
+        visible = {t_i}
+        stack = [t_i]
+        horizon = []
+        while stack:
+            i, j, k = triangles[stack.pop()]
+            for u, v in ((i, j), (j, k), (k, i)):
+                neighbour = edge_triangles[(v, u)]
+                if neighbour in visible:
+                    continue
+                if normals[neighbour] @ points[pivot] - offsets[neighbour] > precision:
+                    visible.add(neighbour)
+                    stack.append(neighbour)
+                else:
+                    horizon.append((u, v))
+
+        # the pivot may belong to a triangle that is only visible up to precision
+        if owners[pivot] not in visible:
+            remaining = outside.pop(owners[pivot])
+            remaining = remaining[remaining != pivot]
+            if len(remaining):
+                outside[owners[pivot]] = remaining
+
+        # replace the visible region by a cone from the horizon to the pivot
+        orphans = []
+        for v_i in visible:
+            alive[v_i] = False
+            if v_i in outside:
+                orphans.append(outside.pop(v_i))
+        orphans = np.concatenate(orphans)
+        new_triangles = [add_triangle((u, v, pivot)) for u, v in horizon]
+        assign_outside(orphans[orphans != pivot], new_triangles)
+
+    return np.array([triangle for triangle, normal, is_alive in zip(triangles, normals, alive)
+                     if is_alive and normal.any()], dtype=np.int64)
@@ -39,6 +39,7 @@
 import bpy
 from bpy_extras.io_utils import axis_conversion
 import mathutils
+import numpy as np
 from pyffi.formats.nif import NifFormat
 
 from io_scene_niftools.utils.logging import NifLog
@@ -72,6 +73,72 @@ def import_keymat(rest_rot_inv, key_matrix):
     return correction @ (rest_rot_inv @ key_matrix) @ correction_inv
 
 
+def import_quaternion_keys(rest_rot_inv, quaternions):
+    """Batched import_keymat for (n,4) w, x, y, z quaternion keys, returns (n,4) quaternions."""
+    q_left = np.array((correction @ rest_rot_inv).to_quaternion())
+    q_right = np.array(correction_inv.to_quaternion())
+    return multiply_quaternions(multiply_quaternions(q_left, quaternions), q_right)
+
+
+def import_euler_keys(rest_rot_inv, eulers):
+    """Batched import_keymat for (n,3) XYZ euler keys, returns (n,3) XYZ eulers."""
+    m_left = np.array((correction @ rest_rot_inv).to_3x3())
+    m_right = np.array(correction_inv.to_3x3())
+    return matrix_to_euler(m_left @ euler_to_matrix(eulers) @ m_right)
+
+
+def import_translation_keys(rest_rot_inv, rest_trans, translations):
+    """Batched import_keymat for (n,3) translation keys relative to the rest translation, returns (n,3) translations."""
+    m_left = np.array((correction @ rest_rot_inv).to_3x3())
+    return (np.asarray(translations) - np.array(rest_trans)) @ m_left.T
+
+
+def multiply_quaternions(q1, q2):
+    """Hamilton product of (..., 4) w, x, y, z quaternion arrays."""
+    w1, x1, y1, z1 = np.moveaxis(np.asarray(q1, dtype=np.float64), -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(np.asarray(q2, dtype=np.float64), -1, 0)
+    return np.stack((w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+                     w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+                     w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+                     w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2), axis=-1)
+
+
+def euler_to_matrix(eulers):
+    """Convert (n,3) XYZ eulers to (n,3,3) rotation matrices, as mathutils.Euler.to_matrix does."""
+    sin_x, sin_y, sin_z = np.sin(eulers).T
+    cos_x, cos_y, cos_z = np.cos(eulers).T
+    matrices = np.empty((len(eulers), 3, 3))
+    matrices[:, 0, 0] = cos_y * cos_z
+    matrices[:, 0, 1] = sin_x * sin_y * cos_z - cos_x * sin_z
+    matrices[:, 0, 2] = cos_x * sin_y * cos_z + sin_x * sin_z
+    matrices[:, 1, 0] = cos_y * sin_z
+    matrices[:, 1, 1] = sin_x * sin_y * sin_z + cos_x * cos_z
+    matrices[:, 1, 2] = cos_x * sin_y * sin_z - sin_x * cos_z
+    matrices[:, 2, 0] = -sin_y
+    matrices[:, 2, 1] = sin_x * cos_y
+    matrices[:, 2, 2] = cos_x * cos_y
+    return matrices
+
+
+def matrix_to_euler(matrices):
+    """Convert (n,3,3) rotation matrices to (n,3) XYZ eulers, picking the same solution as mathutils.Matrix.to_euler."""
+    cos_y = np.hypot(matrices[:, 0, 0], matrices[:, 1, 0])
+    euler_1 = np.stack((np.arctan2(matrices[:, 2, 1], matrices[:, 2, 2]),
+                        np.arctan2(-matrices[:, 2, 0], cos_y),
+                        np.arctan2(matrices[:, 1, 0], matrices[:, 0, 0])), axis=1)
+    euler_2 = np.stack((np.arctan2(-matrices[:, 2, 1], -matrices[:, 2, 2]),
+                        np.arctan2(-matrices[:, 2, 0], -cos_y),
+                        np.arctan2(-matrices[:, 1, 0], -matrices[:, 0, 0])), axis=1)
+    # gimbal lock
+    locked = cos_y <= 16 * np.finfo(np.float32).eps
+    euler_1[locked, 0] = np.arctan2(-matrices[locked, 1, 2], matrices[locked, 1, 1])
+    euler_1[locked, 2] = 0.0
+    euler_2[locked] = euler_1[locked]
+    use_2 = np.abs(euler_1).sum(axis=1) > np.abs(euler_2).sum(axis=1)
+    euler_1[use_2] = euler_2[use_2]
+    return euler_1
+
+
 def export_keymat(rest_rot, key_matrix, bone):
     """Handles space conversions for exported keys """
     if bone:
@@ -80,6 +147,36 @@ def export_keymat(rest_rot, key_matrix, bone):
         return rest_rot @ key_matrix
 
 
+def export_quaternion_keys(rest_rot, quaternions):
+    """Batched export_keymat for (n,4) w, x, y, z quaternion keys of a bone, returns (n,4) quaternions."""
+    q_left = np.array((rest_rot @ correction_inv).to_quaternion())
+    q_right = np.array(correction.to_quaternion())
+    return multiply_quaternions(multiply_quaternions(q_left, quaternions), q_right)
+
+
+def export_translation_keys(rest_rot, rest_trans, translations):
+    """Batched export_keymat for (n,3) translation keys of a bone, returns (n,3) translations including the rest translation."""
+    m_left = np.array((rest_rot @ correction_inv).to_3x3())
+    return np.asarray(translations) @ m_left.T + np.array(rest_trans)
+
+
+def euler_to_quaternion(eulers):
+    """Convert (n,3) XYZ eulers to (n,4) w, x, y, z quaternions, as mathutils.Euler.to_quaternion does."""
+    half_angles = 0.5 * np.asarray(eulers, dtype=np.float64)
+    sin_x, sin_y, sin_z = np.sin(half_angles).T
+    cos_x, cos_y, cos_z = np.cos(half_angles).T
+    return np.stack((cos_x * cos_y * cos_z + sin_x * sin_y * sin_z,
+                     sin_x * cos_y * cos_z - cos_x * sin_y * sin_z,
+                     cos_x * sin_y * cos_z + sin_x * cos_y * sin_z,
+                     cos_x * cos_y * sin_z - sin_x * sin_y * cos_z), axis=1)
+
+
+def get_grid_cells(values, epsilon):
+    """Integer cells of an epsilon sized grid, for comparing float data up to epsilon: halves round up, and -0.0 and
+    0.0 end up in the same cell."""
+    return np.floor(np.asarray(values, dtype=np.float64) / epsilon + 0.5).astype(np.int64)
+
+
 def get_bind_matrix(bone):
     """Get a nif armature-space matrix from a blender bone. """
     bind = correction @ correction_inv @ bone.matrix_local @ correction
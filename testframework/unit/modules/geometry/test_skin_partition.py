@@ -0,0 +1,152 @@
+"""Unit testing the export skin partitioning"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2019, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import nose
+import numpy as np
+from pyffi.formats.nif import NifFormat
+
+from io_scene_niftools.modules.nif_export.geometry.mesh.skin_partition import SkinPartition
+from io_scene_niftools.modules.nif_export.geometry.vertex import VertexWeights
+
+# a ladder of 8 rungs with 2 vertices each, every rung is skinned to the next two bones of a chain
+NUM_RUNGS = 8
+TRIANGLES = [tri for i in range(NUM_RUNGS - 1)
+             for tri in ((2 * i, 2 * i + 1, 2 * i + 2), (2 * i + 1, 2 * i + 3, 2 * i + 2))]
+# the lower half is body, the upper half is a section cap
+BODY_PART = NifFormat.BSDismemberBodyPartType.SBP_32_BODY
+CAP_PART = NifFormat.BSDismemberBodyPartType.BP_SECTIONCAP_HEAD
+TRIANGLE_PARTS = [BODY_PART] * 8 + [CAP_PART] * 6
+
+
+def get_vertex_weights():
+    """Weights of the ladder vertices, with a weak third influence on the first vertex."""
+    rows = []
+    for vert in range(2 * NUM_RUNGS):
+        rung = vert // 2
+        rows.append([(rung, 0.75), (rung + 1, 0.25)])
+    rows[0].append((NUM_RUNGS + 1, 0.1))
+    indptr = np.cumsum([0] + [len(row) for row in rows])
+    columns = np.array([bone for row in rows for bone, _ in row])
+    weights = np.array([weight for row in rows for _, weight in row])
+    return VertexWeights(indptr, columns, weights)
+
+
+def get_trishape():
+    trishape = NifFormat.NiTriShape()
+    trishape.skin_instance = NifFormat.BSDismemberSkinInstance()
+    trishape.skin_instance.data = NifFormat.NiSkinData()
+    return trishape
+
+
+def get_global_triangles(skinpartblock):
+    vertex_map = list(skinpartblock.vertex_map)
+    return [(vertex_map[tri.v_1], vertex_map[tri.v_2], vertex_map[tri.v_3]) for tri in skinpartblock.triangles]
+
+
+class TestSkinPartition:
+
+    def export(self, **kwargs):
+        kwargs.setdefault("max_bones_per_partition", 4)
+        kwargs.setdefault("max_bones_per_vertex", 2)
+        trishape = get_trishape()
+        lostweight = SkinPartition(**kwargs).export_skin_partition(
+            trishape, get_vertex_weights(), TRIANGLES, TRIANGLE_PARTS)
+        return trishape.skin_instance, lostweight
+
+    def test_every_triangle_in_one_partition(self):
+        skininst, _ = self.export()
+        triangles = [tri for block in skininst.skin_partition.skin_partition_blocks
+                     for tri in get_global_triangles(block)]
+        nose.tools.assert_equals(sorted(triangles), sorted(TRIANGLES))
+
+    def test_bones_per_partition(self):
+        skininst, _ = self.export()
+        blocks = skininst.skin_partition.skin_partition_blocks
+        nose.tools.assert_true(len(blocks) > 1)
+        for block in blocks:
+            nose.tools.assert_true(block.num_bones <= 4)
+            # every used bone index refers to one of the partition bones
+            for indices, weights in zip(block.bone_indices, block.vertex_weights):
+                for index, weight in zip(indices, weights):
+                    if weight:
+                        nose.tools.assert_true(index < block.num_bones)
+
+    def test_bones_per_vertex(self):
+        skininst, lostweight = self.export()
+        # the third influence of the first vertex was dropped, and the others renormalized
+        nose.tools.assert_true(abs(lostweight - 0.1) < 1e-6)
+        for block in skininst.skin_partition.skin_partition_blocks:
+            nose.tools.assert_equals(block.num_weights_per_vertex, 2)
+            for vert, weights in zip(block.vertex_map, block.vertex_weights):
+                nose.tools.assert_true(abs(sum(weights) - 1.0) < 1e-6)
+                nose.tools.assert_true(abs(weights[0] - 0.75) < 1e-6)
+
+    def test_body_parts(self):
+        skininst, _ = self.export()
+        blocks = skininst.skin_partition.skin_partition_blocks
+        nose.tools.assert_equals(skininst.num_partitions, len(blocks))
+        for bodypart, block in zip(skininst.partitions, blocks):
+            for tri in get_global_triangles(block):
+                nose.tools.assert_equals(TRIANGLE_PARTS[TRIANGLES.index(tri)], bodypart.body_part)
+            # section caps are hidden in the editor by default
+            nose.tools.assert_equals(bool(bodypart.part_flag.pf_editor_visible), bodypart.body_part == BODY_PART)
+        # partitions are in the order in which they appear in the mesh
+        nose.tools.assert_equals(skininst.partitions[0].body_part, BODY_PART)
+
+    def test_pad_bones(self):
+        skininst, _ = self.export(max_bones_per_partition=4, max_bones_per_vertex=4, pad_bones=True)
+        for block in skininst.skin_partition.skin_partition_blocks:
+            nose.tools.assert_equals(block.num_bones, 4)
+            nose.tools.assert_equals(block.num_weights_per_vertex, 4)
+            nose.tools.assert_equals(len(block.bones), 4)
+            for vert, indices, weights in zip(block.vertex_map, block.bone_indices, block.vertex_weights):
+                # unique sorted bone indices, padding slots have no weight
+                nose.tools.assert_equals(list(indices), sorted(set(indices)))
+                nose.tools.assert_equals(sum(1 for weight in weights if weight), 3 if vert == 0 else 2)
+                nose.tools.assert_true(abs(sum(weights) - 1.0) < 1e-6)
+
+    def test_triangle_bones_limit(self):
+        # the first triangle needs four bones, so its weakest bone has to go
+        skininst, lostweight = self.export(max_bones_per_partition=3, max_bones_per_vertex=3)
+        nose.tools.assert_true(abs(lostweight - 0.1 / 1.1) < 1e-6)
+        for block in skininst.skin_partition.skin_partition_blocks:
+            nose.tools.assert_true(block.num_bones <= 3)
+        triangles = [tri for block in skininst.skin_partition.skin_partition_blocks
+                     for tri in get_global_triangles(block)]
+        nose.tools.assert_equals(sorted(triangles), sorted(TRIANGLES))
@@ -0,0 +1,79 @@
+"""Unit testing the export vertex de-duplication"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2019, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import nose
+import numpy as np
+
+from io_scene_niftools.modules.nif_export.geometry.vertex import Vertex
+
+# two triangles sharing the edge 0-2, with a uv seam at vertex 0
+CORNER_VERTICES = [0, 1, 2, 0, 2, 3]
+CORNER_UVS = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.5, 0.0), (1.0, 1.0001), (0.0, 1.0)]
+
+
+class TestVertexDeduplication:
+
+    def test_shared_corners_are_merged(self):
+        unique, remap = Vertex.deduplicate(CORNER_VERTICES, [np.array(CORNER_UVS)], 0.0005)
+        nose.tools.assert_equals(remap.tolist(), [0, 1, 2, 3, 2, 4])
+        nose.tools.assert_equals(unique.tolist(), [0, 1, 2, 3, 5])
+
+    def test_no_corner_data(self):
+        unique, remap = Vertex.deduplicate(CORNER_VERTICES, [], 0.0005)
+        nose.tools.assert_equals(remap.tolist(), [0, 1, 2, 0, 2, 3])
+        nose.tools.assert_equals(unique.tolist(), [0, 1, 2, 5])
+
+    def test_exact_comparison(self):
+        unique, remap = Vertex.deduplicate(CORNER_VERTICES, [np.array(CORNER_UVS)], 0.0)
+        nose.tools.assert_equals(len(unique), 6)
+
+    def test_vertex_map(self):
+        vertmap = Vertex.get_vertex_map(np.array([0, 1, 2, 0, 3]), 5)
+        nose.tools.assert_equals(vertmap, [[0, 3], [1], [2], [4], None])
+
+    def test_cell_boundary(self):
+        # values within epsilon are merged, even if they straddle a multiple of epsilon
+        unique, remap = Vertex.deduplicate([0, 0], [np.array([[0.0024999], [0.0025001]])], 0.005)
+        nose.tools.assert_equals(remap.tolist(), [0, 0])
+
+    def test_first_match_wins(self):
+        # the third corner is close to both earlier ones, and merges into the one that was created first
+        unique, remap = Vertex.deduplicate([0, 0, 0], [np.array([[0.0], [0.008], [0.004]])], 0.005)
+        nose.tools.assert_equals(remap.tolist(), [0, 1, 0])
+        nose.tools.assert_equals(unique.tolist(), [0, 1])
@@ -0,0 +1,80 @@
+"""Unit testing the import vertex welding"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2019, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import nose
+import numpy as np
+
+from io_scene_niftools.modules.nif_import.geometry.vertex import Vertex
+
+# a quad split along a uv seam: vertices 2 and 3 duplicate vertices 0 and 1
+POSITIONS = np.array([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 0.0, -0.0), (1.0, 0.0001, 0.0), (1.0, 1.0, 0.0)], dtype=np.float32)
+NORMALS = np.array([(0.0, 0.0, 1.0)] * 5, dtype=np.float32)
+
+
+class TestVertexWelding:
+
+    def test_seam_vertices_are_combined(self):
+        nif_vertices, vertex_remap = Vertex.weld(POSITIONS, NORMALS, 0.0005)
+        nose.tools.assert_equals(nif_vertices.tolist(), [0, 1, 4])
+        nose.tools.assert_equals(vertex_remap.tolist(), [0, 1, 0, 1, 2])
+
+    def test_different_normals_are_kept(self):
+        normals = NORMALS.copy()
+        normals[2] = (0.0, 1.0, 0.0)
+        nif_vertices, vertex_remap = Vertex.weld(POSITIONS, normals, 0.0005)
+        nose.tools.assert_equals(vertex_remap.tolist(), [0, 1, 2, 1, 3])
+
+    def test_exact_comparison(self):
+        nif_vertices, vertex_remap = Vertex.weld(POSITIONS, None, 0.0)
+        nose.tools.assert_equals(vertex_remap.tolist(), [0, 1, 0, 2, 3])
+
+    def test_first_vertices_invert_remap(self):
+        nif_vertices, vertex_remap = Vertex.weld(POSITIONS, NORMALS, 0.0005)
+        nose.tools.assert_equals(Vertex.get_first_vertices(vertex_remap).tolist(), nif_vertices.tolist())
+
+    def test_degenerate_triangles_are_removed(self):
+        _, vertex_remap = Vertex.weld(POSITIONS, NORMALS, 0.0005)
+        triangles = Vertex.remove_degenerate_triangles(np.array([(0, 1, 2), (2, 3, 4)]), vertex_remap)
+        nose.tools.assert_equals(triangles.tolist(), [[2, 3, 4]])
+
+    def test_halves_round_up(self):
+        # 0.25 lies exactly halfway between two cells, and joins the cell above it like 0.7 does
+        positions = np.array([(0.25, 0.0, 0.0), (0.7, 0.0, 0.0)], dtype=np.float32)
+        nif_vertices, vertex_remap = Vertex.weld(positions, None, 0.5)
+        nose.tools.assert_equals(vertex_remap.tolist(), [0, 0])
@@ -0,0 +1,83 @@
+"""Unit testing the sharing of blocks in the export block registry"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2019, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import nose
+from pyffi.formats.nif import NifFormat
+
+from io_scene_niftools.modules.nif_export.block_registry import ExportBlockRegistry, get_attribute_hash
+
+
+def get_alpha_property(flags, threshold):
+    n_alpha = NifFormat.NiAlphaProperty()
+    n_alpha.flags = flags
+    n_alpha.threshold = threshold
+    return n_alpha
+
+
+class TestBlockSharing:
+
+    def setup(self):
+        self.block_store = ExportBlockRegistry()
+
+    def test_param_sets_do_not_collide(self):
+        # the same values under different attributes must not match each other
+        get_flags = get_attribute_hash(("flags",))
+        get_threshold = get_attribute_hash(("threshold",))
+        n_flags = self.block_store.intern_block(get_alpha_property(5, 0), get_hash=get_flags)
+        n_threshold = self.block_store.intern_block(get_alpha_property(0, 5), get_hash=get_threshold)
+        nose.tools.assert_is_not(n_flags, n_threshold)
+        nose.tools.assert_is(self.block_store.intern_block(get_alpha_property(5, 7), get_hash=get_flags), n_flags)
+        nose.tools.assert_is(self.block_store.intern_block(get_alpha_property(7, 5), get_hash=get_threshold), n_threshold)
+
+    def test_hash_functions_are_shared_per_param_set(self):
+        nose.tools.assert_is(get_attribute_hash(("flags", "threshold")), get_attribute_hash(("flags", "threshold")))
+
+    def test_registered_blocks_are_found(self):
+        n_alpha = self.block_store.register_block(get_alpha_property(5, 128))
+        get_hash = get_attribute_hash(("flags", "threshold"))
+        nose.tools.assert_is(self.block_store.intern_block(get_alpha_property(5, 128), get_hash=get_hash), n_alpha)
+
+    def test_changed_block_is_not_refiled(self):
+        get_hash = get_attribute_hash(("flags",))
+        n_alpha = self.block_store.intern_block(get_alpha_property(5, 0), get_hash=get_hash)
+        n_alpha.flags = 6
+        # the changed block matches neither its old nor, until it is shared again, its new flags
+        n_new = self.block_store.intern_block(get_alpha_property(5, 0), get_hash=get_hash)
+        nose.tools.assert_is_not(n_new, n_alpha)
+        nose.tools.assert_is(self.block_store.intern_block(get_alpha_property(5, 1), get_hash=get_hash), n_new)
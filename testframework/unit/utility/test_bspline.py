@@ -0,0 +1,195 @@
+"""Unit testing the B-spline evaluator"""
+
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2019, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+import nose
+import numpy as np
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_niftools.utils import bspline
+
+
+def get_comp_interpolator(points):
+    n_interp = NifFormat.NiBSplineCompFloatInterpolator()
+    n_interp.start_time = 0.0
+    n_interp.stop_time = 1.0
+    n_interp.basis_data = NifFormat.NiBSplineBasisData()
+    n_interp.basis_data.num_control_points = len(points)
+    n_interp.spline_data = NifFormat.NiBSplineData()
+    n_interp.offset, n_interp.bias, n_interp.multiplier = n_interp.spline_data.append_comp_data(
+        [(point,) for point in points])
+    return n_interp
+
+
+def get_float_interpolator(points):
+    n_interp = NifFormat.NiBSplineFloatInterpolator()
+    n_interp.start_time = 0.0
+    n_interp.stop_time = 1.0
+    n_interp.basis_data = NifFormat.NiBSplineBasisData()
+    n_interp.basis_data.num_control_points = len(points)
+    n_interp.spline_data = NifFormat.NiBSplineData()
+    n_interp.spline_data.num_float_control_points = len(points)
+    n_interp.spline_data.float_control_points.update_size()
+    for i, point in enumerate(points):
+        n_interp.spline_data.float_control_points[i] = point
+    return n_interp
+
+
+class TestBSpline:
+
+    def test_basis_is_partition_of_unity(self):
+        for num_control_points in (1, 2, 3, 4, 9):
+            basis = bspline.get_basis(num_control_points, np.linspace(0.0, num_control_points, 25))
+            nose.tools.assert_true(np.allclose(basis.sum(axis=1), 1.0))
+
+    def test_curve_is_clamped_to_end_points(self):
+        n_interp = get_comp_interpolator([1.0, 3.0, -2.0, 0.5, 4.0, 2.0])
+        points = bspline.get_control_points(n_interp, bspline.get_control_point_arrays(n_interp.spline_data),
+                                            n_interp.offset, 1, n_interp.bias, n_interp.multiplier)
+        values = bspline.evaluate(n_interp, [0.0, 1.0], points)
+        nose.tools.assert_true(np.allclose(values[:, 0], [1.0, 2.0], atol=0.001))
+
+    def test_dequantization_matches_pyffi(self):
+        n_interp = get_comp_interpolator([1.0, 3.0, -2.0, 0.5, 4.0])
+        points = bspline.get_control_points(n_interp, bspline.get_control_point_arrays(n_interp.spline_data),
+                                            n_interp.offset, 1, n_interp.bias, n_interp.multiplier)
+        keys = list(n_interp._getCompKeys(n_interp.offset, 1, n_interp.bias, n_interp.multiplier))
+        nose.tools.assert_true(np.allclose(points, keys))
+
+    def test_uncompressed_float_curve(self):
+        n_interp = get_float_interpolator([1.0, 3.0, -2.0, 0.5, 4.0, 2.0])
+        offset = bspline.get_float_offset(n_interp)
+        nose.tools.assert_equals(offset, 0)
+        points = bspline.get_control_points(n_interp, bspline.get_control_point_arrays(n_interp.spline_data), offset, 1)
+        values = bspline.evaluate(n_interp, [0.0, 1.0], points)
+        nose.tools.assert_true(np.allclose(values[:, 0], [1.0, 2.0]))
+
+    def test_uncompressed_float_offset_is_unknown_for_shared_data(self):
+        # other channels' float data means the offset of this one can not be found
+        n_interp = get_float_interpolator([1.0, 3.0, -2.0, 0.5])
+        n_interp.basis_data.num_control_points = 2
+        nose.tools.assert_equals(bspline.get_float_offset(n_interp), bspline.NO_DATA)
+
+    def test_channel_without_data(self):
+        n_interp = get_comp_interpolator([1.0, 2.0, 3.0, 4.0])
+        control_points = bspline.get_control_point_arrays(n_interp.spline_data)
+        nose.tools.assert_is_none(bspline.get_control_points(n_interp, control_points, bspline.NO_DATA, 1, 0.0, 1.0))
+
+    def test_sample_times_are_frames(self):
+        n_interp = get_comp_interpolator([1.0, 2.0, 3.0, 4.0])
+        times = bspline.get_sample_times(n_interp, 30)
+        nose.tools.assert_equals(len(times), 31)
+        nose.tools.assert_true(np.allclose(times * 30, np.arange(31)))
+
+    def test_fit_is_within_tolerance(self):
+        times = np.linspace(0.0, 2.0, 61)
+        curves = [np.column_stack((np.sin(3 * times), times ** 2)), np.cos(times)[:, None]]
+        for curve, points in zip(curves, bspline.fit_curves(curves, 0.001)):
+            # smooth curves need far fewer control points than samples
+            nose.tools.assert_true(len(points) < len(times) // 2)
+            basis = bspline.get_basis(len(points), np.linspace(0.0, len(points) - bspline.DEGREE, len(times)))
+            nose.tools.assert_true(np.abs(basis @ points - curve).max() <= 0.001)
+
+    def test_fit_interpolates_noise(self):
+        curve = np.random.RandomState(0).rand(20, 1)
+        points = bspline.fit_curves([curve], 0.0)[0]
+        basis = bspline.get_basis(len(points), np.linspace(0.0, len(points) - bspline.DEGREE, len(curve)))
+        nose.tools.assert_true(np.allclose(basis @ points, curve))
+
+    def test_quantize(self):
+        points = np.array([[1.0, 2.0], [4.0, 3.0], [-1.0, 0.5]])
+        shorts, bias, multiplier = bspline.quantize(points)
+        nose.tools.assert_equals(shorts.dtype, np.int16)
+        nose.tools.assert_true(np.abs(bias + shorts * multiplier / bspline.SHORT_SCALE - points).max()
+                               <= 0.5 * multiplier / bspline.SHORT_SCALE)
+
+    def test_offsets_skip_no_data(self):
+        offsets, num_values = bspline.get_offsets([bspline.NO_DATA - 4, 4, 8])
+        nose.tools.assert_equals(offsets, [0, bspline.NO_DATA - 4, bspline.NO_DATA + 1])
+        nose.tools.assert_equals(num_values, bspline.NO_DATA + 9)
+
+    def test_fit_is_within_tolerance_after_quantization(self):
+        # a large range makes for a coarse quantization step, which the fit has to leave room for
+        times = np.linspace(0.0, 1.0, 41)
+        curve = 1000.0 * np.column_stack((np.sin(5 * times), np.cos(3 * times)))
+        points = bspline.fit_curves([curve], 0.02)[0]
+        shorts, bias, multiplier = bspline.quantize(points)
+        basis = bspline.get_basis(len(points), np.linspace(0.0, len(points) - bspline.DEGREE, len(times)))
+        nose.tools.assert_true(np.abs(basis @ (bias + shorts * multiplier / bspline.SHORT_SCALE) - curve).max() <= 0.02)
+
+    def test_compressed_transform_round_trip(self):
+        # translation and rotation of a bone, fitted together, as the exporter does
+        times = np.linspace(0.0, 1.0, 31)
+        translations = np.column_stack((times, np.sin(2 * times), times ** 2))
+        angles = 0.5 * np.pi * times
+        rotations = np.column_stack((np.cos(angles), np.sin(angles), np.zeros_like(times), np.zeros_like(times)))
+        tolerance = 0.001
+        points = bspline.fit_curves([np.hstack((translations, rotations))], tolerance)[0]
+        num_control_points = len(points)
+        channels = [bspline.quantize(points[:, :3]), bspline.quantize(points[:, 3:])]
+        # other channels come first, so that the rotation would start at the offset that means no data
+        filler_size = bspline.NO_DATA - channels[0][0].size
+        offsets, num_short_points = bspline.get_offsets([filler_size] + [shorts.size for shorts, _, _ in channels])
+        nose.tools.assert_equals(offsets[2], bspline.NO_DATA + 1)
+
+        n_interp = NifFormat.NiBSplineCompTransformInterpolator()
+        n_interp.start_time = 0.0
+        n_interp.stop_time = 1.0
+        n_interp.basis_data = NifFormat.NiBSplineBasisData()
+        n_interp.basis_data.num_control_points = num_control_points
+        n_interp.spline_data = NifFormat.NiBSplineData()
+        n_interp.spline_data.num_short_control_points = num_short_points
+        n_interp.spline_data.short_control_points.update_size()
+        for (shorts, bias, multiplier), offset, channel in zip(channels, offsets[1:], ("translation", "rotation")):
+            setattr(n_interp, channel + "_offset", offset)
+            setattr(n_interp, channel + "_bias", bias)
+            setattr(n_interp, channel + "_multiplier", multiplier)
+            for i, value in enumerate(shorts.ravel().tolist()):
+                n_interp.spline_data.short_control_points[offset + i] = value
+        n_interp.scale_offset = bspline.NO_DATA
+
+        control_points = bspline.get_control_point_arrays(n_interp.spline_data)
+        for curve, offset, element_size, bias, multiplier in (
+                (translations, n_interp.translation_offset, 3, n_interp.translation_bias, n_interp.translation_multiplier),
+                (rotations, n_interp.rotation_offset, 4, n_interp.rotation_bias, n_interp.rotation_multiplier)):
+            channel_points = bspline.get_control_points(n_interp, control_points, offset, element_size, bias, multiplier)
+            nose.tools.assert_equals(channel_points.shape, (num_control_points, element_size))
+            values = bspline.evaluate(n_interp, times, channel_points)
+            nose.tools.assert_true(np.abs(values - curve).max() <= tolerance)
+        nose.tools.assert_is_none(bspline.get_control_points(n_interp, control_points, n_interp.scale_offset, 1, 0.0, 1.0))
@@ -0,0 +1,97 @@
+"""Unit testing the convex hull"""
+
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2019, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import nose
+
+from io_scene_niftools.utils.hull import convex_hull
+
+CUBE = [(x, y, z) for x in (0.0, 1.0) for y in (0.0, 1.0) for z in (0.0, 1.0)]
+
+
+class TestConvexHull:
+
+    def test_interior_points_are_dropped(self):
+        vertices, triangles = convex_hull(CUBE + [(0.5, 0.5, 0.5), (0.25, 0.75, 0.5)])
+        nose.tools.assert_equals(sorted(vertices), sorted(CUBE))
+        nose.tools.assert_equals(len(triangles), 12)
+
+    def test_triangles_face_outwards(self):
+        vertices, triangles = convex_hull(CUBE)
+        for triangle in triangles:
+            a, b, c = (vertices[i] for i in triangle)
+            normal = [(b[1] - a[1]) * (c[2] - a[2]) - (b[2] - a[2]) * (c[1] - a[1]),
+                      (b[2] - a[2]) * (c[0] - a[0]) - (b[0] - a[0]) * (c[2] - a[2]),
+                      (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])]
+            # the cube center must be behind every triangle
+            nose.tools.assert_true(sum(n * (0.5 - p) for n, p in zip(normal, a)) < 0)
+
+    def test_points_within_precision_are_ignored(self):
+        vertices, triangles = convex_hull(CUBE + [(0.5, 0.5, 1.00001)], precision=0.0001)
+        nose.tools.assert_equals(sorted(vertices), sorted(CUBE))
+
+    def test_coplanar_points(self):
+        vertices, triangles = convex_hull([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (1.0, 1.0, 0.0)])
+        nose.tools.assert_equals(len(vertices), 4)
+        nose.tools.assert_equals(len(triangles), 2)
+
+    def test_duplicate_points(self):
+        vertices, triangles = convex_hull(CUBE + CUBE[:3] + [(0.5, 0.5, 0.5)] * 2)
+        nose.tools.assert_equals(sorted(vertices), sorted(CUBE))
+        nose.tools.assert_equals(len(triangles), 12)
+
+    def test_points_on_faces_and_edges_are_dropped(self):
+        # integer grids, as in box like collision shapes, have many points on the faces and edges of their hull
+        grid = [(x, y, z) for x in (0.0, 0.5, 1.0) for y in (0.0, 0.5, 1.0) for z in (0.0, 0.5, 1.0)]
+        vertices, triangles = convex_hull(grid)
+        nose.tools.assert_equals(sorted(vertices), sorted(CUBE))
+        nose.tools.assert_equals(len(triangles), 12)
+
+    def test_no_degenerate_triangles(self):
+        vertices, triangles = convex_hull([
+            (1, -1, 0), (-1, 0, 0), (1, 1, -1), (-1, 0, 0), (0, 0, 0), (-1, 1, -1), (0, 1, 1),
+            (-1, -1, 1), (0, -1, 0), (0, 1, 0), (1, -1, 0), (-1, 1, 1), (0, 1, -1)])
+        nose.tools.assert_equals(len(vertices), 7)
+        nose.tools.assert_equals(len(triangles), 10)
+        for triangle in triangles:
+            a, b, c = (vertices[i] for i in triangle)
+            normal = [(b[1] - a[1]) * (c[2] - a[2]) - (b[2] - a[2]) * (c[1] - a[1]),
+                      (b[2] - a[2]) * (c[0] - a[0]) - (b[0] - a[0]) * (c[2] - a[2]),
+                      (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])]
+            nose.tools.assert_true(sum(n * n for n in normal) > 0)